@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+APIG 列表接口的分页迭代器
+
+APIG 的列表接口按 pageNumber (从 1 开始) / pageSize 分页，响应 data 中带 items 和 totalSize。
+迭代器按需逐页获取并逐条产出，调用方找到目标后停止迭代即可不再请求后续页；
+第一页返回了 totalSize 时，后续页按窗口并行预取，产出顺序仍与页码一致。
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_PREFETCH = 4
+
+
+def _total_pages(data: Dict[str, Any], page_size: int) -> Optional[int]:
+    """根据第一页响应中的总数计算总页数，未返回总数时为 None"""
+    total = data.get("totalSize", data.get("total"))
+    try:
+        total = int(total)
+    except (TypeError, ValueError):
+        return None
+    return max(1, -(-total // page_size))
+
+
+def _is_last_page(items, page_size: int) -> bool:
+    return len(items) < page_size
+
+
+def iter_pages(fetch_page: Callable[[int, int], Dict[str, Any]], page_size: int = DEFAULT_PAGE_SIZE,
+               prefetch: int = DEFAULT_PREFETCH) -> Iterator[Dict[str, Any]]:
+    """
+    逐条产出分页列表中的条目
+
+    Args:
+        fetch_page: fetch_page(page_number, page_size) 返回该页的 data
+        page_size: 每页条目数
+        prefetch: 已知总页数时并行预取的页数，1 表示逐页获取
+    """
+    first = fetch_page(1, page_size)
+    items = first.get("items") or []
+    for item in items:
+        yield item
+
+    total_pages = _total_pages(first, page_size)
+    if total_pages is None:
+        # 不知道总数时只能逐页获取，直到某页不满
+        page_number = 1
+        while not _is_last_page(items, page_size):
+            page_number += 1
+            items = fetch_page(page_number, page_size).get("items") or []
+            for item in items:
+                yield item
+        return
+
+    if total_pages <= 1:
+        return
+
+    if prefetch <= 1:
+        for page_number in range(2, total_pages + 1):
+            for item in fetch_page(page_number, page_size).get("items") or []:
+                yield item
+        return
+
+    executor = ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="apig-page")
+    pending = []
+    next_page = 2
+    try:
+        while next_page <= total_pages or pending:
+            # 保持窗口内始终有 prefetch 个页在获取中
+            while next_page <= total_pages and len(pending) < prefetch:
+                pending.append(executor.submit(fetch_page, next_page, page_size))
+                next_page += 1
+            for item in pending.pop(0).result().get("items") or []:
+                yield item
+    finally:
+        # 调用方提前停止迭代时，取消尚未开始的请求
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+async def aiter_pages(fetch_page: Callable[[int, int], Awaitable[Dict[str, Any]]],
+                      page_size: int = DEFAULT_PAGE_SIZE,
+                      prefetch: int = DEFAULT_PREFETCH) -> AsyncIterator[Dict[str, Any]]:
+    """iter_pages 的异步版本，fetch_page 为协程函数"""
+    first = await fetch_page(1, page_size)
+    items = first.get("items") or []
+    for item in items:
+        yield item
+
+    total_pages = _total_pages(first, page_size)
+    if total_pages is None:
+        page_number = 1
+        while not _is_last_page(items, page_size):
+            page_number += 1
+            items = (await fetch_page(page_number, page_size)).get("items") or []
+            for item in items:
+                yield item
+        return
+
+    pending = []
+    next_page = 2
+    try:
+        while next_page <= total_pages or pending:
+            while next_page <= total_pages and len(pending) < max(1, prefetch):
+                pending.append(asyncio.ensure_future(fetch_page(next_page, page_size)))
+                next_page += 1
+            for item in (await pending.pop(0)).get("items") or []:
+                yield item
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+APIG 调用传输层
+
+MCPGatewayRegistrar 通过传输层发起 APIG (ROA 风格) 请求：
+- CliTransport: 调用 ./aliyun 可执行文件（原有方式，作为兜底）
+- HttpTransport: 进程内完成 ROA 签名，复用长连接直接访问 apig.<region>.aliyuncs.com
+
+两种传输层都返回 (returncode, stdout, stderr) 三元组，由注册器统一解析，并记录每次调用的耗时。
+"""
+
+import asyncio
+import base64
+import calendar
+import hashlib
+import hmac
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+import uuid
+from email.utils import formatdate
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tracing import normalize_endpoint
+
+APIG_API_VERSION = "2024-03-27"
+ECS_METADATA_URL = "http://100.100.100.200/latest"
+
+
+class CallStats:
+    """线程安全的调用耗时统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+
+    normalize_endpoint = staticmethod(normalize_endpoint)
+
+    def record(self, method: str, endpoint: str, seconds: float, ok: bool):
+        key = (method, self.normalize_endpoint(endpoint))
+        with self._lock:
+            durations, failures = self._records.get(key, ([], 0))
+            durations.append(seconds)
+            self._records[key] = (durations, failures + (0 if ok else 1))
+
+    def total_calls(self) -> int:
+        with self._lock:
+            return sum(len(durations) for durations, _ in self._records.values())
+
+    def summary_lines(self) -> List[str]:
+        """按接口输出调用次数、失败次数、平均/最大/总耗时"""
+        with self._lock:
+            items = sorted(self._records.items(), key=lambda item: -sum(item[1][0]))
+        lines = []
+        for (method, endpoint), (durations, failures) in items:
+            total = sum(durations)
+            lines.append(f"{method:<6} {endpoint:<48} 次数={len(durations):<4} 失败={failures:<3} "
+                         f"平均={total / len(durations) * 1000:.0f}ms 最大={max(durations) * 1000:.0f}ms "
+                         f"合计={total:.2f}s")
+        return lines
+
+
+class CliTransport:
+    """通过 ./aliyun 可执行文件调用 APIG"""
+
+    name = "cli"
+
+    def __init__(self, region: str, logger: logging.Logger, cli_path: str = "./aliyun"):
+        self.region = region
+        self.logger = logger
+        self.cli_path = cli_path
+        self.stats = CallStats()
+
+    def build_command(self, method: str, endpoint: str, body: Dict = None, params: Dict = None) -> List[str]:
+        """构建阿里云CLI命令行"""
+        command = [self.cli_path, "apig", method, endpoint, "--endpoint", f"apig.{self.region}.aliyuncs.com"]
+        # 添加参数
+        for key, value in (params or {}).items():
+            if value is not None:
+                command.extend([f"--{key}", str(value)])
+
+        # 添加请求体
+        if body:
+            command.extend(["--body", json.dumps(body)])
+
+        command.extend(["--header", "Content-Type=application/json;"])
+        return command
+
+    def execute(self, method: str, endpoint: str, body: Dict = None, params: Dict = None) -> Tuple[int, str, str]:
+        command = self.build_command(method, endpoint, body, params)
+        started = time.monotonic()
+        # 使用兼容Python 3.6的写法
+        result = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+        self._record(method, endpoint, started, result.returncode == 0)
+        return result.returncode, result.stdout, result.stderr
+
+    async def aexecute(self, method: str, endpoint: str, body: Dict = None,
+                       params: Dict = None) -> Tuple[int, str, str]:
+        command = self.build_command(method, endpoint, body, params)
+        started = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+        self._record(method, endpoint, started, process.returncode == 0)
+        return process.returncode, stdout.decode('utf-8'), stderr.decode('utf-8')
+
+    def _record(self, method: str, endpoint: str, started: float, ok: bool):
+        elapsed = time.monotonic() - started
+        self.stats.record(method, endpoint, elapsed, ok)
+        self.logger.debug(f"{self.name} 调用 {method} {endpoint} 耗时 {elapsed * 1000:.0f}ms")
+
+
+class CredentialProvider:
+    """
+    阿里云凭证提供者，按以下顺序查找：
+    1. 环境变量 ALIBABA_CLOUD_ACCESS_KEY_ID / ALIBABA_CLOUD_ACCESS_KEY_SECRET / ALIBABA_CLOUD_SECURITY_TOKEN
+    2. aliyun CLI 配置文件 (~/.aliyun/config.json) 中的当前 profile (AK 或 EcsRamRole 模式)
+    3. ECS 实例元数据服务中的 RAM 角色临时凭证
+    """
+
+    # 临时凭证在过期前多久刷新
+    REFRESH_MARGIN = 300
+
+    def __init__(self, ram_role_name: str = None, cli_config_path: str = None,
+                 metadata_url: str = ECS_METADATA_URL):
+        self.ram_role_name = ram_role_name
+        self.cli_config_path = cli_config_path or os.path.expanduser("~/.aliyun/config.json")
+        self.metadata_url = metadata_url
+        self._lock = threading.Lock()
+        self._cached = None
+        self._expires_at = 0.0
+
+    def get(self) -> Tuple[str, str, Optional[str]]:
+        """返回 (access_key_id, access_key_secret, security_token)"""
+        with self._lock:
+            if self._cached and time.time() < self._expires_at - self.REFRESH_MARGIN:
+                return self._cached
+            self._cached, self._expires_at = self._resolve()
+            return self._cached
+
+    def _resolve(self) -> Tuple[Tuple[str, str, Optional[str]], float]:
+        key_id = os.environ.get("ALIBABA_CLOUD_ACCESS_KEY_ID")
+        key_secret = os.environ.get("ALIBABA_CLOUD_ACCESS_KEY_SECRET")
+        if key_id and key_secret:
+            return (key_id, key_secret, os.environ.get("ALIBABA_CLOUD_SECURITY_TOKEN")), float("inf")
+
+        role_name = self.ram_role_name
+        profile = self._load_cli_profile()
+        if profile:
+            mode = profile.get("mode")
+            if mode == "AK" and profile.get("access_key_id"):
+                return (profile["access_key_id"], profile["access_key_secret"], None), float("inf")
+            if mode == "StsToken" and profile.get("access_key_id"):
+                return (profile["access_key_id"], profile["access_key_secret"],
+                        profile.get("sts_token")), float("inf")
+            if mode == "EcsRamRole":
+                role_name = role_name or profile.get("ram_role_name")
+
+        return self._fetch_ecs_role_credentials(role_name)
+
+    def _load_cli_profile(self) -> Optional[Dict]:
+        try:
+            with open(self.cli_config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            return None
+        current = config.get("current")
+        for profile in config.get("profiles", []):
+            if profile.get("name") == current:
+                return profile
+        return None
+
+    def _fetch_ecs_role_credentials(self, role_name: str = None) -> Tuple[Tuple[str, str, Optional[str]], float]:
+        headers = {}
+        try:
+            # 加固模式元数据需要先获取token，普通模式下失败可忽略
+            token = requests.put(f"{self.metadata_url}/api/token", timeout=2,
+                                 headers={"X-aliyun-ecs-metadata-token-ttl-seconds": "300"})
+            if token.status_code == 200:
+                headers["X-aliyun-ecs-metadata-token"] = token.text
+        except requests.RequestException:
+            pass
+
+        base = f"{self.metadata_url}/meta-data/ram/security-credentials/"
+        try:
+            if not role_name:
+                role_name = requests.get(base, headers=headers, timeout=2).text.strip().splitlines()[0]
+            response = requests.get(base + role_name, headers=headers, timeout=2)
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            raise RuntimeError(f"无法获取阿里云凭证，请配置环境变量或aliyun CLI: {e}")
+
+        expires_at = time.time() + 3600
+        expiration = data.get("Expiration")
+        if expiration:
+            expires_at = calendar.timegm(time.strptime(expiration, "%Y-%m-%dT%H:%M:%SZ"))
+        return (data["AccessKeyId"], data["AccessKeySecret"], data.get("SecurityToken")), expires_at
+
+
+class HttpTransport:
+    """进程内 ROA 签名的 APIG HTTP 客户端，使用连接池复用长连接"""
+
+    name = "http"
+
+    def __init__(self, region: str, logger: logging.Logger, endpoint: str = None,
+                 credentials: CredentialProvider = None, timeout: int = 30, pool_size: int = 10):
+        self.region = region
+        self.logger = logger
+        self.endpoint = (endpoint or f"https://apig.{region}.aliyuncs.com").rstrip('/')
+        if "://" not in self.endpoint:
+            self.endpoint = f"https://{self.endpoint}"
+        self.credentials = credentials or CredentialProvider()
+        self.timeout = timeout
+        self.stats = CallStats()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @staticmethod
+    def _canonical_query(params: Dict) -> List[Tuple[str, str]]:
+        return sorted((key, str(value)) for key, value in (params or {}).items() if value is not None)
+
+    def sign_headers(self, method: str, endpoint: str, query: List[Tuple[str, str]], body: bytes) -> Dict[str, str]:
+        """按 ROA 签名规则 (HMAC-SHA1) 生成请求头"""
+        key_id, key_secret, security_token = self.credentials.get()
+        headers = {
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+            "Date": formatdate(usegmt=True),
+            "x-acs-signature-method": "HMAC-SHA1",
+            "x-acs-signature-nonce": uuid.uuid4().hex,
+            "x-acs-signature-version": "1.0",
+            "x-acs-version": APIG_API_VERSION,
+        }
+        if body:
+            headers["Content-MD5"] = base64.b64encode(hashlib.md5(body).digest()).decode('utf-8')
+        if security_token:
+            headers["x-acs-security-token"] = security_token
+
+        canonical_headers = "".join(
+            f"{key.lower()}:{value}\n"
+            for key, value in sorted(headers.items(), key=lambda item: item[0].lower())
+            if key.lower().startswith("x-acs-")
+        )
+        canonical_resource = endpoint
+        if query:
+            canonical_resource += "?" + "&".join(f"{key}={value}" if value else key for key, value in query)
+
+        string_to_sign = "\n".join([
+            method,
+            headers["Accept"],
+            headers.get("Content-MD5", ""),
+            headers["Content-Type"],
+            headers["Date"],
+        ]) + "\n" + canonical_headers + canonical_resource
+        signature = base64.b64encode(
+            hmac.new(key_secret.encode('utf-8'), string_to_sign.encode('utf-8'), hashlib.sha1).digest()
+        ).decode('utf-8')
+        headers["Authorization"] = f"acs {key_id}:{signature}"
+        return headers
+
+    def execute(self, method: str, endpoint: str, body: Dict = None, params: Dict = None) -> Tuple[int, str, str]:
+        query = self._canonical_query(params)
+        payload = json.dumps(body).encode('utf-8') if body else b""
+        url = self.endpoint + endpoint
+        if query:
+            url += "?" + "&".join(f"{quote(key, safe='')}={quote(value, safe='')}" for key, value in query)
+
+        started = time.monotonic()
+        try:
+            headers = self.sign_headers(method, endpoint, query, payload)
+            response = self.session.request(method, url, data=payload or None, headers=headers,
+                                            timeout=self.timeout)
+        except Exception as e:
+            self._record(method, endpoint, started, False)
+            return 1, "", f"请求 {url} 失败: {e}"
+
+        ok = 200 <= response.status_code < 300
+        self._record(method, endpoint, started, ok)
+        if not ok:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                return 1, "", f"HTTP {response.status_code} (Retry-After: {retry_after}): {response.text}"
+            return 1, "", f"HTTP {response.status_code}: {response.text}"
+        return 0, response.text, ""
+
+    async def aexecute(self, method: str, endpoint: str, body: Dict = None,
+                       params: Dict = None) -> Tuple[int, str, str]:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.execute, method, endpoint, body, params)
+
+    def _record(self, method: str, endpoint: str, started: float, ok: bool):
+        elapsed = time.monotonic() - started
+        self.stats.record(method, endpoint, elapsed, ok)
+        self.logger.debug(f"{self.name} 调用 {method} {endpoint} 耗时 {elapsed * 1000:.0f}ms")
+
+
+def create_transport(kind: str, region: str, logger: logging.Logger, endpoint: str = None,
+                     ram_role_name: str = None, pool_size: int = 10) -> Any:
+    """按名称创建传输层: cli 或 http"""
+    if kind == "http":
+        return HttpTransport(region, logger, endpoint=endpoint,
+                             credentials=CredentialProvider(ram_role_name=ram_role_name), pool_size=pool_size)
+    if kind == "cli":
+        return CliTransport(region, logger)
+    raise ValueError(f"未知的传输层类型: {kind}")
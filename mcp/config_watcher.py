@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监听 MCP 配置文件 (config.json) 的变化并增量同步网关
+
+优先通过 ctypes 调用 inotify 监听配置文件所在目录（编辑器和 ROS 模板常以"写临时文件再改名"的方式替换文件），
+不支持 inotify 的平台退回到按 mtime/size/inode 轮询。连续的写入在防抖窗口内合并为一次变化，
+之后按 mcpServers 中的工具名和各工具的配置计算差异，只同步新增、修改和删除的工具。
+"""
+
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from collections import namedtuple
+from typing import Any, Callable, Dict, Iterable, Optional
+
+DEFAULT_DEBOUNCE = 1.0
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_RETRY_INTERVAL = 30.0
+
+# inotify 事件掩码，见 <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+                  | _IN_CREATE | _IN_DELETE)
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+ToolChanges = namedtuple("ToolChanges", ["added", "changed", "removed"])
+
+
+def load_tool_settings(config_path: str) -> Dict[str, Any]:
+    """读取配置文件中的 mcpServers，返回 {工具名: 工具配置}"""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    servers = config.get('mcpServers') or {}
+    if not isinstance(servers, dict):
+        raise ValueError("mcpServers 必须是对象")
+    return servers
+
+
+def diff_tool_settings(old: Dict[str, Any], new: Dict[str, Any]) -> ToolChanges:
+    """比较两份 mcpServers，返回新增、配置变化和删除的工具（各自按名称排序）"""
+    return ToolChanges(
+        added=sorted(name for name in new if name not in old),
+        changed=sorted(name for name in new if name in old and new[name] != old[name]),
+        removed=sorted(name for name in old if name not in new),
+    )
+
+
+class _InotifyWatch:
+    """监听单个文件所在目录，只关心该文件名相关的事件"""
+
+    def __init__(self, path: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("当前平台不支持 inotify")
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        directory = os.path.dirname(os.path.abspath(path))
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), _IN_WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch 失败: {directory}")
+        self._name = os.fsencode(os.path.basename(path))
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        """等待事件，返回是否有与目标文件相关的事件"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+        matched = False
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return matched
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buffer):
+                _, _, _, name_length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = buffer[offset:offset + name_length].rstrip(b"\0")
+                offset += name_length
+                if name == self._name:
+                    matched = True
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _PollingWatch:
+    """按文件的 mtime、大小和 inode 轮询变化"""
+
+    def __init__(self, path: str, interval: float):
+        self._path = path
+        self._interval = interval
+        self._signature = self._stat()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self._path)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size, stat.st_ino
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            signature = self._stat()
+            if signature != self._signature:
+                self._signature = signature
+                return True
+            remaining = self._interval if deadline is None else min(self._interval, deadline - time.monotonic())
+            if remaining <= 0:
+                return False
+            time.sleep(remaining)
+
+    def close(self):
+        pass
+
+
+class ConfigWatcher:
+    """监听配置文件变化，连续写入在防抖窗口内合并为一次"""
+
+    def __init__(self, config_path: str, debounce: float = DEFAULT_DEBOUNCE,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, use_inotify: bool = True,
+                 logger: logging.Logger = None):
+        self.config_path = config_path
+        self.debounce = debounce
+        self.logger = logger or logging.getLogger(__name__)
+        self._watch = None
+        if use_inotify:
+            try:
+                self._watch = _InotifyWatch(config_path)
+                self.backend = "inotify"
+            except (OSError, AttributeError) as e:
+                self.logger.warning(f"inotify 不可用，改为轮询监听: {e}")
+        if self._watch is None:
+            self._watch = _PollingWatch(config_path, poll_interval)
+            self.backend = "polling"
+
+    def wait_for_change(self, timeout: Optional[float] = None) -> bool:
+        """等待文件变化并防抖，timeout 内没有变化时返回 False"""
+        if not self._watch.wait(timeout):
+            return False
+        # 持续吸收事件，直到安静 debounce 秒
+        while self._watch.wait(self.debounce):
+            pass
+        return True
+
+    def close(self):
+        self._watch.close()
+
+
+def watch_config(config_path: str, sync: Callable[[ToolChanges, Dict[str, Any]], Iterable[str]],
+                 applied: Dict[str, Any], debounce: float = DEFAULT_DEBOUNCE,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, retry_interval: float = DEFAULT_RETRY_INTERVAL,
+                 use_inotify: bool = True, logger: logging.Logger = None, stop_event: threading.Event = None):
+    """
+    持续监听配置文件，每次变化后只同步有差异的工具
+
+    Args:
+        sync: sync(changes, desired) 执行同步并返回失败的工具名
+        applied: 已同步到网关的 mcpServers，作为首次比较的基准
+        retry_interval: 有工具同步失败时，即使文件未变化也按此间隔重试
+        stop_event: 设置后退出监听循环
+    """
+    logger = logger or logging.getLogger(__name__)
+    applied = dict(applied)
+    watcher = ConfigWatcher(config_path, debounce, poll_interval, use_inotify, logger)
+    logger.info(f"开始监听配置文件 {config_path} (方式: {watcher.backend}，防抖 {debounce} 秒)")
+    retry_at = None
+    try:
+        if diff_tool_settings(applied, load_tool_settings(config_path)) != ToolChanges([], [], []):
+            # 基准与当前文件已有差异（基准之后的修改或首次配置失败的工具），立即同步一次
+            retry_at = time.monotonic()
+    except (OSError, ValueError):
+        pass
+    try:
+        while not (stop_event and stop_event.is_set()):
+            # 分段等待，以便及时响应 stop_event 和失败重试
+            timeout = 1.0 if retry_at is None else max(0.0, min(1.0, retry_at - time.monotonic()))
+            if not watcher.wait_for_change(timeout):
+                if retry_at is None or time.monotonic() < retry_at:
+                    continue
+                logger.info("配置文件与已同步状态不一致，重新同步")
+
+            try:
+                desired = load_tool_settings(config_path)
+            except (OSError, ValueError) as e:
+                # 文件可能正在被替换或内容不完整，等待下一次变化
+                logger.warning(f"读取配置文件失败，等待下一次变化: {e}")
+                continue
+
+            changes = diff_tool_settings(applied, desired)
+            if not (changes.added or changes.changed or changes.removed):
+                retry_at = None
+                logger.debug("配置文件中的工具没有变化")
+                continue
+
+            logger.info(f"检测到工具变化: 新增 {changes.added or '无'}，修改 {changes.changed or '无'}，"
+                        f"删除 {changes.removed or '无'}")
+            started = time.monotonic()
+            try:
+                failed = set(sync(changes, desired))
+            except Exception as e:
+                logger.error(f"增量同步失败: {e}")
+                failed = set(changes.added) | set(changes.changed) | set(changes.removed)
+
+            # 只推进同步成功的工具，失败的工具下次仍会出现在差异中
+            for name in changes.added + changes.changed:
+                if name not in failed:
+                    applied[name] = desired[name]
+            for name in changes.removed:
+                if name not in failed:
+                    applied.pop(name, None)
+
+            logger.info(f"增量同步完成，耗时 {time.monotonic() - started:.2f} 秒，失败 {len(failed)} 个")
+            retry_at = time.monotonic() + retry_interval if failed else None
+    finally:
+        watcher.close()
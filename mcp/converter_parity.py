@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内转换与 openapi-to-mcp 二进制的一致性检查
+
+converter_fixtures/specs 下是有代表性的 OpenAPI 规范（mcpo/FastAPI 输出、$ref/allOf、
+空 schema、path/query/header/body 参数），converter_fixtures/binary 下是二进制对同名规范的原始输出。
+本工具用 openapi_to_mcp.convert_openapi 转换每个规范，与录制的二进制输出逐项比较，
+不一致时输出差异。全部规范都录制且一致之前，--converter 的默认值保持 binary，
+各命令行工具也拒绝 --converter native（见 native_converter_error）。
+
+    python converter_parity.py                                   # 与已录制的二进制输出对比
+    python converter_parity.py --binary ./openapi-to-mcp          # 现场运行二进制对比
+    python converter_parity.py --binary ./openapi-to-mcp --record # 用二进制重新录制输出
+"""
+
+import argparse
+import difflib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import namedtuple
+from typing import Any, List, Optional
+
+import yaml
+
+from openapi_to_mcp import convert_openapi
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "converter_fixtures")
+
+MATCH = "一致"
+MISMATCH = "不一致"
+UNRECORDED = "未录制"
+
+ParityResult = namedtuple("ParityResult", ["name", "status", "diff"])
+
+
+def list_fixtures(fixtures_dir: str) -> List[str]:
+    """返回 specs 目录下的规范名（不含扩展名），按名称排序"""
+    specs_dir = os.path.join(fixtures_dir, "specs")
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(specs_dir) if name.endswith(".json"))
+
+
+def run_binary(binary: str, spec_path: str, server_name: str, output_path: str):
+    """按 higress_client 的调用方式运行 openapi-to-mcp，输出写入 output_path"""
+    result = subprocess.run([binary, "--input", spec_path, "--output", output_path, "--server-name", server_name],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0 or not os.path.exists(output_path):
+        raise RuntimeError(f"openapi-to-mcp 转换 {spec_path} 失败 (返回码 {result.returncode}): {result.stderr}")
+
+
+def _dump(config: Any) -> List[str]:
+    return yaml.safe_dump(config, allow_unicode=True, default_flow_style=False).splitlines(True)
+
+
+def compare_fixture(fixtures_dir: str, name: str, binary: str = None, record: bool = False) -> ParityResult:
+    """
+    对比单个规范的进程内转换结果与二进制输出
+
+    提供 binary 时现场运行二进制，record 为真时同时把原始输出写回 binary 目录；
+    否则读取已录制的输出，不存在时返回未录制。
+    """
+    spec_path = os.path.join(fixtures_dir, "specs", f"{name}.json")
+    recorded_path = os.path.join(fixtures_dir, "binary", f"{name}.yaml")
+    with open(spec_path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+
+    if binary:
+        temp_dir = tempfile.mkdtemp(prefix="converter_parity_")
+        try:
+            output_path = os.path.join(temp_dir, f"{name}.yaml")
+            run_binary(binary, spec_path, name, output_path)
+            if record:
+                os.makedirs(os.path.dirname(recorded_path), exist_ok=True)
+                shutil.copyfile(output_path, recorded_path)
+            with open(output_path, "r", encoding="utf-8") as f:
+                expected = yaml.safe_load(f)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    elif os.path.exists(recorded_path):
+        with open(recorded_path, "r", encoding="utf-8") as f:
+            expected = yaml.safe_load(f)
+    else:
+        return ParityResult(name, UNRECORDED, "")
+
+    actual = convert_openapi(spec, name)
+    if actual == expected:
+        return ParityResult(name, MATCH, "")
+    diff = "".join(difflib.unified_diff(_dump(expected), _dump(actual), fromfile=f"binary/{name}.yaml",
+                                        tofile=f"native/{name}.yaml"))
+    return ParityResult(name, MISMATCH, diff)
+
+
+def check_parity(fixtures_dir: str, binary: str = None, record: bool = False,
+                 names: List[str] = None) -> List[ParityResult]:
+    """对比全部（或指定的）规范"""
+    return [compare_fixture(fixtures_dir, name, binary, record) for name in (names or list_fixtures(fixtures_dir))]
+
+
+def native_converter_error(fixtures_dir: str = DEFAULT_FIXTURES_DIR) -> Optional[str]:
+    """已录制的二进制输出全部存在且与进程内转换一致时返回 None，否则返回不能使用 native 的原因"""
+    try:
+        results = check_parity(fixtures_dir)
+    except (OSError, ValueError) as e:
+        return f"无法检查转换一致性样例: {e}"
+    pending = [f"{result.name}({result.status})" for result in results if result.status != MATCH]
+    if not results or pending:
+        return (f"--converter native 尚未通过一致性检查: {', '.join(pending) or '没有样例'}；"
+                f"请先运行 python converter_parity.py --binary ./openapi-to-mcp --record 录制二进制输出并确认一致")
+    return None
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="检查进程内 OpenAPI 转换与 openapi-to-mcp 二进制的输出是否一致",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="包含 specs/ 和 binary/ 的目录")
+    parser.add_argument("--binary", help="openapi-to-mcp 路径，提供时现场运行而不读取已录制的输出")
+    parser.add_argument("--record", action="store_true", help="把二进制的原始输出写回 binary/ 目录，需要 --binary")
+    parser.add_argument("names", nargs="*", help="只检查指定的规范名，不提供则检查全部")
+    args = parser.parse_args(argv)
+    if args.record and not args.binary:
+        parser.error("--record 需要同时指定 --binary")
+
+    try:
+        results = check_parity(args.fixtures, args.binary, args.record, args.names)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+        print(f"{result.status:<4} {result.name}")
+        if result.diff:
+            print(result.diff)
+    print(", ".join(f"{status} {counts.get(status, 0)}" for status in (MATCH, MISMATCH, UNRECORDED)))
+    # 存在差异返回 1；没有差异但仍有未录制的规范返回 2，表示一致性尚未得到证明
+    if counts.get(MISMATCH):
+        return 1
+    return 2 if counts.get(UNRECORDED) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
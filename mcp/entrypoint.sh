@@ -6,6 +6,16 @@ PORT=${PORT:-8000}
 HOST=${HOST:-"0.0.0.0"}
 WORKERS=${WORKERS:-4}
 
+# Pre-install npx/uvx tool packages into PREWARM_DIR and launch them from there
+if [ -n "$PREWARM_DIR" ]; then
+    python /app/tool_prewarm.py install --config "$CONFIG_FILE" --prefix "$PREWARM_DIR" \
+        || echo "Some tool packages could not be pre-installed; they will be fetched on first launch"
+    if python /app/tool_prewarm.py rewrite --config "$CONFIG_FILE" --prefix "$PREWARM_DIR" \
+        --output /tmp/config.prewarmed.json; then
+        CONFIG_FILE=/tmp/config.prewarmed.json
+    fi
+fi
+
 # Build the command base
 CMD_BASE="mcpo --config $CONFIG_FILE --port $PORT --host $HOST --workers $WORKERS"
 
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI网关发现结果的磁盘缓存
+
+插件ID、MCP HTTP API ID、环境ID、通配符域名ID等发现结果对同一个网关几乎不会变化，
+按 region + gateway ID 缓存到磁盘，带 TTL，可显式失效。
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_PATH = os.path.expanduser("~/.cache/quickstart-mcp/gateway-discovery.json")
+DEFAULT_CACHE_TTL = 24 * 3600
+
+
+class GatewayDiscoveryCache:
+    """按 region/gateway_id 分组的键值缓存，每个条目记录写入时间"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _scope(region: str, gateway_id: str) -> str:
+        return f"{region}/{gateway_id}"
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, data: Dict[str, Dict[str, Any]]):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # 先写临时文件再替换，避免并发运行读到半个文件
+        fd, temp_path = tempfile.mkstemp(prefix=".gateway-cache-", dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def get(self, region: str, gateway_id: str, key: str) -> Optional[Any]:
+        """读取未过期的缓存值，不存在或已过期返回 None"""
+        with self._lock:
+            entry = self._load().get(self._scope(region, gateway_id), {}).get(key)
+        if not entry:
+            return None
+        if self.ttl is not None and time.time() - entry.get("updated_at", 0) > self.ttl:
+            return None
+        return entry.get("value")
+
+    def set(self, region: str, gateway_id: str, key: str, value: Any):
+        with self._lock:
+            data = self._load()
+            data.setdefault(self._scope(region, gateway_id), {})[key] = {
+                "value": value,
+                "updated_at": time.time()
+            }
+            self._save(data)
+
+    def invalidate(self, region: str, gateway_id: str, key: str = None):
+        """删除单个键，或在 key 为空时删除该网关的全部缓存"""
+        with self._lock:
+            data = self._load()
+            scope = self._scope(region, gateway_id)
+            if scope not in data:
+                return
+            if key is None:
+                del data[scope]
+            else:
+                data[scope].pop(key, None)
+            self._save(data)
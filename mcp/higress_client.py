@@ -10,11 +10,39 @@ import logging
 import tempfile
 import json
 import traceback
-import inspect
+import shlex
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+from config_watcher import DEFAULT_DEBOUNCE, DEFAULT_POLL_INTERVAL, ToolChanges, load_tool_settings, watch_config
+from converter_parity import native_converter_error
+from higress_inventory import (CONSUMERS, LISTABLE_KINDS, PLUGIN_INSTANCES, ROUTES, SERVICE_SOURCES,
+                               HigressInventory)
+from higress_profile import (PROFILE_CHOICES, SMALL, build_profile, default_profile, describe_profile,
+                             has_profile_placeholders, load_overrides, render_profile)
+from log_pipeline import (DEFAULT_BACKUP_COUNT, DEFAULT_MAX_BYTES, DEFAULT_PIPELINE, PAYLOAD, LazyJson)
+from mcp_config_cache import DEFAULT_CONFIG_CACHE_DIR, MCPConfigCache
+from openapi_to_mcp import apply_gateway_config, build_mcp_config
+from provision_state import (DEFAULT_LEASE_TTL, DEFAULT_LOCK_WAIT, DEFAULT_STATE_PREFIX, PROVISION_LOCK,
+                             LeaseLostError, ToolState, open_state_store, tool_fingerprint)
+from retry_policy import (DEFAULT_MAX_ATTEMPTS, DEFAULT_RETRY_BUDGET, CircuitOpenError, RetryPolicy,
+                          classify_http_response)
+from spec_store import DEFAULT_SPEC_STORE_DIR, SpecFetcher
+from tracing import CHROME, TRACE_FORMATS, Tracer
+from readiness import (DEFAULT_READY_TIMEOUT, DEFAULT_REDIS_PORT, ReadinessOrchestrator, http_check, openapi_check,
+                       redis_check, split_address, wait_until_ready)
+
+# mcpo 只在容器启动时执行工具预装并生成 /tmp/config.prewarmed.json，重启容器才会加载新的配置
+DEFAULT_MCPO_RELOAD_COMMAND = "docker restart mcpo-service"
 
 
 class HigressClient:
 
+    # (连接超时, 读取超时)：控制台未启动时尽快失败，交给重试策略处理
+    REQUEST_TIMEOUT = (5, 30)
 
     def init_system(self, api_key, domain):
         """
@@ -37,15 +65,16 @@ class HigressClient:
         self.logger.info("初始化系统")
         url = f"{self.base_url}/system/init"
         self.logger.debug(f"初始化URL: {url}")
-        self.logger.debug(f"初始化载荷: {json.dumps(payload, ensure_ascii=False)}")
+        self.logger.debug("初始化载荷: %s", LazyJson(payload), extra=PAYLOAD)
 
         try:
-            response = self.session.post(url, json=payload, timeout=30)
+            response = self.retry_policy.call("POST", url, lambda: self.session.post(url, json=payload, timeout=30),
+                                              classify_http_response)
             self.logger.debug(f"初始化响应状态码: {response.status_code}")
 
             try:
                 response_data = response.json()
-                self.logger.debug(f"初始化响应内容: {json.dumps(response_data, indent=2, ensure_ascii=False)}")
+                self.logger.debug("初始化响应内容: %s", LazyJson(response_data, indent=2), extra=PAYLOAD)
 
                 # 检查响应是否成功
                 if response.status_code == 200:
@@ -72,7 +101,10 @@ class HigressClient:
             # 不抛出异常，继续尝试登录
             return False
 
-    def __init__(self, domain, base_url="http://localhost:8001", username="admin", apikey="admin", verbose=False, ):
+    def __init__(self, domain, base_url="http://localhost:8001", username="admin", apikey="admin", verbose=False,
+                 config_cache=None, reconcile=False, connect=True, spec_store_dir=None, retry_policy=None,
+                 tracer=None, performance_profile=None, state_store=None, write_config=True, logger_name="HigressClient",
+                 log_file="higress_client.log", log_to_console=True, log_thread_name=False):
         """
         初始化 Higress 客户端
 
@@ -81,35 +113,72 @@ class HigressClient:
             username: 登录用户名
             apikey: 登录密码
             verbose: 是否启用详细日志
+            config_cache: MCPConfigCache 实例，为空时每次都重新转换
+            reconcile: 是否启用期望状态对比，只对实际发生变化的资源发起写请求
+            connect: 是否立即连接并登录；为 False 时可先预取 MCP 配置，之后再调用 connect()
+            spec_store_dir: 保存 OpenAPI 规范及其校验字段的目录，为空时只在内存中保存
+            retry_policy: 控制台请求的 RetryPolicy，为空时使用默认策略
+            tracer: 记录各阶段和接口调用耗时的 Tracer，为空时新建一个
+            performance_profile: 写入 higress-config.yaml 的 HigressProfile，为空时使用与原模板一致的 small 预设
+            state_store: 多节点共享的 provision_state.StateStore，配置与其中记录一致的工具直接跳过
+            write_config: 连接时是否写入本地 configmaps/higress-config.yaml；由控制节点配置其他主机时该文件不在目标主机上
+            logger_name: 日志记录器名称，同一进程配置多个实例时各自使用不同的名称
+            log_file: 详细日志文件
+            log_to_console: 是否同时输出到控制台
+            log_thread_name: 详细日志中是否记录线程名，并发配置时用于区分各工作线程的日志
         """
         self.base_url = base_url.rstrip('/')
         self.session = requests.Session()
-        self.logger = self._setup_logger(verbose)
+        self.logger = self._setup_logger(verbose, logger_name, log_file, log_to_console, log_thread_name)
         self.verbose = verbose
+        self.write_config = write_config
+        self.config_cache = config_cache
+        self.reconcile = reconcile
+        self.retry_policy = retry_policy or RetryPolicy("Higress 控制台", logger=self.logger)
+        self.tracer = tracer or Tracer("higress-client")
+        self.performance_profile = performance_profile or default_profile()
+        # 资源快照，由 load_inventory 填充；为空时逐个资源查询
+        self.inventory = None
+        # 统计写请求次数，便于确认重复执行时没有触发配置变更
+        self.write_count = 0
+        self._write_count_lock = threading.Lock()
+        # 在 Higress 就绪前预先生成的 MCP 配置，{工具名: (规范 URL, YAML 路径, 配置, 规范摘要)}
+        self.prepared_configs = {}
+        self.state_store = state_store
+        # 当前持有的配置锁，设置后状态写入带 fencing token，租约丢失时停止写 Higress 资源
+        self.state_lease = None
+        # 规范获取与控制台请求共用连接池，按 ETag/内容摘要识别未变化的规范
+        self.spec_fetcher = SpecFetcher(spec_store_dir, session=self.session, logger=self.logger)
+        self.domain = domain
+        self.username = username
+        self.apikey = apikey
 
         self.logger.info(f"初始化 HigressClient: base_url={self.base_url}, username={username}")
 
-        # 测试连接
-        self.check_and_create_higress_config(domain)
-        self._test_connection()
-        self.init_system(apikey, domain)
+        if connect:
+            self.connect()
 
-        # 自动登录
-        try:
-            self.login(username, apikey)
-            self.logger.info(f"已成功连接并登录到 Higress 服务: {base_url}")
-        except Exception as e:
-            self.logger.error(f"登录失败: {str(e)}")
-            raise
+    def connect(self):
+        """写入 higress-config（write_config 为 False 时跳过）、测试连接、初始化系统并登录"""
+        with self.tracer.span("connect"):
+            if self.write_config:
+                self.check_and_create_higress_config(self.domain)
+            # 测试连接
+            self._test_connection()
+            self.init_system(self.apikey, self.domain)
 
-    def _setup_logger(self, verbose):
-        """设置日志记录器"""
-        logger = logging.getLogger("HigressClient")
+            # 自动登录
+            try:
+                self.login(self.username, self.apikey)
+                self.logger.info(f"已成功连接并登录到 Higress 服务: {self.base_url}")
+            except Exception as e:
+                self.logger.error(f"登录失败: {str(e)}")
+                raise
 
-        # 清除现有的处理程序
-        if logger.handlers:
-            for handler in logger.handlers:
-                logger.removeHandler(handler)
+    def _setup_logger(self, verbose, logger_name="HigressClient", log_file="higress_client.log", log_to_console=True,
+                      log_thread_name=False):
+        """设置日志记录器，控制台和文件写入由 DEFAULT_PIPELINE 的后台线程完成"""
+        logger = logging.getLogger(logger_name)
 
         # 根据是否启用详细日志设置日志级别
         logger_level = logging.DEBUG if verbose else logging.INFO
@@ -120,26 +189,25 @@ class HigressClient:
         console_handler.setLevel(logger_level)  # 使用相同的日志级别
         console_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
 
-        # 文件处理程序 - 详细日志，包括文件名和行号
-        file_handler = logging.FileHandler('higress_client.log')
-        file_handler.setLevel(logging.DEBUG)  # 文件中仍然记录所有DEBUG日志，便于排查问题
+        # 文件处理程序 - 详细日志，包括文件名和行号，按大小轮转；只在并发配置时加入线程名，逐个配置时格式不变
+        thread_field = '%(threadName)s - ' if log_thread_name else ''
         file_formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(funcName)s() - %(message)s'
+            '%(asctime)s - %(levelname)s - ' + thread_field + '%(filename)s:%(lineno)d - %(funcName)s() - %(message)s'
         )
-        file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
+        # 文件中仍然记录所有DEBUG日志，便于排查问题
+        file_handler = DEFAULT_PIPELINE.file_handler(log_file, file_formatter, logging.DEBUG)
 
-        return logger
+        # 替换现有的处理程序
+        return DEFAULT_PIPELINE.install(logger, [console_handler, file_handler] if log_to_console else [file_handler])
 
     def _log_caller_info(self, level=logging.DEBUG):
-        """记录调用者信息，帮助跟踪调用栈"""
-        frame = inspect.currentframe().f_back
-        filename = frame.f_code.co_filename
-        lineno = frame.f_lineno
-        function = frame.f_code.co_name
-        self.logger.log(level, f"执行位置: {os.path.basename(filename)}:{lineno} in {function}()")
+        """记录调用者信息，帮助跟踪调用栈；对应级别未启用时不读取调用栈"""
+        if not self.logger.isEnabledFor(level):
+            return
+        frame = sys._getframe(1)
+        self.logger.log(level, "执行位置: %s:%d in %s()", os.path.basename(frame.f_code.co_filename),
+                        frame.f_lineno, frame.f_code.co_name)
 
     def _test_connection(self):
         """测试与 Higress 服务的连接"""
@@ -180,15 +248,16 @@ class HigressClient:
         self.logger.info(f"尝试登录用户: {username}")
         url = f"{self.base_url}/session/login"
         self.logger.debug(f"登录URL: {url}")
-        self.logger.debug(f"登录载荷: {json.dumps(payload, ensure_ascii=False)}")
+        self.logger.debug("登录载荷: %s", LazyJson(payload), extra=PAYLOAD)
 
         try:
-            response = self.session.post(url, json=payload, timeout=30)
+            response = self.retry_policy.call("POST", url, lambda: self.session.post(url, json=payload, timeout=30),
+                                              classify_http_response)
             self.logger.debug(f"登录响应状态码: {response.status_code}")
 
             try:
                 response_data = response.json()
-                self.logger.debug(f"登录响应内容: {json.dumps(response_data, indent=2, ensure_ascii=False)}")
+                self.logger.debug("登录响应内容: %s", LazyJson(response_data, indent=2), extra=PAYLOAD)
 
                 # 检查是否包含 displayName，这表示登录成功
                 if response_data['displayName']:
@@ -233,16 +302,23 @@ class HigressClient:
 
         # 记录请求体 (如果存在)
         if 'json' in kwargs:
-            self.logger.debug(f"请求体: {json.dumps(kwargs['json'], indent=2, ensure_ascii=False)}")
+            self.logger.debug("请求体: %s", LazyJson(kwargs['json'], indent=2), extra=PAYLOAD)
 
         try:
             # 设置合理的超时时间
             if 'timeout' not in kwargs:
-                kwargs['timeout'] = 30
+                kwargs['timeout'] = self.REQUEST_TIMEOUT
 
             self.logger.debug(f"请求参数: {kwargs}")
 
-            response = self.session.request(method, url, **kwargs)
+            if method.upper() != 'GET':
+                with self._write_count_lock:
+                    self.write_count += 1
+
+            with self.tracer.request_span("higress", method, endpoint):
+                response = self.retry_policy.call(method, endpoint,
+                                                  lambda: self.session.request(method, url, **kwargs),
+                                                  classify_http_response)
 
             # 记录响应状态和内容
             self.logger.info(f"响应状态码: {response.status_code}")
@@ -250,11 +326,11 @@ class HigressClient:
             try:
                 # 尝试解析为 JSON
                 response_data = response.json()
-                self.logger.debug(f"响应内容: {json.dumps(response_data, indent=2, ensure_ascii=False)}")
+                self.logger.debug("响应内容: %s", LazyJson(response_data, indent=2), extra=PAYLOAD)
                 return response_data
             except json.JSONDecodeError:
                 # 如果不是 JSON，记录文本
-                self.logger.debug(f"响应内容 (非 JSON): {response.text[:1000]}")
+                self.logger.debug("响应内容 (非 JSON): %s", response.text[:1000], extra=PAYLOAD)
 
         except json.JSONDecodeError as e:
             self.logger.error(f"响应解析错误: {str(e)}")
@@ -262,6 +338,10 @@ class HigressClient:
             self.logger.error(traceback.format_exc())
             raise RuntimeError(f"响应解析错误: {str(e)}")
 
+        except CircuitOpenError as e:
+            self.logger.error(str(e))
+            raise
+
         except HTTPError as e:
             error_msg = f"HTTP Error ({e.response.status_code}): "
             try:
@@ -299,6 +379,121 @@ class HigressClient:
             self.logger.error(traceback.format_exc())
             raise RuntimeError(f"未知错误: {str(e)}")
 
+    def _get_existing(self, endpoint, required_key="name"):
+        """
+        读取已存在的资源，兼容 data 包装的响应
+
+        Returns:
+            dict: 资源内容，不存在或读取失败时返回 None
+        """
+        try:
+            current = self._handle_request('GET', endpoint)
+        except Exception as e:
+            self.logger.debug(f"读取 {endpoint} 失败: {str(e)}")
+            return None
+        if isinstance(current, dict) and isinstance(current.get("data"), dict):
+            current = current["data"]
+        if not isinstance(current, dict) or current.get(required_key) is None:
+            return None
+        return current
+
+    def _lookup_existing(self, kind, name, endpoint, required_key="name"):
+        """优先从资源快照判断资源是否存在，快照无法回答时再查询控制台"""
+        if self.inventory is not None and self.inventory.knows(kind, name):
+            return self.inventory.get(kind, name)
+        current = self._get_existing(endpoint, required_key)
+        if self.inventory is not None:
+            self.inventory.set(kind, name, current)
+        return current
+
+    def _remember(self, kind, name, result, required_key="name"):
+        """写请求成功后用响应更新资源快照，响应无法识别时丢弃快照以便下次重新读取"""
+        if self.inventory is None:
+            return
+        if isinstance(result, dict) and isinstance(result.get("data"), dict):
+            result = result["data"]
+        if isinstance(result, dict) and result.get(required_key) is not None:
+            self.inventory.set(kind, name, result)
+        else:
+            self.inventory.discard(kind, name)
+
+    def _list_resources(self, endpoint):
+        """列出某类资源，兼容分页包装和直接返回数组两种响应"""
+        response = self._handle_request('GET', endpoint)
+        if isinstance(response, dict) and isinstance(response.get("data"), list):
+            return response["data"]
+        if isinstance(response, list):
+            return response
+        raise RuntimeError(f"无法识别 {endpoint} 的列表响应")
+
+    def load_inventory(self, tools=(), concurrency=1):
+        """
+        批量读取 Consumer、服务来源、路由，以及待配置工具已有的 MCP 插件实例
+
+        某类资源列表读取失败时不影响其他资源，该类资源退回到逐个查询。
+        """
+        self._log_caller_info()
+        inventory = HigressInventory()
+        for kind in LISTABLE_KINDS:
+            try:
+                inventory.load(kind, self._list_resources(f"/v1/{kind}"))
+                self.logger.info(f"资源快照: {kind} 共 {inventory.count(kind)} 个")
+            except Exception as e:
+                self.logger.warning(f"列出 {kind} 失败，将逐个查询: {str(e)}")
+
+        # 插件实例没有全局列表接口，只为已存在的路由读取，不存在的路由自然也没有插件实例
+        pending = []
+        for tool in tools:
+            if inventory.knows(ROUTES, tool) and inventory.get(ROUTES, tool) is None:
+                inventory.set(PLUGIN_INSTANCES, tool, None)
+            else:
+                pending.append(tool)
+
+        def fetch(route_name):
+            endpoint = f"/v1/routes/{route_name}/plugin-instances/mcp-server"
+            inventory.set(PLUGIN_INSTANCES, route_name, self._get_existing(endpoint, "rawConfigurations"))
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="inventory") as executor:
+                list(executor.map(fetch, pending))
+        self.logger.info(f"资源快照: 已读取 {len(pending)} 个路由的 MCP 插件实例")
+
+        self.inventory = inventory
+        return inventory
+
+    @classmethod
+    def _contains(cls, current, desired):
+        """判断 current 是否包含 desired 中给出的全部字段，服务端补充的其他字段不参与比较"""
+        if isinstance(desired, dict):
+            if current is None:
+                current = {}
+            if not isinstance(current, dict):
+                return False
+            return all(cls._contains(current.get(key), value) for key, value in desired.items())
+        if isinstance(desired, list):
+            if not isinstance(current, list) or len(current) != len(desired):
+                return False
+            return all(cls._contains(c, d) for c, d in zip(current, desired))
+        # None、False、空字符串与缺失字段等价
+        if desired in (None, False, "") and current in (None, False, ""):
+            return True
+        return current == desired
+
+    def _is_up_to_date(self, payload, current):
+        """比较期望载荷与当前状态，忽略 version 字段"""
+        desired = {key: value for key, value in payload.items() if key != "version"}
+        return self._contains(current, desired)
+
+    @staticmethod
+    def _normalize_raw_config(raw_config):
+        """将 rawConfigurations 规范化，避免键顺序、引号和缩进差异被当作配置变化"""
+        if not raw_config:
+            return ""
+        try:
+            return json.dumps(yaml.safe_load(raw_config), sort_keys=True, ensure_ascii=False)
+        except yaml.YAMLError:
+            return raw_config.strip()
+
     def create_computenest_consumer(self, bearer_token):
         """创建/更新固定结构Consumer"""
         self._log_caller_info()
@@ -312,11 +507,22 @@ class HigressClient:
             "version": 0
         }
 
+        # 没有快照也不需要对比时，直接尝试创建，已存在再更新
+        if self.reconcile or self.inventory is not None:
+            current = self._lookup_existing(CONSUMERS, "computenest", "/v1/consumers/computenest")
+            if current and self.reconcile and self._is_up_to_date(payload, current):
+                self.logger.info("Consumer computenest 无变化，跳过更新")
+                return current
+            if current:
+                self.logger.info("Consumer computenest 已存在，更新...")
+                return self._update_consumer(payload, current)
+
         try:
             self.logger.info("尝试创建 Consumer: computenest")
             result = self._handle_request('POST', '/v1/consumers', json=payload)
             if result["name"]:
                 self.logger.info(f"成功创建 Consumer: computenest")
+                self._remember(CONSUMERS, "computenest", result)
                 return result
         except RuntimeError as e:
             if "already exist" in str(e).lower():
@@ -330,17 +536,19 @@ class HigressClient:
             self.logger.error(f"创建 Consumer 失败: {str(e)}")
             raise
 
-    def _update_consumer(self, payload):
-        """更新已存在的Consumer"""
+    def _update_consumer(self, payload, current=None):
+        """更新已存在的Consumer，current 为已读取的当前状态时不再重复获取"""
         self._log_caller_info()
         try:
-            # 获取当前版本
-            self.logger.info(f"获取 Consumer {payload['name']} 当前版本")
-            current = self._handle_request('GET', f"/v1/consumers/{payload['name']}")
+            if current is None:
+                # 获取当前版本
+                self.logger.info(f"获取 Consumer {payload['name']} 当前版本")
+                current = self._handle_request('GET', f"/v1/consumers/{payload['name']}")
             payload["version"] = current.get("version", 0) + 1
             self.logger.info(f"更新 Consumer {payload['name']} 到版本 {payload['version']}")
             result = self._handle_request('PUT', f"/v1/consumers/{payload['name']}", json=payload)
             self.logger.info(f"成功更新 Consumer: {payload['name']}")
+            self._remember(CONSUMERS, payload['name'], result)
             return result
         except Exception as e:
             self.logger.error(f"更新 Consumer 时出错: {str(e)}")
@@ -369,34 +577,35 @@ class HigressClient:
 
         try:
             # 检查服务来源是否已存在
-            try:
-                self.logger.info(f"检查服务来源是否存在: {name}")
-                existing = self._handle_request('GET', f"/v1/service-sources/{name}")
-                if existing:
-                    self.logger.info(f"服务来源 {name} 已存在，尝试更新...")
-                    # 如果更新需要版本号，在更新方法中添加
-                    return self._update_service_source(name, payload)
-            except Exception as check_e:
-                self.logger.info(f"服务来源 {name} 不存在，将创建新的")
-                self.logger.debug(f"检查异常: {str(check_e)}")
-
+            self.logger.info(f"检查服务来源是否存在: {name}")
+            current = self._lookup_existing(SERVICE_SOURCES, name, f"/v1/service-sources/{name}")
+            if current and self.reconcile and self._is_up_to_date(payload, current):
+                self.logger.info(f"服务来源 {name} 无变化，跳过更新")
+                return current
+            if current:
+                self.logger.info(f"服务来源 {name} 已存在，尝试更新...")
+                return self._update_service_source(name, payload, current)
+
+            self.logger.info(f"服务来源 {name} 不存在，将创建新的")
             self.logger.info(f"创建服务来源: {name}, 域名: {domain}")
-            self.logger.debug(f"请求体: {json.dumps(payload, indent=2, ensure_ascii=False)}")
+            self.logger.debug("请求体: %s", LazyJson(payload, indent=2), extra=PAYLOAD)
             result = self._handle_request('POST', '/v1/service-sources', json=payload)
             self.logger.info(f"成功创建服务来源: {name}, 域名: {domain}")
+            self._remember(SERVICE_SOURCES, name, result)
             return result
         except Exception as e:
             self.logger.error(f"创建服务来源失败: {str(e)}")
             self.logger.error(traceback.format_exc())
             raise RuntimeError(f"创建服务来源失败: {str(e)}")
 
-    def _update_service_source(self, name, payload):
-        """更新已存在的服务来源"""
+    def _update_service_source(self, name, payload, current=None):
+        """更新已存在的服务来源，current 为已读取的当前状态时不再重复获取"""
         self._log_caller_info()
         try:
-            # 获取当前版本
-            self.logger.info(f"获取服务来源 {name} 当前版本")
-            current = self._handle_request('GET', f"/v1/service-sources/{name}")
+            if current is None:
+                # 获取当前版本
+                self.logger.info(f"获取服务来源 {name} 当前版本")
+                current = self._handle_request('GET', f"/v1/service-sources/{name}")
 
             # 更新时需要添加版本号
             if "version" in current:
@@ -404,9 +613,10 @@ class HigressClient:
                 payload["version"] = current.get("version", 0) + 1
 
             self.logger.info(f"更新服务来源 {name} 到版本 {payload.get('version', '未知')}")
-            self.logger.debug(f"更新请求体: {json.dumps(payload, indent=2, ensure_ascii=False)}")
+            self.logger.debug("更新请求体: %s", LazyJson(payload, indent=2), extra=PAYLOAD)
             result = self._handle_request('PUT', f"/v1/service-sources/{name}", json=payload)
             self.logger.info(f"成功更新服务来源: {name}")
+            self._remember(SERVICE_SOURCES, name, result)
             return result
         except Exception as e:
             self.logger.error(f"更新服务来源时出错: {str(e)}")
@@ -448,37 +658,45 @@ class HigressClient:
 
         try:
             # 检查路由是否已存在
-            try:
-                self.logger.info(f"检查路由是否存在: {name}")
-                existing = self._handle_request('GET', f"/v1/routes/{name}")
-                if existing:
-                    self.logger.info(f"路由 {name} 已存在，尝试更新...")
-                    return self._update_route(name, payload)
-            except Exception as check_e:
-                self.logger.info(f"路由 {name} 不存在，将创建新的")
-                self.logger.debug(f"检查异常: {str(check_e)}")
-
+            self.logger.info(f"检查路由是否存在: {name}")
+            current = self._lookup_existing(ROUTES, name, f"/v1/routes/{name}")
+            if current and self.reconcile:
+                # 跳过认证时期望路由上没有启用认证
+                expected = dict(payload)
+                expected.setdefault("authConfig", {"enabled": False})
+                if self._is_up_to_date(expected, current):
+                    self.logger.info(f"路由 {name} 无变化，跳过更新")
+                    return current
+            if current:
+                self.logger.info(f"路由 {name} 已存在，尝试更新...")
+                return self._update_route(name, payload, current)
+
+            self.logger.info(f"路由 {name} 不存在，将创建新的")
             self.logger.info(f"创建路由: {name}, 路径: /{service_name}")
             result = self._handle_request('POST', '/v1/routes', json=payload)
             self.logger.info(f"成功创建路由: {name}, 路径: /{service_name}")
+            self._remember(ROUTES, name, result)
             return result
         except Exception as e:
             self.logger.error(f"创建路由失败: {str(e)}")
             self.logger.error(traceback.format_exc())
             raise RuntimeError(f"创建路由失败: {str(e)}")
 
-    def _update_route(self, name, payload):
-        """更新已存在的路由"""
+    def _update_route(self, name, payload, current=None):
+        """更新已存在的路由，current 为已读取的当前状态时不再重复获取"""
         self._log_caller_info()
         try:
-            # 获取当前版本
-            self.logger.info(f"获取路由 {name} 当前版本")
-            current = self._handle_request('GET', f"/v1/routes/{name}")
-            self.logger.info(f"************************: {current}")
-            payload["version"] = current.get("data").get("version")
+            if current is None:
+                # 获取当前版本
+                self.logger.info(f"获取路由 {name} 当前版本")
+                current = self._handle_request('GET', f"/v1/routes/{name}")
+                self.logger.info(f"************************: {current}")
+                current = current.get("data")
+            payload["version"] = current.get("version")
             self.logger.info(f"更新路由 {name} 版本 {payload['version']}")
             result = self._handle_request('PUT', f"/v1/routes/{name}", json=payload)
             self.logger.info(f"成功更新路由: {name}")
+            self._remember(ROUTES, name, result)
             return result
         except Exception as e:
             self.logger.error(f"更新路由时出错: {str(e)}")
@@ -499,19 +717,26 @@ class HigressClient:
                 self.logger.error(f"无法加载配置文件 {yaml_config}: {str(e)}")
                 self.logger.error(traceback.format_exc())
                 raise ValueError(f"无法加载配置文件: {str(e)}")
+        elif isinstance(yaml_config, str):
+            # 已经渲染好的 YAML 文本（例如来自配置缓存），直接使用
+            self.logger.info("使用提供的 YAML 配置文本")
+            config_data = None
         else:
             # 否则假设直接提供了配置数据
             self.logger.info("使用提供的配置数据")
             config_data = yaml_config
 
         try:
-            # 尝试使用兼容性更好的方式转储 YAML
-            try:
-                # 首先尝试不使用 sort_keys 参数
-                raw_config = yaml.dump(config_data, allow_unicode=True)
-            except TypeError:
-                # 如果还有问题，尝试最简单的调用
-                raw_config = yaml.dump(config_data)
+            if config_data is None:
+                raw_config = yaml_config
+            else:
+                # 尝试使用兼容性更好的方式转储 YAML
+                try:
+                    # 首先尝试不使用 sort_keys 参数
+                    raw_config = yaml.dump(config_data, allow_unicode=True)
+                except TypeError:
+                    # 如果还有问题，尝试最简单的调用
+                    raw_config = yaml.dump(config_data)
 
             # 注释掉打印YAML配置的部分
             # self.logger.debug(f"MCP 配置 YAML:\n{raw_config}")
@@ -532,16 +757,22 @@ class HigressClient:
 
         try:
             # 检查插件是否已存在
-            try:
-                self.logger.info(f"检查路由 {route_name} 的 MCP 插件是否存在")
-                existing = self._handle_request('GET', f"/v1/routes/{route_name}/plugin-instances/mcp-server")
-                if existing:
-                    self.logger.info(f"路由 {route_name} 的 MCP 插件已存在，将更新配置...")
-                    payload["version"] = existing.get("version", 0) + 1
-                    self.logger.info(f"更新插件到版本 {payload['version']}")
-            except Exception as check_e:
+            self.logger.info(f"检查路由 {route_name} 的 MCP 插件是否存在")
+            existing = self._lookup_existing(PLUGIN_INSTANCES, route_name,
+                                             f"/v1/routes/{route_name}/plugin-instances/mcp-server",
+                                             required_key="rawConfigurations")
+            if existing and self.reconcile:
+                expected = dict(payload, rawConfigurations=self._normalize_raw_config(raw_config))
+                actual = dict(existing, rawConfigurations=self._normalize_raw_config(existing["rawConfigurations"]))
+                if self._is_up_to_date(expected, actual):
+                    self.logger.info(f"路由 {route_name} 的 MCP 插件配置无变化，跳过更新")
+                    return existing
+            if existing:
+                self.logger.info(f"路由 {route_name} 的 MCP 插件已存在，将更新配置...")
+                payload["version"] = existing.get("version", 0) + 1
+                self.logger.info(f"更新插件到版本 {payload['version']}")
+            else:
                 self.logger.info(f"路由 {route_name} 没有 MCP 插件，将创建新的")
-                self.logger.debug(f"检查异常: {str(check_e)}")
 
             self.logger.info(f"配置路由 {route_name} 的 MCP 插件")
             result = self._handle_request(
@@ -550,10 +781,11 @@ class HigressClient:
                 json=payload
             )
             self.logger.info(f"成功为路由 {route_name} 配置 MCP 插件")
+            self._remember(PLUGIN_INSTANCES, route_name, result, required_key="rawConfigurations")
             return result
         except Exception as e:
             self.logger.error(f"配置 MCP 插件失败: {str(e)}")
-            self.logger.debug(f"插件配置负载: {json.dumps(payload, indent=2, ensure_ascii=False)}")
+            self.logger.debug("插件配置负载: %s", LazyJson(payload, indent=2), extra=PAYLOAD)
             self.logger.error(traceback.format_exc())
             raise RuntimeError(f"配置 MCP 插件失败: {str(e)}")
 
@@ -679,73 +911,12 @@ class HigressClient:
                 yaml_content = f.read()
                 config = yaml.safe_load(yaml_content)
 
-            # 确保 server 部分存在
-            if 'server' not in config:
-                self.logger.warning(f"YAML 文件 {yaml_path} 中未找到 'server' 部分")
-                config['server'] = {}
-
-            # 添加或更新 server.config 部分
-            if 'config' not in config['server']:
-                config['server']['config'] = {}
-
-            # 设置 baseUrl (无论是否跳过鉴权都需要)
-            config['server']['config']['baseUrl'] = base_url
-
-            # 只有在不跳过鉴权时才设置 apikey
-            if not skip_auth:
-                config['server']['config']['apikey'] = api_key
-
             # 检查 tools 部分
             if 'tools' not in config:
                 self.logger.warning(f"YAML 文件 {yaml_path} 中未找到 'tools' 部分")
                 return yaml_path
 
-            # 修改每个工具
-            for tool in config['tools']:
-                if 'requestTemplate' in tool:
-                    # 修改 URL 使用模板变量 (无论是否跳过鉴权都需要)
-                    if 'url' in tool['requestTemplate']:
-                        original_url = tool['requestTemplate']['url']
-
-                        # 提取路径部分
-                        if original_url.startswith('http://') or original_url.startswith('https://'):
-                            # 绝对 URL，提取路径部分
-                            path_parts = original_url.split('/', 3)
-                            if len(path_parts) >= 4:
-                                path = path_parts[3]  # 提取路径部分
-                            else:
-                                path = ""
-                        else:
-                            # 相对路径，直接使用
-                            path = original_url.lstrip('/')
-
-                        # 构建新 URL 使用模板变量
-                        new_url = "{{.config.baseUrl}}/" + path
-                        tool['requestTemplate']['url'] = new_url
-                        self.logger.debug(f"URL 已修改: {original_url} -> {new_url}")
-
-                    # 只有在不跳过鉴权时才更新或添加授权头
-                    if not skip_auth:
-                        # 更新或添加授权头，使用模板变量
-                        if 'headers' not in tool['requestTemplate']:
-                            tool['requestTemplate']['headers'] = []
-
-                        # 检查是否已有授权头
-                        has_auth = False
-                        for header in tool['requestTemplate']['headers']:
-                            if header.get('key') == 'Authorization':
-                                has_auth = True
-                                header['value'] = "Bearer {{.config.apikey}}"
-                                self.logger.debug("已更新现有授权头")
-                                break
-
-                        # 如果没有授权头，添加一个
-                        if not has_auth:
-                            tool['requestTemplate']['headers'].append({
-                                'key': 'Authorization',
-                                'value': "Bearer {{.config.apikey}}"
-                            })
-                            self.logger.debug("已添加授权头")
+            apply_gateway_config(config, base_url, api_key, skip_auth, self.logger)
 
             # 保存修改后的 YAML
             with open(yaml_path, 'w', encoding='utf-8') as f:
@@ -790,17 +961,19 @@ class HigressClient:
 
     def fetch_openapi_spec(self, url):
         """获取 OpenAPI 规范文件"""
+        return self._fetch_spec(url).spec
+
+    def _fetch_spec(self, url):
+        """获取 OpenAPI 规范及其内容摘要，规范未变化时优先使用条件请求"""
         self._log_caller_info()
         self.logger.info(f"获取 OpenAPI 规范: {url}")
 
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            spec = response.json()
+            fetched = self.spec_fetcher.fetch(url)
             self.logger.info(f"成功获取 OpenAPI 规范: {url}")
             # 注释掉打印规范内容的部分
-            # self.logger.debug(f"规范内容: {json.dumps(spec, indent=2, ensure_ascii=False)}")
-            return spec
+            # self.logger.debug("规范内容: %s", LazyJson(fetched.spec, indent=2), extra=PAYLOAD)
+            return fetched
         except Exception as e:
             self.logger.error(f"获取 OpenAPI 规范失败: {url}")
             self.logger.error(f"错误: {str(e)}")
@@ -877,21 +1050,34 @@ class HigressClient:
               match_rule_type: "prefix"
           servers: []
         downstream:
-          connectionBufferLimits: 32768
+          connectionBufferLimits: ${downstream.connectionBufferLimits}
           http2:
-            initialConnectionWindowSize: 1048576
-            initialStreamWindowSize: 65535
-            maxConcurrentStreams: 100
-          idleTimeout: 180
-          maxRequestHeadersKb: 60
-          routeTimeout: 0
+            initialConnectionWindowSize: ${downstream.http2.initialConnectionWindowSize}
+            initialStreamWindowSize: ${downstream.http2.initialStreamWindowSize}
+            maxConcurrentStreams: ${downstream.http2.maxConcurrentStreams}
+          idleTimeout: ${downstream.idleTimeout}
+          maxRequestHeadersKb: ${downstream.maxRequestHeadersKb}
+          routeTimeout: ${downstream.routeTimeout}
         upstream:
-          connectionBufferLimits: 10485760
-          idleTimeout: 10
+          connectionBufferLimits: ${upstream.connectionBufferLimits}
+          idleTimeout: ${upstream.idleTimeout}
     """
 
         # 替换模板中的变量
         config_content = config_template.replace("${domain}", clean_domain)
+        if has_profile_placeholders(config_content):
+            for line in describe_profile(self.performance_profile):
+                logger.info(line)
+            config_content = render_profile(config_content, self.performance_profile)
+        else:
+            logger.warning("模板中没有性能参数占位符，性能配置不生效")
+
+        # 内容未变化时不重写文件，避免触发 Higress 重新加载配置
+        if os.path.exists(config_file_path):
+            with open(config_file_path, 'r', encoding='utf-8') as f:
+                if f.read() == config_content:
+                    logger.info("higress-config.yaml 内容无变化，跳过写入")
+                    return config_file_path
 
         # 写入文件
         try:
@@ -904,7 +1090,291 @@ class HigressClient:
             logger.error(traceback.format_exc())
             raise RuntimeError(f"创建/覆盖 higress-config.yaml 文件失败: {str(e)}")
 
-    def setup_from_config(self, config_path, openapi_base_url="http://localhost:8000", api_key=None, domain=None, skip_auth=False):
+    def provision_tool(self, tool, openapi_base_url, api_key, domain, skip_auth=False, converter="binary"):
+        """
+        为单个工具完成 OpenAPI 获取、MCP 转换、服务来源、路由和插件配置
+
+        Returns:
+            dict: 该工具的配置结果
+        """
+        self.logger.info(f"配置工具: {tool}")
+
+        # 使用工具名称作为服务名称
+        server_name = tool
+
+        with self.tracer.span("provision", tool=tool):
+            prepared = self.prepared_configs.pop(tool, None)
+            if prepared is not None:
+                self.logger.info(f"使用预先生成的 {tool} MCP 配置")
+                tool_spec_url, mcp_yaml_path, mcp_config, spec_digest = prepared
+            else:
+                # 获取工具的 OpenAPI 规范
+                tool_spec_url = f"{openapi_base_url}/{tool}/openapi.json"
+                self.logger.info(f"获取工具 OpenAPI 规范: {tool_spec_url}")
+                with self.tracer.span("spec_fetch", tool=tool):
+                    fetched = self._fetch_spec(tool_spec_url)
+                spec_digest = fetched.digest
+
+            fingerprint = None
+            if self.state_store is not None:
+                fingerprint = tool_fingerprint(spec_digest, openapi_base_url, api_key, skip_auth, converter, domain)
+                if self._matches_shared_state(tool, fingerprint):
+                    self.logger.info(f"工具 {tool} 的配置与共享状态一致，跳过")
+                    return {"name": tool, "spec_url": tool_spec_url, "status": "unchanged"}
+
+            if prepared is None:
+                with self.tracer.span("mcp_convert", tool=tool):
+                    mcp_yaml_path, mcp_config = self.generate_mcp_config(
+                        server_name, fetched.spec, openapi_base_url, api_key, skip_auth, converter, fetched.digest)
+
+            if self.state_lease is not None:
+                self.state_lease.ensure()
+
+            # 创建服务来源
+            self.logger.info(f"为 {tool} 创建服务来源")
+            with self.tracer.span("service_source", tool=tool):
+                service = self.create_service_source(name=server_name, domain=domain)
+
+            # 创建路由
+            self.logger.info(f"为 {tool} 创建路由")
+            with self.tracer.span("route", tool=tool):
+                route = self.create_route(name=server_name, service_name=server_name, skip_auth=skip_auth)
+
+            # 应用 MCP 插件配置
+            self.logger.info(f"为 {tool} 配置 MCP 插件")
+            with self.tracer.span("plugin", tool=tool):
+                plugin = self.configure_mcp_plugin(server_name, mcp_config)
+
+            if self.state_store is not None:
+                self._save_shared_state(tool, fingerprint, service, route, plugin)
+
+        self.logger.info(f"工具 {tool} 配置成功")
+
+        return {
+            "name": tool,
+            "spec_url": tool_spec_url,
+            "mcp_yaml_path": mcp_yaml_path,
+            "service": service,
+            "route": route,
+            "plugin": plugin
+        }
+
+    @staticmethod
+    def _resource_version(resource):
+        if isinstance(resource, dict) and isinstance(resource.get("data"), dict):
+            resource = resource["data"]
+        return resource.get("version") if isinstance(resource, dict) else None
+
+    def _matches_shared_state(self, tool, fingerprint):
+        """共享状态中的指纹一致，且资源快照中的 version 与记录一致（没有快照时只比较指纹）"""
+        state = self.state_store.get_tool(tool)
+        if state is None or state.fingerprint != fingerprint:
+            return False
+        if self.inventory is None:
+            return True
+        versions = state.versions or {}
+        for kind, key in ((SERVICE_SOURCES, "service"), (ROUTES, "route"), (PLUGIN_INSTANCES, "plugin")):
+            if not self.inventory.knows(kind, tool):
+                continue
+            current = self.inventory.get(kind, tool)
+            if current is None or current.get("version") != versions.get(key):
+                self.logger.info(f"工具 {tool} 的 {kind} 版本与共享状态不一致，重新配置")
+                return False
+        return True
+
+    def _save_shared_state(self, tool, fingerprint, service, route, plugin):
+        """记录工具的指纹和资源版本；token 已过期时抛出 LeaseLostError，由新的持有者重新配置"""
+        owner = self.state_lease.owner if self.state_lease is not None else None
+        token = self.state_lease.token if self.state_lease is not None else None
+        state = ToolState(fingerprint, {key: self._resource_version(resource) for key, resource in
+                                        (("service", service), ("route", route), ("plugin", plugin))},
+                          owner, token, time.time())
+        if not self.state_store.put_tool(tool, state, self.state_lease):
+            raise LeaseLostError(f"配置锁 token {token} 已被更新的持有者取代，未写入 {tool} 的共享状态")
+
+    def generate_mcp_config(self, server_name, tool_spec, openapi_base_url, api_key, skip_auth=False,
+                            converter="binary", spec_digest=None):
+        """
+        将 OpenAPI 规范转换为最终的 MCP 配置，优先使用按内容寻址的配置缓存
+
+        spec_digest 为规范获取时已算好的内容摘要，提供时不再重新哈希规范。
+
+        Returns:
+            tuple: (MCP YAML 文件路径或 None, 可传给 configure_mcp_plugin 的配置)
+        """
+        cache_key = None
+        if self.config_cache:
+            cache_key = self.config_cache.make_key(tool_spec, openapi_base_url, api_key, skip_auth, converter,
+                                                   spec_digest)
+            cached_yaml = self.config_cache.get(cache_key, server_name)
+            if cached_yaml is not None:
+                self.logger.info(f"{server_name} 的 OpenAPI 规范未变化，使用缓存的 MCP 配置")
+                return None, cached_yaml
+
+        if converter == "native":
+            # 进程内转换并完成 URL 前缀和授权头改写
+            self.logger.info(f"在进程内将 {server_name} OpenAPI 规范转换为 MCP 配置")
+            mcp_yaml_path = None
+            mcp_config = build_mcp_config(tool_spec, server_name, openapi_base_url, api_key, skip_auth, self.logger)
+            if cache_key:
+                self.config_cache.put(cache_key, mcp_config)
+        else:
+            # 将规范保存为临时 JSON 文件
+            temp_dir = tempfile.mkdtemp(prefix=f"higress_mcp_{server_name}_")
+            json_file_path = os.path.join(temp_dir, f"{server_name}.json")
+
+            with open(json_file_path, 'w', encoding='utf-8') as f:
+                json.dump(tool_spec, f, ensure_ascii=False, indent=2)
+
+            self.logger.info(f"工具 OpenAPI 规范保存到: {json_file_path}")
+
+            # 转换 OpenAPI JSON 为 MCP YAML
+            self.logger.info(f"转换 {server_name} OpenAPI 规范为 MCP YAML")
+            mcp_yaml_path = self.convert_openapi_to_mcp(json_file_path, server_name)
+            self.logger.info(f"MCP 配置文件生成在: {mcp_yaml_path}")
+
+            # 修改 MCP YAML，添加授权头和修改 URL 前缀
+            self.logger.info(f"修改 MCP YAML 文件，添加授权头和修改 URL 前缀")
+            mcp_yaml_path = self.modify_mcp_yaml(
+                mcp_yaml_path,
+                api_key,
+                base_url=openapi_base_url,
+                skip_auth=skip_auth
+            )
+            mcp_config = mcp_yaml_path
+            if cache_key:
+                with open(mcp_yaml_path, 'r', encoding='utf-8') as f:
+                    self.config_cache.put(cache_key, yaml.safe_load(f))
+
+        return mcp_yaml_path, mcp_config
+
+    def prefetch_tool_configs(self, tools, openapi_base_url, api_key, skip_auth=False, converter="binary",
+                              concurrency=1, timeout=DEFAULT_READY_TIMEOUT, stop_event=None):
+        """
+        等待 mcpo 上各工具的 OpenAPI 规范可用，随即生成 MCP 配置，不需要 Higress 已就绪
+
+        单个工具失败只记录警告，配置该工具时会重新获取。
+
+        Returns:
+            int: 预先生成配置的工具数
+        """
+        def prepare(tool):
+            tool_spec_url = f"{openapi_base_url}/{tool}/openapi.json"
+            try:
+                # 包含等待 mcpo 启动的时间
+                with self.tracer.span("spec_wait", tool=tool):
+                    fetched = wait_until_ready(f"mcpo/{tool}", lambda: self.spec_fetcher.fetch(tool_spec_url),
+                                               timeout, logger=self.logger, stop_event=stop_event)
+                with self.tracer.span("mcp_convert", tool=tool):
+                    mcp_yaml_path, mcp_config = self.generate_mcp_config(
+                        tool, fetched.spec, openapi_base_url, api_key, skip_auth, converter, fetched.digest)
+            except Exception as e:
+                self.logger.warning(f"预先生成 {tool} 的 MCP 配置失败，配置时将重新获取: {str(e)}")
+                return
+            self.prepared_configs[tool] = (tool_spec_url, mcp_yaml_path, mcp_config, fetched.digest)
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="prefetch") as executor:
+            list(executor.map(prepare, tools))
+        self.logger.info(f"已预先生成 {len(self.prepared_configs)}/{len(tools)} 个工具的 MCP 配置")
+        return len(self.prepared_configs)
+
+    def _provision_tool_safely(self, tool, openapi_base_url, api_key, domain, skip_auth, converter):
+        """配置单个工具，失败时返回错误记录而不是抛出异常"""
+        try:
+            return self.provision_tool(tool, openapi_base_url, api_key, domain, skip_auth, converter)
+        except Exception as e:
+            self.logger.error(f"配置工具 {tool} 失败: {str(e)}")
+            self.logger.error(traceback.format_exc())
+            # 继续处理其他工具，不中断整个流程
+            return {
+                "name": tool,
+                "error": str(e),
+                "status": "failed"
+            }
+
+    def _provision_tools_concurrently(self, tools, concurrency, openapi_base_url, api_key, domain, skip_auth,
+                                      converter):
+        """
+        使用有界线程池并发配置工具
+
+        结果列表保持与 tools 相同的顺序，单个工具失败不影响其他工具。
+        """
+        # 连接池大小与并发数保持一致，避免线程间争抢连接
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        results = [None] * len(tools)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="provision") as executor:
+            futures = {
+                executor.submit(self._provision_tool_safely, tool, openapi_base_url, api_key, domain, skip_auth,
+                                converter): index
+                for index, tool in enumerate(tools)
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        return results
+
+    def _provision_tools(self, tools, concurrency, openapi_base_url, api_key, domain, skip_auth, converter):
+        """按并发数选择逐个或并发配置工具，结果顺序与 tools 一致"""
+        if concurrency > 1 and len(tools) > 1:
+            return self._provision_tools_concurrently(
+                tools, concurrency, openapi_base_url, api_key, domain, skip_auth, converter)
+        return [self._provision_tool_safely(tool, openapi_base_url, api_key, domain, skip_auth, converter)
+                for tool in tools]
+
+    def delete_tool(self, tool):
+        """删除工具的 MCP 插件实例、路由和服务来源，资源已不存在时视为成功"""
+        self._log_caller_info()
+        for kind, endpoint in (
+                (PLUGIN_INSTANCES, f"/v1/routes/{tool}/plugin-instances/mcp-server"),
+                (ROUTES, f"/v1/routes/{tool}"),
+                (SERVICE_SOURCES, f"/v1/service-sources/{tool}"),
+        ):
+            if self.inventory is not None and self.inventory.knows(kind, tool) \
+                    and self.inventory.get(kind, tool) is None:
+                continue
+            response = self._handle_request('DELETE', endpoint)
+            if isinstance(response, dict) and response.get("success") is False:
+                message = str(response.get("message", ""))
+                if "not found" not in message.lower() and "不存在" not in message:
+                    raise RuntimeError(f"删除 {endpoint} 失败: {message}")
+            if self.inventory is not None:
+                self.inventory.set(kind, tool, None)
+        if self.state_store is not None:
+            self.state_store.delete_tool(tool, self.state_lease)
+        self.logger.info(f"工具 {tool} 已从 Higress 删除")
+
+    def sync_tools(self, changes, openapi_base_url, api_key, domain, skip_auth=False, concurrency=1,
+                   converter="binary", use_inventory=True):
+        """
+        增量同步配置文件的变化：只配置新增和修改的工具，删除已移除的工具
+
+        Args:
+            changes: config_watcher.ToolChanges
+
+        Returns:
+            list: 同步失败的工具名
+        """
+        self._log_caller_info(logging.INFO)
+        tools = changes.added + changes.changed
+        if use_inventory:
+            self.load_inventory(tools, concurrency)
+
+        failed = [result["name"] for result in
+                  self._provision_tools(tools, concurrency, openapi_base_url, api_key, domain, skip_auth, converter)
+                  if "error" in result]
+
+        for tool in changes.removed:
+            try:
+                self.delete_tool(tool)
+            except Exception as e:
+                self.logger.error(f"删除工具 {tool} 失败: {str(e)}")
+                failed.append(tool)
+        return failed
+
+    def setup_from_config(self, config_path, openapi_base_url="http://localhost:8000", api_key=None, domain=None,
+                          skip_auth=False, concurrency=1, converter="binary", use_inventory=True):
         """
         从 MCP 配置文件获取工具列表并配置所有工具
 
@@ -913,6 +1383,10 @@ class HigressClient:
             openapi_base_url: OpenAPI 服务的基础 URL
             api_key: API密钥
             domain: 域名
+            skip_auth: 是否跳过创建消费者和路由认证配置
+            concurrency: 并发配置工具的线程数，1 表示逐个配置
+            converter: native 使用进程内转换，binary 调用 ./openapi-to-mcp
+            use_inventory: 是否先批量读取资源快照，避免逐个资源查询
 
         Returns:
             dict: 包含操作结果的字典
@@ -934,11 +1408,17 @@ class HigressClient:
                 self.logger.warning("未找到工具列表，将退出")
                 return {"tools": [], "status": "no_tools_found"}
 
+            if use_inventory:
+                self.logger.info("读取 Higress 资源快照")
+                with self.tracer.span("inventory"):
+                    self.load_inventory(tools, concurrency)
+
             # 创建消费者 (只需要一个)
             if not skip_auth:
                 try:
                     self.logger.info("步骤 2: 创建/更新 Consumer")
-                    consumer = self.create_computenest_consumer(api_key)
+                    with self.tracer.span("consumer"):
+                        consumer = self.create_computenest_consumer(api_key)
                     result["consumer"] = consumer
                     self.logger.info("Consumer 创建/更新成功")
                 except Exception as e:
@@ -950,75 +1430,9 @@ class HigressClient:
                 result["consumer"] = {"status": "skipped"}
 
             # 步骤 3: 为每个工具获取 OpenAPI 规范并配置
-            for tool in tools:
-                try:
-                    self.logger.info(f"配置工具: {tool}")
-
-                    # 获取工具的 OpenAPI 规范
-                    tool_spec_url = f"{openapi_base_url}/{tool}/openapi.json"
-                    self.logger.info(f"获取工具 OpenAPI 规范: {tool_spec_url}")
-                    tool_spec = self.fetch_openapi_spec(tool_spec_url)
-
-                    # 将规范保存为临时 JSON 文件
-                    temp_dir = tempfile.mkdtemp(prefix=f"higress_mcp_{tool}_")
-                    json_file_path = os.path.join(temp_dir, f"{tool}.json")
-
-                    with open(json_file_path, 'w', encoding='utf-8') as f:
-                        json.dump(tool_spec, f, ensure_ascii=False, indent=2)
-
-                    self.logger.info(f"工具 OpenAPI 规范保存到: {json_file_path}")
-
-                    # 使用工具名称作为服务名称
-                    server_name = tool
-
-                    # 转换 OpenAPI JSON 为 MCP YAML
-                    self.logger.info(f"转换 {tool} OpenAPI 规范为 MCP YAML")
-                    mcp_yaml_path = self.convert_openapi_to_mcp(json_file_path, server_name)
-                    self.logger.info(f"MCP 配置文件生成在: {mcp_yaml_path}")
-
-                    # 修改 MCP YAML，添加授权头和修改 URL 前缀
-                    self.logger.info(f"修改 MCP YAML 文件，添加授权头和修改 URL 前缀")
-                    mcp_yaml_path = self.modify_mcp_yaml(
-                        mcp_yaml_path,
-                        api_key,
-                        base_url=openapi_base_url,
-                        skip_auth=skip_auth
-                    )
-
-                    # 创建服务来源
-                    self.logger.info(f"为 {tool} 创建服务来源")
-                    service = self.create_service_source(name=server_name, domain=domain)
-
-                    # 创建路由
-                    self.logger.info(f"为 {tool} 创建路由")
-                    route = self.create_route(name=server_name, service_name=server_name, skip_auth=skip_auth)
-
-                    # 应用 MCP 插件配置
-                    self.logger.info(f"为 {tool} 配置 MCP 插件")
-                    plugin = self.configure_mcp_plugin(server_name, mcp_yaml_path)
-
-                    # 记录结果
-                    tool_result = {
-                        "name": tool,
-                        "spec_url": tool_spec_url,
-                        "mcp_yaml_path": mcp_yaml_path,
-                        "service": service,
-                        "route": route,
-                        "plugin": plugin
-                    }
-                    result["tools"].append(tool_result)
-
-                    self.logger.info(f"工具 {tool} 配置成功")
-
-                except Exception as e:
-                    self.logger.error(f"配置工具 {tool} 失败: {str(e)}")
-                    self.logger.error(traceback.format_exc())
-                    # 继续处理其他工具，不中断整个流程
-                    result["tools"].append({
-                        "name": tool,
-                        "error": str(e),
-                        "status": "failed"
-                    })
+            self.logger.info(f"步骤 3: 配置 {len(tools)} 个工具，并发数: {concurrency}")
+            result["tools"] = self._provision_tools(tools, concurrency, openapi_base_url, api_key, domain, skip_auth,
+                                                    converter)
 
             self.logger.info(
                 f"完成从配置文件配置工具，成功配置 {len([t for t in result['tools'] if 'error' not in t])} 个工具")
@@ -1030,6 +1444,9 @@ class HigressClient:
             self.logger.error(traceback.format_exc())
             raise RuntimeError(f"从配置文件配置工具失败: {str(e)}")
 
+        finally:
+            self.tracer.log_summary(self.logger, "各阶段及接口耗时")
+
 
 
 
@@ -1052,6 +1469,65 @@ def parse_args():
     parser.add_argument('--verbose', '-v', action='store_true', help='启用详细日志')
     parser.add_argument('--debug', '-d', action='store_true', help='启用调试模式')
     parser.add_argument('--skip-auth', action='store_true', help='跳过创建消费者和路由认证配置')
+    parser.add_argument('--concurrency', type=int, default=1, help='并发配置工具的线程数，1 表示逐个配置')
+    parser.add_argument('--config-cache-dir', default=DEFAULT_CONFIG_CACHE_DIR,
+                        help='按 OpenAPI 内容缓存生成的 MCP 配置的目录')
+    parser.add_argument('--no-config-cache', action='store_true', help='不使用 MCP 配置缓存，每次都重新转换')
+    parser.add_argument('--spec-store-dir', default=DEFAULT_SPEC_STORE_DIR,
+                        help='保存 OpenAPI 规范及其 ETag/Last-Modified 的目录，用于条件请求')
+    parser.add_argument('--no-spec-store', action='store_true', help='不在磁盘保存 OpenAPI 规范')
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help='控制台请求遇到限流、网关错误或连接失败时的最大尝试次数（POST 只在限流时重试）')
+    parser.add_argument('--retry-budget', type=int, default=DEFAULT_RETRY_BUDGET, help='本次运行允许的重试总次数')
+    parser.add_argument('--no-inventory', action='store_true',
+                        help='不预先批量读取资源快照，逐个资源查询是否存在')
+    parser.add_argument('--reconcile', action='store_true',
+                        help='对比当前状态与期望配置，只对有变化的资源发起写请求')
+    parser.add_argument('--perf-profile', default=SMALL, choices=PROFILE_CHOICES,
+                        help='higress-config.yaml 的连接参数：small 为原模板的固定值，已有部署的 configmap 保持不变；'
+                             'auto 按 CPU、内存、工具数和预期 SSE 会话数推导，在多核主机上会改写 configmap 并触发 Higress 重新加载')
+    parser.add_argument('--expected-sse-sessions', type=int,
+                        help='--perf-profile auto 使用的预期并发 SSE 会话数，默认按 CPU 核数估算')
+    parser.add_argument('--perf-overrides',
+                        help='显式指定连接参数的 YAML/JSON 文件，例如 {downstream: {http2: {maxConcurrentStreams: 512}}}')
+    parser.add_argument('--converter', default='binary', choices=['binary', 'native'],
+                        help='OpenAPI 到 MCP 的转换方式：binary 调用 ./openapi-to-mcp，native 进程内转换'
+                             '（converter_parity.py 的样例全部录制并一致后才可使用）')
+    parser.add_argument('--wait-ready', action='store_true',
+                        help='先并发等待 mcpo、Higress 控制台和 Redis 就绪（指数退避），mcpo 就绪后即开始生成 MCP 配置')
+    parser.add_argument('--ready-timeout', type=float, default=DEFAULT_READY_TIMEOUT,
+                        help='--wait-ready 的最长等待秒数')
+    parser.add_argument('--redis-address', help='--wait-ready 探测的 Redis 地址 host[:port]，默认为 --domain 的主机和 6379')
+    parser.add_argument('--state',
+                        help='多节点共享配置状态的后端：redis://[:密码@]主机:6379/库，或 memory（仅本进程）；'
+                             '设置后配置期间持有分布式锁，指纹和资源版本未变化的工具直接跳过')
+    parser.add_argument('--state-prefix', default=DEFAULT_STATE_PREFIX, help='共享状态在 Redis 中的键前缀')
+    parser.add_argument('--state-lock-ttl', type=float, default=DEFAULT_LEASE_TTL,
+                        help='配置锁的租约秒数，持有期间每三分之一租约续期一次')
+    parser.add_argument('--state-lock-wait', type=float, default=DEFAULT_LOCK_WAIT,
+                        help='等待其他节点释放配置锁的最长秒数')
+    parser.add_argument('--trace-file', help='将各阶段和接口调用的耗时时间线写入该文件')
+    parser.add_argument('--trace-format', default=CHROME, choices=TRACE_FORMATS,
+                        help='时间线格式：chrome 可在 chrome://tracing 或 Perfetto 中打开，otlp 为 OTLP-JSON')
+    parser.add_argument('--log-max-bytes', type=int, default=DEFAULT_MAX_BYTES,
+                        help='higress_client.log 超过该字节数时轮转，0 表示不轮转')
+    parser.add_argument('--log-backups', type=int, default=DEFAULT_BACKUP_COUNT, help='保留的轮转日志文件个数')
+    parser.add_argument('--log-payload-limit', type=int, default=0,
+                        help='请求体/响应体日志最多记录的字符数，超出部分截断，0 表示不截断')
+    parser.add_argument('--log-payload-sample', type=int, default=1,
+                        help='请求体/响应体日志每 N 条记录一条，1 表示全部记录')
+    parser.add_argument('--watch', action='store_true',
+                        help='完成首次配置后持续监听配置文件，只同步新增、修改和删除的工具（增量同步按对比模式执行）；'
+                             '有新增或修改的工具时先用 --mcpo-reload-command 重新加载 mcpo')
+    parser.add_argument('--watch-debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help='监听模式下合并连续修改的防抖秒数')
+    parser.add_argument('--watch-poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='inotify 不可用时轮询配置文件的间隔秒数')
+    parser.add_argument('--watch-polling', action='store_true', help='监听模式下不使用 inotify，直接轮询')
+    parser.add_argument('--mcpo-reload-command', default=DEFAULT_MCPO_RELOAD_COMMAND,
+                        help='监听模式下新增或修改工具时重新加载 mcpo 的命令；mcpo 只在启动时读取配置，'
+                             '重启容器会重新执行工具预装和配置改写。为空时不重新加载，新增和修改的工具'
+                             '要等 mcpo 容器重启后才会生效，在此之前同步会失败并定期重试')
 
     args = parser.parse_args()
 
@@ -1059,12 +1535,132 @@ def parse_args():
     if not args.skip_auth and not args.api_key:
         parser.error("在不使用 --skip-auth 时，--api-key 是必需的")
 
+    if args.concurrency < 1:
+        parser.error("--concurrency 必须大于等于 1")
+
+    if args.expected_sse_sessions is not None and args.expected_sse_sessions < 1:
+        parser.error("--expected-sse-sessions 必须大于等于 1")
+
+    if args.converter == 'native':
+        converter_error = native_converter_error()
+        if converter_error:
+            parser.error(converter_error)
+
     # 如果跳过鉴权且未提供 API 密钥，则使用默认值 "admin"
     if args.skip_auth and not args.api_key:
         args.api_key = "admin"
 
     return args
 
+def wait_for_services(client, args, logger):
+    """
+    并发等待 Higress 控制台和 Redis 就绪并登录，同时在 mcpo 就绪后预先生成各工具的 MCP 配置
+    """
+    tools = list(load_tool_settings(args.config))
+    redis_address = args.redis_address or args.domain.split("://")[-1].split(":")[0]
+    started = time.monotonic()
+
+    with client.tracer.span("wait_ready"), ReadinessOrchestrator(args.ready_timeout, logger=logger) as orchestrator:
+        orchestrator.probe("Higress 控制台", http_check(f"{client.base_url}/health"))
+        orchestrator.probe("Redis", redis_check(*split_address(redis_address, DEFAULT_REDIS_PORT)))
+        orchestrator.submit("MCP 配置预生成", client.prefetch_tool_configs, tools, args.openapi_url, args.api_key,
+                            args.skip_auth, args.converter, args.concurrency, args.ready_timeout,
+                            orchestrator.stop_event)
+
+        orchestrator.wait_all(["Higress 控制台", "Redis"])
+        # /health 可用后系统初始化和登录仍可能短暂失败，同样按退避重试
+        wait_until_ready("Higress 登录", client.connect, args.ready_timeout, logger=logger)
+        orchestrator.wait_all(["MCP 配置预生成"])
+
+    logger.info(f"所有依赖服务已就绪，总等待 {time.monotonic() - started:.1f} 秒")
+
+
+@contextmanager
+def provisioning_lock(client, args, logger):
+    """配置期间持有共享状态中的配置锁，未设置 --state 时不加锁"""
+    if client.state_store is None:
+        yield
+        return
+    with client.state_store.acquire(PROVISION_LOCK, ttl=args.state_lock_ttl, wait=args.state_lock_wait,
+                                    logger=logger) as lease:
+        client.state_lease = lease
+        try:
+            yield
+        finally:
+            client.state_lease = None
+
+
+def export_trace(client, args, logger):
+    """按 --trace-file 导出耗时时间线，导出失败不影响配置结果"""
+    if not args.trace_file:
+        return
+    try:
+        client.tracer.write(args.trace_file, args.trace_format)
+        logger.info(f"耗时时间线已写入: {args.trace_file} ({args.trace_format})")
+    except (OSError, ValueError) as e:
+        logger.warning(f"写入耗时时间线失败: {str(e)}")
+
+
+def reload_mcpo(args, tools, logger):
+    """
+    执行 --mcpo-reload-command 重新加载 mcpo，并等待指定工具的 OpenAPI 可用
+
+    Returns:
+        list: 在 --ready-timeout 内仍未提供 OpenAPI 的工具
+    """
+    logger.info(f"重新加载 mcpo: {args.mcpo_reload_command}")
+    result = subprocess.run(shlex.split(args.mcpo_reload_command), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"重新加载 mcpo 失败 (返回码 {result.returncode}): {result.stderr.strip()}")
+
+    not_ready = []
+    with ReadinessOrchestrator(args.ready_timeout, logger=logger) as orchestrator:
+        futures = {tool: orchestrator.probe(f"{tool} OpenAPI", openapi_check(f"{args.openapi_url}/{tool}/openapi.json"))
+                   for tool in tools}
+        for tool, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"mcpo 重新加载后工具 {tool} 仍不可用: {e}")
+                not_ready.append(tool)
+    return not_ready
+
+
+def watch_and_sync(client, args, initial_settings, tool_results, logger):
+    """监听配置文件，变化后按需重新加载 mcpo 并增量同步到 Higress，直到收到中断信号"""
+    succeeded = {tool['name'] for tool in tool_results if 'error' not in tool}
+    # 首次配置失败的工具不计入基准，会在第一次同步时作为新增工具重试
+    applied = {name: settings for name, settings in initial_settings.items() if name in succeeded}
+    client.reconcile = True
+    # mcpo 当前加载的 mcpServers；与期望配置一致时（例如失败重试）不再重复重启
+    loaded = {"settings": initial_settings}
+
+    def sync(changes, desired):
+        not_ready = []
+        to_load = changes.added + changes.changed
+        if to_load and args.mcpo_reload_command and desired != loaded["settings"]:
+            not_ready = reload_mcpo(args, to_load, logger)
+            loaded["settings"] = desired
+        if not_ready:
+            # 未就绪的工具本次不同步，记为失败，按重试间隔再次尝试
+            changes = ToolChanges([name for name in changes.added if name not in not_ready],
+                                  [name for name in changes.changed if name not in not_ready], changes.removed)
+        # 只在同步期间持有配置锁，空闲监听时不阻塞其他节点
+        with provisioning_lock(client, args, logger):
+            failed = client.sync_tools(changes, args.openapi_url, args.api_key, args.domain, args.skip_auth,
+                                       args.concurrency, args.converter, not args.no_inventory)
+        return list(failed) + not_ready
+
+    print(f"监听配置文件变化: {args.config} (Ctrl+C 退出)")
+    try:
+        watch_config(args.config, sync, applied, debounce=args.watch_debounce,
+                     poll_interval=args.watch_poll_interval, use_inotify=not args.watch_polling, logger=logger)
+    except KeyboardInterrupt:
+        logger.info("收到中断信号，停止监听")
+    return 0
+
+
 def main():
     """主函数"""
     args = parse_args()
@@ -1072,25 +1668,23 @@ def main():
     # 设置根日志级别
     log_level = logging.DEBUG if args.debug or args.verbose else logging.INFO
 
-    # 配置根日志记录器
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(funcName)s() - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('higress_client.log', mode='w')  # 使用 'w' 模式覆盖旧日志
-        ]
-    )
-    # 为控制台处理程序单独设置日志级别
-    for handler in logging.getLogger().handlers:
-        if isinstance(handler, logging.StreamHandler) and handler.stream == sys.stdout:
-            handler.setLevel(log_level)
-        elif isinstance(handler, logging.FileHandler):
-            handler.setLevel(logging.DEBUG)
+    # 配置根日志记录器，控制台和文件写入由后台线程完成
+    DEFAULT_PIPELINE.configure(max_bytes=args.log_max_bytes, backup_count=args.log_backups,
+                               payload_limit=args.log_payload_limit, payload_sample=args.log_payload_sample)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(log_level)
+    root_formatter = logging.Formatter(
+        '%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(funcName)s() - %(message)s')
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(root_formatter)
+    # 每次运行从新文件开始，上一次的日志轮转为 higress_client.log.1
+    file_handler = DEFAULT_PIPELINE.file_handler('higress_client.log', root_formatter, logging.DEBUG, fresh=True)
+    DEFAULT_PIPELINE.install(root_logger, [console_handler, file_handler])
 
     logger = logging.getLogger("main")
     logger.info("Higress OpenAPI 到 MCP 配置工具启动")
 
+    client = None
     try:
         # 显示运行环境信息
         logger.info(f"Python 版本: {sys.version}")
@@ -1104,25 +1698,51 @@ def main():
             print(f"错误: 配置文件不存在: {args.config}", file=sys.stderr)
             return 1
 
+        # 监听模式以首次配置前读取的内容作为比较基准，配置期间的修改会在之后被识别出来
+        initial_settings = load_tool_settings(args.config) if args.watch else None
+
+        # 按主机规模和工具数生成 higress-config.yaml 的连接参数
+        performance_profile = build_profile(
+            args.perf_profile,
+            tool_count=len(initial_settings if initial_settings is not None else load_tool_settings(args.config)),
+            sse_sessions=args.expected_sse_sessions,
+            overrides=load_overrides(args.perf_overrides) if args.perf_overrides else None)
+
         # 初始化客户端并登录
         client = HigressClient(
             base_url=args.base_url,
             username=args.username,
             apikey=args.api_key,
             verbose=args.debug or args.verbose,
-            domain=args.domain
-        )
-
-        result = client.setup_from_config(
-            config_path=args.config,
-            openapi_base_url=args.openapi_url,
-            api_key=args.api_key,
             domain=args.domain,
-            skip_auth=args.skip_auth
+            config_cache=None if args.no_config_cache else MCPConfigCache(args.config_cache_dir),
+            reconcile=args.reconcile,
+            connect=not args.wait_ready,
+            spec_store_dir=None if args.no_spec_store else args.spec_store_dir,
+            retry_policy=RetryPolicy("Higress 控制台", max_attempts=args.max_attempts,
+                                     retry_budget=args.retry_budget, logger=logger),
+            performance_profile=performance_profile,
+            state_store=open_state_store(args.state, args.state_prefix) if args.state else None,
+            log_thread_name=args.concurrency > 1
         )
+        if args.wait_ready:
+            wait_for_services(client, args, logger)
+
+        with provisioning_lock(client, args, logger):
+            result = client.setup_from_config(
+                config_path=args.config,
+                openapi_base_url=args.openapi_url,
+                api_key=args.api_key,
+                domain=args.domain,
+                skip_auth=args.skip_auth,
+                concurrency=args.concurrency,
+                converter=args.converter,
+                use_inventory=not args.no_inventory
+            )
+        export_trace(client, args, logger)
 
         # 输出结果摘要
-        if result.get("status") == "no_tools_found":
+        if result.get("status") == "no_tools_found" and not args.watch:
             logger.warning("未找到任何工具，请检查配置文件")
             print("警告: 未找到任何工具，请检查配置文件")
             return 1
@@ -1131,14 +1751,30 @@ def main():
         total_count = len(result['tools'])
         logger.info(f"从配置文件配置完成: {success_count}/{total_count} 个工具成功")
         print(f"从配置文件配置完成: {success_count}/{total_count} 个工具成功")
+        if client.reconcile:
+            logger.info(f"对比模式: 本次共发起 {client.write_count} 次写请求")
+            print(f"对比模式: 本次共发起 {client.write_count} 次写请求")
+        if client.config_cache:
+            logger.info(f"MCP 配置缓存: 命中 {client.config_cache.hits} 个，未命中 {client.config_cache.misses} 个")
+        logger.info(f"OpenAPI 规范获取: {client.spec_fetcher.summary()}")
+        if client.state_store is not None:
+            unchanged = len([t for t in result['tools'] if t.get('status') == 'unchanged'])
+            logger.info(f"共享状态: {unchanged} 个工具与其他节点已完成的配置一致，已跳过")
+        if client.retry_policy.retries:
+            logger.info(f"控制台请求共重试 {client.retry_policy.retries} 次")
 
         # 输出详细结果
         for tool in result['tools']:
             if 'error' in tool:
                 print(f"  - {tool['name']}: 失败 ({tool['error']})")
+            elif tool.get('status') == 'unchanged':
+                print(f"  - {tool['name']}: 无变化，已跳过")
             else:
                 print(f"  - {tool['name']}: 成功")
 
+        if args.watch:
+            return watch_and_sync(client, args, initial_settings, result['tools'], logger)
+
         return 0
 
     except Exception as e:
@@ -1147,6 +1783,8 @@ def main():
         logger.error(traceback.format_exc())
         print(f"错误: {str(e)}", file=sys.stderr)
         print("查看 higress_client.log 获取详细错误信息", file=sys.stderr)
+        if client is not None:
+            export_trace(client, args, logger)
         return 1
 
 
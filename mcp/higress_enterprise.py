@@ -5,22 +5,72 @@ import json
 import os
 import subprocess
 import tempfile
+import threading
 import logging
 import base64
+import binascii
+import hashlib
+import re
 import yaml
-import requests
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 import argparse
 import sys
+import asyncio
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+
+from apig_pagination import DEFAULT_PAGE_SIZE, DEFAULT_PREFETCH, aiter_pages, iter_pages
+from config_watcher import DEFAULT_DEBOUNCE, DEFAULT_POLL_INTERVAL, load_tool_settings, watch_config
+from converter_parity import native_converter_error
+from apig_transport import CliTransport, create_transport
+from gateway_cache import DEFAULT_CACHE_PATH, DEFAULT_CACHE_TTL, GatewayDiscoveryCache
+from mcp_config_cache import DEFAULT_CONFIG_CACHE_DIR, SERVER_NAME_PLACEHOLDER, MCPConfigCache
+from openapi_to_mcp import apply_enterprise_gateway_config, convert_openapi, dump_mcp_yaml
+from retry_policy import DEFAULT_MAX_ATTEMPTS, DEFAULT_RETRY_BUDGET, RetryPolicy, classify_cli_result
+from spec_store import DEFAULT_SPEC_STORE_DIR, FetchedSpec, SpecFetcher
+from tracing import CHROME, TRACE_FORMATS, Tracer
+
+SHARED_SERVICE_NAME = "mcp-shared-service"
+# 共享挂载中 server.name 的前缀，后接配置哈希
+SHARED_SERVER_NAME_PREFIX = "mcp-shared-"
+# APIG 返回资源不存在时的错误特征，用于识别已失效的缓存ID
+_NOT_FOUND_PATTERN = re.compile(r"NotFound|Not Found|not exist|StatusCode:\s*404|HTTP 404|不存在")
 
 
 class MCPGatewayRegistrar:
     """MCP工具自动注册到阿里云AI网关的工具类"""
 
-    def __init__(self, region: str = "cn-hangzhou", log_level: str = "INFO", debug_response: bool = False):
+    def __init__(self, region: str = "cn-hangzhou", log_level: str = "INFO", debug_response: bool = False,
+                 transport=None, cache: GatewayDiscoveryCache = None, converter: str = "binary",
+                 config_cache: MCPConfigCache = None, concurrency: int = 4, shared_attachments: bool = False,
+                 spec_fetcher: SpecFetcher = None, retry_policy: RetryPolicy = None, tracer: Tracer = None):
         self.region = region
         self.debug_response = debug_response
         self.logger = self._setup_logger(log_level)
+        # 默认使用 ./aliyun CLI，可替换为进程内签名的 HttpTransport
+        self.transport = transport or CliTransport(region, self.logger)
+        # 网关发现结果缓存，为空时每次都重新查询
+        self.cache = cache
+        # 本次运行中直接取自缓存的 (gateway_id, key)，资源不存在时只需清除这些缓存项
+        self._cache_hits = set()
+        # native 进程内转换OpenAPI，binary 调用 ./openapi-to-mcp
+        self.converter = converter
+        # 按OpenAPI内容寻址的MCP配置缓存，为空时每次都重新转换
+        self.config_cache = config_cache
+        # 清理删除等可并行操作的最大并发数
+        self.concurrency = max(1, concurrency)
+        # 配置相同的工具共用一个插件挂载，按配置哈希分组
+        self.shared_attachments = shared_attachments
+        # 多个路由同时从同一个共享挂载拆出时，路由列表的读改写需要串行
+        self._detach_lock = threading.Lock()
+        # 列表接口已知总页数时并行预取的页数
+        self.page_prefetch = DEFAULT_PREFETCH
+        # 规范获取复用同一个连接池，并按 ETag/内容摘要识别未变化的规范
+        self.spec_fetcher = spec_fetcher or SpecFetcher(None, pool_size=self.concurrency, logger=self.logger)
+        # 限流、服务暂时不可用时的重试、重试预算和熔断，所有APIG调用共用
+        self.retry_policy = retry_policy or RetryPolicy("APIG", logger=self.logger)
+        # 各阶段和每次APIG调用的耗时记录
+        self.tracer = tracer or Tracer("mcp-gateway-registrar")
 
     def _setup_logger(self, log_level: str) -> logging.Logger:
         """设置日志记录器"""
@@ -33,83 +83,120 @@ class MCPGatewayRegistrar:
             logger.addHandler(handler)
         return logger
 
-    def _execute_aliyun_cli(self, method: str, endpoint: str, body: Dict = None, **params) -> Dict[str, Any]:
-        """统一的阿里云CLI命令执行"""
-        command = ["./aliyun", "apig", method, endpoint, "--endpoint", f"apig.{self.region}.aliyuncs.com"]
-        # 添加参数
-        for key, value in params.items():
-            if value is not None:
-                command.extend([f"--{key}", str(value)])
-
-        # 添加请求体
-        if body:
-            command.extend(["--body", json.dumps(body)])
-
-        command.extend(["--header", "Content-Type=application/json;"])
-        try:
-            self.logger.info(f"执行CLI: {method} {endpoint}")
-            # 使用兼容Python 3.6的写法
-            result = subprocess.run(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                check=True
-            )
-
-            response = json.loads(result.stdout) if result.stdout else {}
-
-            if self.debug_response:
-                print(f"\n=== {method} {endpoint} 响应 ===")
-                print(json.dumps(response, indent=2, ensure_ascii=False))
-                print("=== 响应结束 ===\n")
-
-            return response
-
-        except subprocess.CalledProcessError as e:
-            error_msg = f"{method} {endpoint} 失败: {e.stderr}"
+    def _parse_cli_output(self, method: str, endpoint: str, returncode: int, stdout: str, stderr: str) -> Dict[str, Any]:
+        """解析阿里云CLI命令输出，失败时抛出RuntimeError"""
+        if returncode != 0:
+            error_msg = f"{method} {endpoint} 失败: {stderr}"
             self.logger.error(error_msg)
             if self.debug_response:
                 print(f"\n=== 错误详情 ===\n{error_msg}\n=== 错误结束 ===\n")
             raise RuntimeError(error_msg)
+
+        try:
+            response = json.loads(stdout) if stdout else {}
         except json.JSONDecodeError as e:
             error_msg = f"解析{method} {endpoint}响应失败: {str(e)}"
             self.logger.error(error_msg)
             if self.debug_response:
-                print(f"\n=== JSON解析错误 ===\n{error_msg}\n原始输出: {result.stdout}\n=== 错误结束 ===\n")
+                print(f"\n=== JSON解析错误 ===\n{error_msg}\n原始输出: {stdout}\n=== 错误结束 ===\n")
             raise RuntimeError(error_msg)
 
+        if self.debug_response:
+            print(f"\n=== {method} {endpoint} 响应 ===")
+            print(json.dumps(response, indent=2, ensure_ascii=False))
+            print("=== 响应结束 ===\n")
+
+        return response
+
+    def _execute_aliyun_cli(self, method: str, endpoint: str, body: Dict = None, **params) -> Dict[str, Any]:
+        """统一的APIG调用入口，具体由传输层执行"""
+        self.logger.info(f"执行CLI: {method} {endpoint}")
+        with self.tracer.request_span("apig", method, endpoint):
+            returncode, stdout, stderr = self.retry_policy.call(
+                method, endpoint, lambda: self.transport.execute(method, endpoint, body, params), classify_cli_result)
+        return self._parse_cli_output(method, endpoint, returncode, stdout, stderr)
+
     def _check_response(self, response: Dict, operation: str) -> Dict:
         """检查响应状态"""
         if response.get("code") not in ["Ok", "200"]:
             raise RuntimeError(f"{operation}失败: {response}")
         return response.get("data", {})
 
+    def _iter_items(self, endpoint: str, operation: str, page_size: int = DEFAULT_PAGE_SIZE,
+                    **params) -> Iterator[Dict]:
+        """按页惰性获取列表条目，调用方停止迭代后不再请求后续页"""
+        def fetch_page(page_number: int, size: int) -> Dict:
+            response = self._execute_aliyun_cli("GET", endpoint, pageNumber=str(page_number), pageSize=str(size),
+                                                **params)
+            return self._check_response(response, operation)
+
+        return iter_pages(fetch_page, page_size, self.page_prefetch)
+
+    def _list_items(self, endpoint: str, operation: str, **params) -> List[Dict]:
+        """获取列表接口的全部条目"""
+        return list(self._iter_items(endpoint, operation, **params))
+
     def _find_items_by_name(self, gateway_id: str, endpoint: str, name: str, **extra_params) -> List[Dict]:
         """通用的按名称查找资源方法"""
         try:
-            response = self._execute_aliyun_cli("GET", endpoint,
-                                                gatewayId=gateway_id,
-                                                gatewayType="AI",
-                                                name=name,
-                                                **extra_params)
-            data = self._check_response(response, f"查询{endpoint}")
-            return data.get("items", [])
+            return self._list_items(endpoint, f"查询{endpoint}",
+                                    gatewayId=gateway_id,
+                                    gatewayType="AI",
+                                    name=name,
+                                    **extra_params)
         except Exception:
             return []
 
+    def _cached_lookup(self, gateway_id: str, key: str, loader) -> Any:
+        """优先从发现缓存读取，未命中时调用loader并回写缓存"""
+        if self.cache:
+            value = self.cache.get(self.region, gateway_id, key)
+            if value:
+                self.logger.info(f"使用缓存的{key}: {value}")
+                self._cache_hits.add((gateway_id, key))
+                return value
+        self._cache_hits.discard((gateway_id, key))
+        value = loader(gateway_id)
+        if self.cache and value:
+            self.cache.set(self.region, gateway_id, key, value)
+        return value
+
+    def _invalidate_stale_ids(self, gateway_id: str, error: Exception) -> List[str]:
+        """
+        调用因资源不存在而失败时，清除本次取自缓存的发现结果
+
+        Returns:
+            被清除的缓存项，为空表示错误与缓存无关，调用方不应重试
+        """
+        if not self.cache or not _NOT_FOUND_PATTERN.search(str(error)):
+            return []
+        stale_keys = sorted(key for hit_gateway_id, key in self._cache_hits if hit_gateway_id == gateway_id)
+        for key in stale_keys:
+            self.cache.invalidate(self.region, gateway_id, key)
+            self._cache_hits.discard((gateway_id, key))
+        if stale_keys:
+            self.logger.warning(f"缓存的{', '.join(stale_keys)}可能已失效，清除后重新查询: {error}")
+        return stale_keys
+
     def get_mcp_plugin_id(self, gateway_id: str) -> Optional[str]:
         """获取MCP服务器插件ID"""
-        self.logger.info("获取MCP插件ID")
-        response = self._execute_aliyun_cli("GET", "/v1/plugins",
-                                            gatewayType="AI",
-                                            includeBuiltinAiGateway="true",
-                                            pageNumber="0",
-                                            pageSize="10")
+        return self._cached_lookup(gateway_id, "mcp_plugin_id", self._discover_mcp_plugin_id)
 
-        data = self._check_response(response, "获取插件列表")
-        for item in data.get("items", []):
-            if item.get("pluginClassInfo", {}).get("name") == "mcp-server":
+    def _discover_mcp_plugin_id(self, gateway_id: str) -> Optional[str]:
+        """查询插件列表获取MCP服务器插件ID"""
+        self.logger.info("获取MCP插件ID")
+        return self._select_mcp_plugin_id(self._iter_items("/v1/plugins", "获取插件列表",
+                                                           gatewayType="AI",
+                                                           includeBuiltinAiGateway="true"))
+
+    @staticmethod
+    def _is_mcp_plugin(item: Dict) -> bool:
+        return item.get("pluginClassInfo", {}).get("name") == "mcp-server"
+
+    def _select_mcp_plugin_id(self, items: Iterable[Dict]) -> Optional[str]:
+        """从插件列表中选出mcp-server插件ID，找到后不再消费剩余条目"""
+        for item in items:
+            if self._is_mcp_plugin(item):
                 plugin_id = item.get("pluginId")
                 self.logger.info(f"找到MCP插件ID: {plugin_id}")
                 return plugin_id
@@ -119,11 +206,22 @@ class MCPGatewayRegistrar:
 
     def get_http_api_id(self, gateway_id: str) -> str:
         """获取MCP类型的HTTP API ID"""
-        response = self._execute_aliyun_cli("GET", "/v1/http-apis", gatewayId=gateway_id, gatewayType="AI")
-        data = self._check_response(response, "获取HTTP API列表")
-
-        for item in data.get("items", []):
-            if item.get("type") == "MCP":
+        return self._cached_lookup(gateway_id, "http_api_id", self._discover_http_api_id)
+
+    def _discover_http_api_id(self, gateway_id: str) -> str:
+        """查询HTTP API列表获取MCP类型的HTTP API ID"""
+        return self._select_http_api_id(self._iter_items("/v1/http-apis", "获取HTTP API列表",
+                                                         gatewayId=gateway_id, gatewayType="AI"))
+
+    @staticmethod
+    def _is_mcp_http_api(item: Dict) -> bool:
+        return item.get("type") == "MCP" and any(api.get("type") == "MCP"
+                                                 for api in item.get("versionedHttpApis", []))
+
+    def _select_http_api_id(self, items: Iterable[Dict]) -> str:
+        """从HTTP API列表中选出MCP类型的API ID"""
+        for item in items:
+            if self._is_mcp_http_api(item):
                 for api in item.get("versionedHttpApis", []):
                     if api.get("type") == "MCP":
                         api_id = api.get("httpApiId")
@@ -134,15 +232,30 @@ class MCPGatewayRegistrar:
 
     def get_environment_id(self, gateway_id: str) -> str:
         """获取环境ID"""
-        response = self._execute_aliyun_cli("GET", "/v1/environments", gatewayId=gateway_id, gatewayType="AI")
-        data = self._check_response(response, "获取环境列表")
-
-        items = data.get("items", [])
-        if not items:
+        return self._cached_lookup(gateway_id, "environment_id", self._discover_environment_id)
+
+    def _discover_environment_id(self, gateway_id: str) -> str:
+        """查询环境列表获取环境ID"""
+        return self._select_environment_id(self._iter_items("/v1/environments", "获取环境列表",
+                                                            gatewayId=gateway_id, gatewayType="AI"))
+
+    @staticmethod
+    def _is_default_environment(item: Dict) -> bool:
+        return bool(item.get("default"))
+
+    def _select_environment_id(self, items: Iterable[Dict]) -> str:
+        """从环境列表中选出默认环境ID，没有默认环境时使用第一个"""
+        env = None
+        for item in items:
+            if env is None:
+                env = item
+            # 优先使用默认环境
+            if self._is_default_environment(item):
+                env = item
+                break
+        if env is None:
             raise RuntimeError("未找到任何环境")
 
-        # 优先使用默认环境
-        env = next((item for item in items if item.get("default")), items[0])
         env_id = env.get("environmentId")
         self.logger.info(f"使用环境ID: {env_id}")
         return env_id
@@ -163,22 +276,19 @@ class MCPGatewayRegistrar:
 
         # 如果没有指定域名ID，查找或创建通配符域名
         self.logger.info("未指定域名ID，查找或创建通配符域名")
+        return self._cached_lookup(gateway_id, "wildcard_domain_id", self._find_or_create_wildcard_domain)
 
+    def _find_or_create_wildcard_domain(self, gateway_id: str) -> str:
+        """查找通配符域名，不存在时创建"""
         # 先查询现有通配符域名
         try:
-            response = self._execute_aliyun_cli("GET", "/v1/domains",
-                                                gatewayType="AI",
-                                                nameLike="*",
-                                                pageSize="10",
-                                                pageNumber="1")
-            data = self._check_response(response, "查询通配符域名")
-
             # 查找通配符域名
-            for domain in data.get("items", []):
-                if domain.get("name") == "*":
-                    found_domain_id = domain.get("domainId")
-                    self.logger.info(f"✅ 找到现有通配符域名，ID: {found_domain_id}")
-                    return found_domain_id
+            found_domain_id = self._select_wildcard_domain_id(self._iter_items("/v1/domains", "查询通配符域名",
+                                                                               gatewayType="AI",
+                                                                               nameLike="*"))
+            if found_domain_id:
+                self.logger.info(f"✅ 找到现有通配符域名，ID: {found_domain_id}")
+                return found_domain_id
         except Exception as e:
             self.logger.warning(f"查询通配符域名失败: {e}")
 
@@ -196,19 +306,14 @@ class MCPGatewayRegistrar:
             if "Conflict.DomainExisted" in str(e) or "域名*已存在" in str(e):
                 self.logger.warning("⚠️  通配符域名已存在，重新查询")
                 try:
-                    response = self._execute_aliyun_cli("GET", "/v1/domains",
-                                                        gatewayId=gateway_id,
-                                                        gatewayType="AI",
-                                                        nameLike="*",
-                                                        pageSize="10",
-                                                        pageNumber="1")
-                    data = self._check_response(response, "重新查询通配符域名")
-
-                    for domain in data.get("items", []):
-                        if domain.get("name") == "*":
-                            existing_domain_id = domain.get("domainId")
-                            self.logger.info(f"✅ 重新查询找到通配符域名，ID: {existing_domain_id}")
-                            return existing_domain_id
+                    existing_domain_id = self._select_wildcard_domain_id(
+                        self._iter_items("/v1/domains", "重新查询通配符域名",
+                                         gatewayId=gateway_id,
+                                         gatewayType="AI",
+                                         nameLike="*"))
+                    if existing_domain_id:
+                        self.logger.info(f"✅ 重新查询找到通配符域名，ID: {existing_domain_id}")
+                        return existing_domain_id
 
                     raise RuntimeError("通配符域名已存在但无法查询到对应的域名ID")
                 except Exception as query_e:
@@ -216,9 +321,26 @@ class MCPGatewayRegistrar:
             else:
                 raise RuntimeError(f"创建通配符域名失败: {e}")
 
+    @staticmethod
+    def _is_wildcard_domain(item: Dict) -> bool:
+        return item.get("name") == "*"
+
+    @classmethod
+    def _select_wildcard_domain_id(cls, items: Iterable[Dict]) -> Optional[str]:
+        """从域名列表中选出通配符域名ID"""
+        for domain in items:
+            if cls._is_wildcard_domain(domain):
+                return domain.get("domainId")
+        return None
+
     def ensure_shared_service(self, gateway_id: str, private_ip: str) -> str:
         """确保共享的MCP服务存在"""
-        service_name = "mcp-shared-service"
+        return self._cached_lookup(gateway_id, "shared_service_id",
+                                   lambda gw_id: self._find_or_create_shared_service(gw_id, private_ip))
+
+    def _find_or_create_shared_service(self, gateway_id: str, private_ip: str) -> str:
+        """查找共享的MCP服务，不存在时创建"""
+        service_name = SHARED_SERVICE_NAME
 
         # 检查现有服务
         existing_services = self._find_items_by_name(gateway_id, "/v1/services", service_name)
@@ -229,14 +351,22 @@ class MCPGatewayRegistrar:
 
         # 创建新的共享服务
         self.logger.info(f"🔨 创建共享MCP服务: {service_name}")
-        body = {
+        body = self._build_shared_service_body(gateway_id, private_ip)
+        response = self._execute_aliyun_cli("POST", "/v1/services", body)
+        data = self._check_response(response, "创建共享MCP服务")
+        return self._extract_shared_service_id(data)
+
+    @staticmethod
+    def _build_shared_service_body(gateway_id: str, private_ip: str) -> Dict:
+        """构建共享MCP服务的创建请求体"""
+        return {
             "gatewayId": gateway_id,
             "sourceType": "VIP",
-            "serviceConfigs": [{"name": service_name, "addresses": [f"{private_ip}:8000"]}]
+            "serviceConfigs": [{"name": SHARED_SERVICE_NAME, "addresses": [f"{private_ip}:8000"]}]
         }
-        response = self._execute_aliyun_cli("POST", "/v1/services", body)
-        data = self._check_response(response, "创建共享MCP服务")
 
+    def _extract_shared_service_id(self, data: Dict) -> str:
+        """从创建共享服务的响应中取出服务ID"""
         service_ids = data.get("serviceIds", [])
         if not service_ids:
             raise RuntimeError("创建共享MCP服务成功但未返回服务ID")
@@ -247,7 +377,12 @@ class MCPGatewayRegistrar:
 
     def ensure_route(self, http_api_id: str, gateway_id: str, environment_id: str,
                      tool_name: str, domain_id: str, service_id: str, force_update: bool) -> Tuple[str, bool]:
-        """确保路由存在，返回(route_id, need_update_config)"""
+        """
+        确保路由存在，返回(route_id, need_update_config)
+
+        need_update_config 为 True 表示无需对比直接推送插件配置（新建路由或 --force-update），
+        为 False 时由 reconcile_plugin_attachment 按配置哈希决定是否更新。
+        """
         # 检查现有路由
         existing_routes = self._find_items_by_name(gateway_id, f"/v1/http-apis/{http_api_id}/routes",
                                                    tool_name, environmentId=environment_id)
@@ -264,26 +399,26 @@ class MCPGatewayRegistrar:
                 if domain_id not in current_domain_ids:
                     self.logger.info(f"路由 {tool_name} 需要更新域名配置")
                     # 更新路由的域名配置
-                    update_body = {
-                        "domainIds": [domain_id],
-                        "environmentId": environment_id,
-                        "match": route_data.get("match"),
-                        "backendConfig": route_data.get("backendConfig"),
-                        "mcpRouteConfig": route_data.get("mcpRouteConfig"),
-                        "name": tool_name,
-                        "description": route_data.get("description", tool_name)
-                    }
+                    update_body = self._build_route_domain_update_body(route_data, tool_name, domain_id, environment_id)
                     self._execute_aliyun_cli("PUT", f"/v1/http-apis/{http_api_id}/routes/{route_id}", update_body)
                     self.logger.info(f"路由 {tool_name} 域名配置已更新")
             except Exception as e:
                 self.logger.warning(f"检查或更新路由域名配置失败: {e}")
 
-            # 路由已存在时，总是需要尝试创建/更新插件挂载
-            return route_id, True
+            # 路由已存在时，只有强制更新才跳过配置对比
+            return route_id, force_update
 
         # 创建新路由
         self.logger.info(f"创建路由: {tool_name}")
-        body = {
+        body = self._build_route_body(tool_name, domain_id, environment_id, service_id)
+        response = self._execute_aliyun_cli("POST", f"/v1/http-apis/{http_api_id}/routes", body)
+        data = self._check_response(response, "创建路由")
+        return self._extract_route_id(data), True
+
+    @staticmethod
+    def _build_route_body(tool_name: str, domain_id: str, environment_id: str, service_id: str) -> Dict:
+        """构建工具路由的创建请求体"""
+        return {
             "domainIds": [domain_id],
             "environmentId": environment_id,
             "match": {"path": {"type": "Prefix", "value": f"/{tool_name}"}},
@@ -292,30 +427,109 @@ class MCPGatewayRegistrar:
             "name": tool_name,
             "description": tool_name
         }
-        response = self._execute_aliyun_cli("POST", f"/v1/http-apis/{http_api_id}/routes", body)
-        data = self._check_response(response, "创建路由")
 
+    @staticmethod
+    def _build_route_domain_update_body(route_data: Dict, tool_name: str, domain_id: str,
+                                        environment_id: str) -> Dict:
+        """构建更新已有路由域名配置的请求体"""
+        return {
+            "domainIds": [domain_id],
+            "environmentId": environment_id,
+            "match": route_data.get("match"),
+            "backendConfig": route_data.get("backendConfig"),
+            "mcpRouteConfig": route_data.get("mcpRouteConfig"),
+            "name": tool_name,
+            "description": route_data.get("description", tool_name)
+        }
+
+    def _extract_route_id(self, data: Dict) -> str:
+        """从创建路由的响应中取出路由ID"""
         route_id = data.get("routeId")
         if not route_id:
             raise RuntimeError("创建路由成功但未返回路由ID")
 
         self.logger.info(f"路由创建成功，ID: {route_id}")
-        return route_id, True
+        return route_id
 
     def generate_mcp_config(self, tool_name: str, openapi_base_url: str, api_key: str, skip_auth: bool) -> str:
         """生成MCP配置并返回base64编码"""
-        # 获取OpenAPI规范
+        fetched = self._fetch_spec(tool_name, openapi_base_url)
+        spec = fetched.spec
+
+        with self.tracer.span("mcp_convert", tool=tool_name) as span:
+            cache_key, cached = self._lookup_mcp_config(tool_name, spec, openapi_base_url, api_key, skip_auth,
+                                                        fetched.digest)
+            span.set("cached", bool(cached))
+            if cached:
+                return cached
+
+            if self.converter == "native":
+                return self._build_native_mcp_config(tool_name, spec, openapi_base_url, api_key, skip_auth,
+                                                     cache_key)
+
+            # 保存临时文件
+            json_file, yaml_file = self._prepare_conversion_files(tool_name, spec)
+
+            # 转换为MCP配置
+            cmd = self._build_convert_command(tool_name, json_file, yaml_file)
+            # 使用兼容的写法
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True
+            )
+            if result.returncode != 0:
+                raise RuntimeError(f"转换OpenAPI失败: {result.stderr}")
+
+            return self._finalize_mcp_config(tool_name, yaml_file, openapi_base_url, api_key, skip_auth, cache_key)
+
+    def _lookup_mcp_config(self, tool_name: str, spec: Dict, openapi_base_url: str, api_key: str,
+                           skip_auth: bool, spec_digest: str = None) -> Tuple[Optional[str], Optional[str]]:
+        """查询MCP配置缓存，返回(缓存键, 命中时的base64编码配置)"""
+        if not self.config_cache:
+            return None, None
+        cache_key = self.config_cache.make_key(spec, openapi_base_url, api_key, skip_auth, self.converter,
+                                               spec_digest, rewrite="enterprise")
+        cached = self.config_cache.get_encoded(cache_key, tool_name)
+        if cached:
+            self.logger.info(f"{tool_name} 的OpenAPI规范未变化，使用缓存的MCP配置")
+        return cache_key, cached
+
+    def fetch_openapi_spec(self, tool_name: str, openapi_base_url: str) -> Dict:
+        """获取工具的OpenAPI规范"""
+        return self._fetch_spec(tool_name, openapi_base_url).spec
+
+    def _fetch_spec(self, tool_name: str, openapi_base_url: str) -> FetchedSpec:
+        """获取工具的OpenAPI规范及其内容摘要，规范未变化时优先使用条件请求"""
         spec_url = f"{openapi_base_url}/{tool_name}/openapi.json"
         self.logger.info(f"获取OpenAPI规范: {spec_url}")
 
         try:
-            response = requests.get(spec_url, timeout=30)
-            response.raise_for_status()
-            spec = response.json()
+            with self.tracer.span("spec_fetch", tool=tool_name):
+                return self.spec_fetcher.fetch(spec_url)
         except Exception as e:
             raise RuntimeError(f"获取OpenAPI规范失败: {e}")
 
-        # 保存临时文件
+    def _build_native_mcp_config(self, tool_name: str, spec: Dict, openapi_base_url: str, api_key: str,
+                                 skip_auth: bool, cache_key: str = None) -> str:
+        """进程内转换OpenAPI规范，返回base64编码的MCP配置"""
+        config = convert_openapi(spec, tool_name)
+        apply_enterprise_gateway_config(config, openapi_base_url, api_key, skip_auth)
+        yaml_content = dump_mcp_yaml(config)
+        if cache_key:
+            self.config_cache.put(cache_key, config)
+
+        if self.debug_response:
+            print(f"\n=== {tool_name} MCP配置 ===")
+            print(yaml_content)
+            print("=== 配置结束 ===\n")
+
+        return base64.b64encode(yaml_content.encode('utf-8')).decode('utf-8')
+
+    @staticmethod
+    def _prepare_conversion_files(tool_name: str, spec: Dict) -> Tuple[str, str]:
+        """将OpenAPI规范写入临时文件，返回(json文件, yaml文件)路径"""
         temp_dir = tempfile.mkdtemp(prefix=f"mcp_{tool_name}_")
         json_file = os.path.join(temp_dir, f"{tool_name}.json")
         yaml_file = os.path.join(temp_dir, f"{tool_name}.yaml")
@@ -323,55 +537,23 @@ class MCPGatewayRegistrar:
         with open(json_file, 'w', encoding='utf-8') as f:
             json.dump(spec, f, ensure_ascii=False, indent=2)
 
-        # 转换为MCP配置
-        try:
-            cmd = ["./openapi-to-mcp", "--input", json_file, "--output", yaml_file, "--server-name", tool_name]
-            # 使用兼容的写法
-            result = subprocess.run(
-                cmd,
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"转换OpenAPI失败: {e.stderr}")
+        return json_file, yaml_file
 
+    @staticmethod
+    def _build_convert_command(tool_name: str, json_file: str, yaml_file: str) -> List[str]:
+        """构建openapi-to-mcp转换命令"""
+        return ["./openapi-to-mcp", "--input", json_file, "--output", yaml_file, "--server-name", tool_name]
+
+    def _finalize_mcp_config(self, tool_name: str, yaml_file: str, openapi_base_url: str, api_key: str,
+                             skip_auth: bool, cache_key: str = None) -> str:
+        """修改转换后的YAML配置，返回base64编码"""
         # 修改YAML配置
         with open(yaml_file, 'r', encoding='utf-8') as f:
             config = yaml.safe_load(f)
 
-        # 设置基础配置
-        if 'server' not in config:
-            config['server'] = {}
-        if 'config' not in config['server']:
-            config['server']['config'] = {}
-
-        config['server']['config']['baseUrl'] = openapi_base_url
-        if not skip_auth:
-            config['server']['config']['apikey'] = api_key
-
-        # 修改工具配置
-        for tool in config.get('tools', []):
-            if 'requestTemplate' in tool:
-                # 修改URL
-                if 'url' in tool['requestTemplate']:
-                    original_url = tool['requestTemplate']['url']
-                    path = original_url.split('/', 3)[-1] if '/' in original_url else original_url.lstrip('/')
-                    tool['requestTemplate']['url'] = f"{{{{.config.baseUrl}}}}/{path}"
-
-                # 添加授权头
-                if not skip_auth:
-                    if 'headers' not in tool['requestTemplate']:
-                        tool['requestTemplate']['headers'] = []
-
-                    # 检查是否已有授权头
-                    has_auth = any(h.get('key') == 'Authorization' for h in tool['requestTemplate']['headers'])
-                    if not has_auth:
-                        tool['requestTemplate']['headers'].append({
-                            'key': 'Authorization',
-                            'value': "Bearer {{.config.apikey}}"
-                        })
+        apply_enterprise_gateway_config(config, openapi_base_url, api_key, skip_auth)
+        if cache_key:
+            self.config_cache.put(cache_key, config)
 
         # 保存修改后的配置
         with open(yaml_file, 'w', encoding='utf-8') as f:
@@ -388,10 +570,276 @@ class MCPGatewayRegistrar:
 
         return base64.b64encode(yaml_content.encode('utf-8')).decode('utf-8')
 
-    def update_plugin_attachment(self, gateway_id: str, plugin_id: str, route_id: str, plugin_config: str):
-        """创建插件挂载"""
+    def get_route_attachments(self, gateway_id: str, plugin_id: str) -> Dict[str, Dict]:
+        """获取插件挂载并按路由ID建立索引"""
+        return self._index_attachments_by_route(self.get_plugin_attachments(gateway_id, plugin_id))
+
+    @staticmethod
+    def _index_attachments_by_route(attachments: List[Dict]) -> Dict[str, Dict]:
+        """按 attachResourceIds 将挂载映射到路由ID"""
+        index = {}
+        for attachment in attachments:
+            for route_id in attachment.get("attachResourceIds") or []:
+                index.setdefault(route_id, attachment)
+        return index
+
+    @staticmethod
+    def _attachment_id(attachment: Dict) -> Optional[str]:
+        return attachment.get("attachmentId") or attachment.get("pluginAttachmentId")
+
+    @staticmethod
+    def _decode_plugin_config(plugin_config: str) -> str:
+        try:
+            return base64.b64decode(plugin_config, validate=True).decode('utf-8')
+        except (binascii.Error, ValueError):
+            # 接口可能直接返回YAML原文
+            return plugin_config
+
+    @staticmethod
+    def _digest_config_data(config: Any) -> str:
+        normalized = json.dumps(config, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def plugin_config_digest(cls, plugin_config: str) -> str:
+        """解码base64插件配置并规范化后计算sha256，键顺序和格式差异不影响结果"""
+        decoded = cls._decode_plugin_config(plugin_config)
+        try:
+            return cls._digest_config_data(yaml.safe_load(decoded))
+        except yaml.YAMLError:
+            return hashlib.sha256(decoded.strip().encode('utf-8')).hexdigest()
+
+    @classmethod
+    def shared_config_key(cls, plugin_config: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """
+        计算与 server.name 无关的配置哈希，作为共享挂载的分组键
+
+        Returns:
+            tuple: (分组键, 解码后的配置)，配置无法解析时均为 None
+        """
+        try:
+            config = yaml.safe_load(cls._decode_plugin_config(plugin_config))
+        except yaml.YAMLError:
+            return None, None
+        if not isinstance(config, dict):
+            return None, None
+        neutral = dict(config, server=dict(config.get("server") or {}, name=SERVER_NAME_PLACEHOLDER))
+        return cls._digest_config_data(neutral), config
+
+    @classmethod
+    def build_shared_plugin_config(cls, plugin_config: str) -> Tuple[str, str]:
+        """将单个工具的插件配置改写为共享形式，返回(分组键, base64编码的共享配置)"""
+        key, config = cls.shared_config_key(plugin_config)
+        if key is None:
+            raise RuntimeError("插件配置不是有效的YAML，无法共享挂载")
+        config.setdefault("server", {})["name"] = f"{SHARED_SERVER_NAME_PREFIX}{key[:12]}"
+        return key, base64.b64encode(dump_mcp_yaml(config).encode('utf-8')).decode('utf-8')
+
+    def _get_attachment_config(self, attachment: Dict) -> Optional[str]:
+        """取出挂载当前的插件配置，列表结果中没有时查询挂载详情"""
+        if attachment.get("pluginConfig") is not None:
+            return attachment["pluginConfig"]
+        attachment_id = self._attachment_id(attachment)
+        if not attachment_id:
+            return None
+        try:
+            response = self._execute_aliyun_cli("GET", f"/v1/plugin-attachments/{attachment_id}")
+            return self._check_response(response, "获取插件挂载详情").get("pluginConfig")
+        except Exception as e:
+            self.logger.warning(f"获取插件挂载 {attachment_id} 详情失败: {e}")
+            return None
+
+    def _attachment_up_to_date(self, current_config: Optional[str], plugin_config: str) -> bool:
+        if current_config is None:
+            return False
+        return self.plugin_config_digest(current_config) == self.plugin_config_digest(plugin_config)
+
+    def reconcile_plugin_attachment(self, gateway_id: str, plugin_id: str, route_id: str, plugin_config: str,
+                                    attachment: Dict = None, force: bool = False) -> bool:
+        """
+        对比已有挂载的配置哈希，只在配置变化时更新
+
+        Returns:
+            bool: 是否发起了创建或更新
+        """
+        if attachment and not force:
+            if self._attachment_up_to_date(self._get_attachment_config(attachment), plugin_config):
+                self.logger.info(f"路由 {route_id} 的插件配置未变化，跳过更新")
+                return False
+        if attachment and len(attachment.get("attachResourceIds") or []) > 1:
+            # 共享挂载上还有其他路由，不能直接改写配置，先把该路由拆出来再单独挂载
+            self.detach_routes(attachment, [route_id])
+            attachment = None
+        self.update_plugin_attachment(gateway_id, plugin_id, route_id, plugin_config, attachment)
+        return True
+
+    def update_plugin_attachment(self, gateway_id: str, plugin_id: str, route_id: str, plugin_config: str,
+                                 attachment: Dict = None):
+        """已有挂载时原地更新，否则创建插件挂载"""
+        if attachment:
+            self._put_plugin_attachment(attachment, route_id, plugin_config)
+            return
+
         self.logger.info("创建插件挂载")
-        body = {
+        body = self._build_attachment_body(gateway_id, plugin_id, route_id, plugin_config)
+
+        try:
+            response = self._execute_aliyun_cli("POST", "/v1/plugin-attachments", body)
+            self._check_response(response, "创建插件挂载")
+            self.logger.info("插件挂载创建成功")
+        except RuntimeError as e:
+            self._handle_attachment_error(e)
+            # 挂载已存在但未出现在之前的列表中，重新查询后原地更新
+            attachment = self.get_route_attachments(gateway_id, plugin_id).get(route_id)
+            if attachment:
+                self._put_plugin_attachment(attachment, route_id, plugin_config)
+
+    def _put_plugin_attachment(self, attachment: Dict, route_id: str, plugin_config: str):
+        attachment_id = self._attachment_id(attachment)
+        self.logger.info(f"更新插件挂载: {attachment_id}")
+        body = self._build_attachment_update_body(attachment, route_id, plugin_config)
+        response = self._execute_aliyun_cli("PUT", f"/v1/plugin-attachments/{attachment_id}", body)
+        self._check_response(response, "更新插件挂载")
+        self.logger.info(f"插件挂载 {attachment_id} 更新成功")
+
+    def detach_routes(self, attachment: Dict, route_ids: List[str]) -> bool:
+        """从挂载中移除路由，移除后没有剩余路由时删除整个挂载"""
+        with self._detach_lock:
+            return self._detach_routes(attachment, route_ids)
+
+    def _detach_routes(self, attachment: Dict, route_ids: List[str]) -> bool:
+        attachment_id = self._attachment_id(attachment)
+        current_ids = list(attachment.get("attachResourceIds") or [])
+        remaining_ids = [route_id for route_id in current_ids if route_id not in route_ids]
+        if len(remaining_ids) == len(current_ids):
+            return True
+        if not remaining_ids:
+            if self.delete_plugin_attachment(attachment_id):
+                attachment["attachResourceIds"] = []
+                return True
+            return False
+
+        try:
+            self.logger.info(f"从插件挂载 {attachment_id} 移除 {len(current_ids) - len(remaining_ids)} 个路由")
+            current_config = self._get_attachment_config(attachment)
+            if current_config is None:
+                raise RuntimeError("无法获取挂载当前配置")
+            response = self._execute_aliyun_cli("PUT", f"/v1/plugin-attachments/{attachment_id}", {
+                "pluginConfig": current_config,
+                "attachResourceIds": remaining_ids
+            })
+            self._check_response(response, "更新插件挂载")
+            attachment["attachResourceIds"] = remaining_ids
+            return True
+        except Exception as e:
+            self.logger.error(f"从插件挂载 {attachment_id} 移除路由失败: {e}")
+            return False
+
+    def apply_shared_attachments(self, gateway_id: str, plugin_id: str, tool_configs: Dict[str, Tuple[str, str]],
+                                 attachments: List[Dict], force: bool = False) -> List[str]:
+        """
+        按配置哈希将工具分组，每组共用一个插件挂载，并增量调整 attachResourceIds
+
+        Args:
+            tool_configs: {工具名: (路由ID, 插件配置)}
+            attachments: 当前的插件挂载列表
+            force: 即使路由列表没有变化也重新推送配置
+
+        Returns:
+            list: 挂载失败的工具
+        """
+        groups, failed_tools = {}, []
+        for tool, (route_id, plugin_config) in tool_configs.items():
+            # 单个工具的配置无法解析时只记为失败，其余工具照常分组挂载
+            try:
+                key, shared_config = self.build_shared_plugin_config(plugin_config)
+            except Exception as e:
+                self.logger.error(f"❌ 工具 {tool} 的插件配置无法共享挂载: {e}")
+                failed_tools.append(tool)
+                continue
+            group = groups.setdefault(key, {"config": shared_config, "tools": [], "route_ids": []})
+            group["tools"].append(tool)
+            group["route_ids"].append(route_id)
+        self.logger.info(f"🔗 {len(tool_configs) - len(failed_tools)} 个工具按配置分为 {len(groups)} 组共享挂载")
+
+        # 每个分组键保留一个已有挂载，其余挂载上属于本次工具的路由都要移走
+        attachment_keys, keeper = {}, {}
+        for attachment in attachments:
+            current_config = self._get_attachment_config(attachment)
+            key = self.shared_config_key(current_config)[0] if current_config is not None else None
+            attachment_keys[id(attachment)] = key
+            if key in groups and key not in keeper:
+                keeper[key] = attachment
+
+        route_groups = {route_id: key for key, group in groups.items() for route_id in group["route_ids"]}
+        # 配置变化后没有同键挂载的分组，沿用只挂着本组路由的旧挂载，改写配置即可，不必删除重建
+        kept = {id(attachment) for attachment in keeper.values()}
+        for attachment in attachments:
+            route_ids = attachment.get("attachResourceIds") or []
+            owners = {route_groups.get(route_id) for route_id in route_ids}
+            if id(attachment) in kept or len(owners) != 1:
+                continue
+            key = owners.pop()
+            if key is not None and key not in keeper:
+                keeper[key] = attachment
+                attachment_keys[id(attachment)] = key
+                kept.add(id(attachment))
+                groups[key]["stale_config"] = True
+        for attachment in attachments:
+            key = attachment_keys[id(attachment)]
+            stale_ids = [route_id for route_id in attachment.get("attachResourceIds") or []
+                         if route_id in route_groups
+                         and (route_groups[route_id] != key or keeper.get(key) is not attachment)]
+            if stale_ids:
+                self.detach_routes(attachment, stale_ids)
+
+        for key, group in groups.items():
+            attachment = keeper.get(key)
+            try:
+                if attachment is None:
+                    self.logger.info(f"创建共享插件挂载，包含 {len(group['route_ids'])} 个路由")
+                    body = self._build_attachment_body(gateway_id, plugin_id, group["route_ids"][0], group["config"])
+                    body["attachResourceIds"] = group["route_ids"]
+                    response = self._execute_aliyun_cli("POST", "/v1/plugin-attachments", body)
+                    self._check_response(response, "创建插件挂载")
+                    continue
+
+                current_ids = list(attachment.get("attachResourceIds") or [])
+                missing_ids = [route_id for route_id in group["route_ids"] if route_id not in current_ids]
+                if not missing_ids and not force and not group.get("stale_config"):
+                    self.logger.info(f"⏭️  共享插件挂载 {self._attachment_id(attachment)} 无需更新")
+                    continue
+                self.logger.info(f"更新共享插件挂载 {self._attachment_id(attachment)}，新增 {len(missing_ids)} 个路由")
+                response = self._execute_aliyun_cli("PUT", f"/v1/plugin-attachments/{self._attachment_id(attachment)}",
+                                                    {"pluginConfig": group["config"],
+                                                     "attachResourceIds": current_ids + missing_ids})
+                self._check_response(response, "更新插件挂载")
+                attachment["attachResourceIds"] = current_ids + missing_ids
+            except Exception as e:
+                self.logger.error(f"❌ 共享插件挂载失败 ({', '.join(group['tools'])}): {e}")
+                failed_tools.extend(group["tools"])
+        return failed_tools
+
+    @staticmethod
+    def _unique_attachments(index: Dict[str, Dict]) -> List[Dict]:
+        """将按路由索引的挂载还原为去重后的挂载列表"""
+        return list({id(attachment): attachment for attachment in index.values()}.values())
+
+    @staticmethod
+    def _build_attachment_update_body(attachment: Dict, route_id: str, plugin_config: str) -> Dict:
+        """构建原地更新插件挂载的请求体，保留挂载上已有的其他路由"""
+        attach_resource_ids = list(attachment.get("attachResourceIds") or [])
+        if route_id not in attach_resource_ids:
+            attach_resource_ids.append(route_id)
+        return {
+            "pluginConfig": plugin_config,
+            "attachResourceIds": attach_resource_ids
+        }
+
+    @staticmethod
+    def _build_attachment_body(gateway_id: str, plugin_id: str, route_id: str, plugin_config: str) -> Dict:
+        """构建插件挂载请求体"""
+        return {
             "pluginId": plugin_id,
             "pluginConfig": plugin_config,
             "attachResourceType": "GatewayRoute",
@@ -399,16 +847,12 @@ class MCPGatewayRegistrar:
             "gatewayId": gateway_id
         }
 
-        try:
-            response = self._execute_aliyun_cli("POST", "/v1/plugin-attachments", body)
-            self._check_response(response, "创建插件挂载")
-            self.logger.info("插件挂载创建成功")
-        except RuntimeError as e:
-            # 如果是因为已存在而失败，记录警告但不抛出异常
-            if "已存在" in str(e) or "exist" in str(e).lower():
-                self.logger.warning(f"插件挂载可能已存在: {e}")
-            else:
-                raise
+    def _handle_attachment_error(self, error: RuntimeError):
+        """如果是因为已存在而失败，记录警告但不抛出异常"""
+        if "已存在" in str(error) or "exist" in str(error).lower():
+            self.logger.warning(f"插件挂载可能已存在: {error}")
+        else:
+            raise error
 
     def extract_tools_from_config(self, config_path: str) -> List[str]:
         """从配置文件提取工具列表"""
@@ -421,39 +865,89 @@ class MCPGatewayRegistrar:
         except Exception as e:
             raise RuntimeError(f"解析配置文件失败: {e}")
 
-    def register_tools(self, gateway_id: str, plugin_id: str, private_ip: str,
-                       tools_config: str, api_key: str, openapi_base_url: str = "http://127.0.0.1:8000",
-                       skip_auth: bool = False, force_update: bool = False, domain_id: str = None) -> Tuple[
-        int, int, List[str], List[str]]:
-        """注册所有工具到AI网关"""
-        self.logger.info("开始注册MCP工具到AI网关")
-
-        success_tools, failed_tools = [], []
-
-        try:
+    def _discover_gateway(self, gateway_id: str, plugin_id: str, private_ip: str,
+                          domain_id: str = None) -> Tuple[str, str, str, str, Dict[str, Dict]]:
+        """获取注册所需的网关基础信息和已有插件挂载"""
+        with self.tracer.span("discovery"):
             # 获取基础信息
             http_api_id = self.get_http_api_id(gateway_id)
             domain_id = self.ensure_domain(gateway_id, domain_id)
             environment_id = self.get_environment_id(gateway_id)
-            tools = self.extract_tools_from_config(tools_config)
 
             # 创建或获取共享的MCP服务
             shared_service_id = self.ensure_shared_service(gateway_id, private_ip)
             self.logger.info(f"🔧 所有MCP工具将使用共享服务，ID: {shared_service_id}")
 
+            # 已有插件挂载，按路由ID索引，用于配置对比
+            attachments = self.get_route_attachments(gateway_id, plugin_id)
+        return http_api_id, domain_id, environment_id, shared_service_id, attachments
+
+    def _process_tool(self, tool: str, http_api_id: str, gateway_id: str, environment_id: str, domain_id: str,
+                      service_id: str, plugin_id: str, openapi_base_url: str, api_key: str, skip_auth: bool,
+                      force_update: bool, attachments: Dict[str, Dict]):
+        """
+        单个工具的路由和挂载阶段
+
+        Returns:
+            共享挂载模式下返回 (route_id, plugin_config)，否则返回挂载是否有更新
+        """
+        with self.tracer.span("tool", tool=tool):
+            # 使用共享服务创建路由
+            with self.tracer.span("route", tool=tool):
+                route_id, need_update = self.ensure_route(http_api_id, gateway_id, environment_id,
+                                                          tool, domain_id, service_id, force_update)
+
+            # 更新插件配置
+            plugin_config = self.generate_mcp_config(tool, openapi_base_url, api_key, skip_auth)
+            if self.shared_attachments:
+                return route_id, plugin_config
+            with self.tracer.span("plugin", tool=tool):
+                return self.reconcile_plugin_attachment(gateway_id, plugin_id, route_id, plugin_config,
+                                                        attachments.get(route_id), force=need_update)
+
+    def register_tools(self, gateway_id: str, plugin_id: str, private_ip: str,
+                       tools_config: str, api_key: str, openapi_base_url: str = "http://127.0.0.1:8000",
+                       skip_auth: bool = False, force_update: bool = False, domain_id: str = None,
+                       tools: List[str] = None) -> Tuple[int, int, List[str], List[str]]:
+        """注册工具到AI网关，tools 为空时注册配置文件中的全部工具"""
+        self.logger.info("开始注册MCP工具到AI网关")
+
+        success_tools, failed_tools = [], []
+
+        try:
+            if tools is None:
+                tools = self.extract_tools_from_config(tools_config)
+            requested_domain_id = domain_id
+            http_api_id, domain_id, environment_id, shared_service_id, attachments = self._discover_gateway(
+                gateway_id, plugin_id, private_ip, requested_domain_id)
+
+            # 共享挂载模式下先收集每个工具的路由和配置，最后按分组统一挂载
+            prepared = {}
+
             # 处理每个工具
             for tool in tools:
                 try:
                     self.logger.info(f"📝 处理工具: {tool}")
-
-                    # 使用共享服务创建路由
-                    route_id, need_update = self.ensure_route(http_api_id, gateway_id, environment_id,
-                                                              tool, domain_id, shared_service_id, force_update)
-
-                    # 更新插件配置
-                    if need_update:
-                        plugin_config = self.generate_mcp_config(tool, openapi_base_url, api_key, skip_auth)
-                        self.update_plugin_attachment(gateway_id, plugin_id, route_id, plugin_config)
+                    try:
+                        outcome = self._process_tool(tool, http_api_id, gateway_id, environment_id, domain_id,
+                                                     shared_service_id, plugin_id, openapi_base_url, api_key,
+                                                     skip_auth, force_update, attachments)
+                    except Exception as e:
+                        # 缓存的ID在控制台已被删除时，清除缓存重新发现一次再重试该工具
+                        stale_keys = self._invalidate_stale_ids(gateway_id, e)
+                        if not stale_keys:
+                            raise
+                        if "mcp_plugin_id" in stale_keys:
+                            plugin_id = self.get_mcp_plugin_id(gateway_id)
+                        http_api_id, domain_id, environment_id, shared_service_id, attachments = \
+                            self._discover_gateway(gateway_id, plugin_id, private_ip, requested_domain_id)
+                        outcome = self._process_tool(tool, http_api_id, gateway_id, environment_id, domain_id,
+                                                     shared_service_id, plugin_id, openapi_base_url, api_key,
+                                                     skip_auth, force_update, attachments)
+                    if self.shared_attachments:
+                        prepared[tool] = outcome
+                        continue
+                    if outcome:
                         self.logger.info(f"✅ 工具 {tool} 配置已更新")
                     else:
                         self.logger.info(f"⏭️  工具 {tool} 跳过配置更新")
@@ -464,25 +958,32 @@ class MCPGatewayRegistrar:
                     self.logger.error(f"❌ 处理工具 {tool} 失败: {e}")
                     failed_tools.append(tool)
 
+            if prepared:
+                with self.tracer.span("shared_attach", tools=len(prepared)):
+                    attach_failed = self.apply_shared_attachments(gateway_id, plugin_id, prepared,
+                                                                  self._unique_attachments(attachments),
+                                                                  force_update)
+                failed_tools.extend(attach_failed)
+                success_tools.extend(tool for tool in prepared if tool not in attach_failed)
+
             return len(success_tools), len(failed_tools), success_tools, failed_tools
 
         except Exception as e:
             self.logger.error(f"注册工具失败: {e}")
             raise
 
+        finally:
+            self.tracer.log_summary(self.logger, "各阶段及APIG调用耗时")
+
     # ==================== 清理功能 ====================
 
     def get_plugin_attachments(self, gateway_id: str, plugin_id: str) -> List[Dict]:
         """获取插件挂载列表"""
         try:
-            response = self._execute_aliyun_cli("GET", "/v1/plugin-attachments",
-                                                gatewayId=gateway_id,
-                                                gatewayType="AI",
-                                                pluginId=plugin_id,
-                                                pageSize="100",
-                                                pageNumber="1")
-            data = self._check_response(response, "获取插件挂载列表")
-            return data.get("items", [])
+            return self._list_items("/v1/plugin-attachments", "获取插件挂载列表",
+                                    gatewayId=gateway_id,
+                                    gatewayType="AI",
+                                    pluginId=plugin_id)
         except Exception as e:
             self.logger.warning(f"获取插件挂载列表失败: {e}")
             return []
@@ -511,63 +1012,83 @@ class MCPGatewayRegistrar:
             self.logger.error(f"删除路由 {route_id} 失败: {e}")
             return False
 
+    def remove_tools(self, gateway_id: str, plugin_id: str, tools: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        删除指定工具的路由，并从插件挂载中移除这些路由（挂载中没有其他路由时删除挂载）
+
+        共享服务保留给其余工具继续使用。
+
+        Returns:
+            tuple: (删除成功的工具, 删除失败的工具)
+        """
+        self.logger.info(f"开始删除工具: {', '.join(tools)}")
+        http_api_id = self.get_http_api_id(gateway_id)
+        wanted = set(tools)
+        routes = [route for route in self._list_items(f"/v1/http-apis/{http_api_id}/routes", "获取所有路由",
+                                                      gatewayId=gateway_id, gatewayType="AI")
+                  if route.get("name") in wanted and route.get("routeId")]
+        attachments = self.get_route_attachments(gateway_id, plugin_id)
+
+        def remove(route):
+            attachment = attachments.get(route["routeId"])
+            if attachment is not None and not self.detach_routes(attachment, [route["routeId"]]):
+                return False
+            return self.delete_route(http_api_id, route["routeId"])
+
+        removed = {route["name"] for route, ok in zip(routes, self._run_concurrently(remove, routes)) if ok}
+        found = {route["name"] for route in routes}
+        for tool in sorted(wanted - found):
+            self.logger.info(f"工具 {tool} 的路由不存在，无需删除")
+        failed_tools = sorted(found - removed)
+        return sorted(wanted - set(failed_tools)), failed_tools
+
+    def sync_tools(self, gateway_id: str, plugin_id: str, private_ip: str, changes, api_key: str,
+                   openapi_base_url: str = "http://127.0.0.1:8000", skip_auth: bool = False,
+                   domain_id: str = None) -> List[str]:
+        """
+        增量同步配置文件的变化：注册新增和修改的工具，删除已移除的工具
+
+        Args:
+            changes: config_watcher.ToolChanges
+
+        Returns:
+            list: 同步失败的工具名
+        """
+        failed_tools = []
+        tools = changes.added + changes.changed
+        if tools:
+            failed_tools.extend(self.register_tools(gateway_id, plugin_id, private_ip, None, api_key,
+                                                    openapi_base_url, skip_auth, domain_id=domain_id,
+                                                    tools=tools)[3])
+        if changes.removed:
+            failed_tools.extend(self.remove_tools(gateway_id, plugin_id, changes.removed)[1])
+        return failed_tools
+
     def cleanup_gateway_resources(self, gateway_id: str, plugin_id: str) -> Tuple[int, int, List[str], List[str]]:
-        """清理AI网关侧的所有MCP路由和插件挂载资源"""
-        self.logger.info("开始清理AI网关侧所有MCP资源")
+        """
+        清理AI网关侧的所有MCP路由和插件挂载资源
 
-        success_tools, failed_tools = [], []
+        当前环境的路由列表只获取一次，与插件挂载在内存中关联；删除按 挂载 → 路由 的顺序分批并发执行。
+        """
+        self.logger.info("开始清理AI网关侧所有MCP资源")
 
         try:
             http_api_id = self.get_http_api_id(gateway_id)
             environment_id = self.get_environment_id(gateway_id)
 
-            # 方法1：通过插件挂载获取路由
-            attachments = self.get_plugin_attachments(gateway_id, plugin_id)
+            # 挂载列表和路由列表互不依赖，同时获取
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="cleanup-list") as executor:
+                attachments_future = executor.submit(self.get_plugin_attachments, gateway_id, plugin_id)
+                routes_future = executor.submit(self._list_environment_routes, gateway_id, http_api_id,
+                                                environment_id)
+                attachments = attachments_future.result()
+                environment_routes = routes_future.result()
             self.logger.info(f"通过插件挂载找到 {len(attachments)} 个挂载")
 
-            route_id_to_name = {}
-
-            # 从插件挂载中获取路由信息
-            for attachment in attachments:
-                for route_id in attachment.get("attachResourceIds", []):
-                    try:
-                        response = self._execute_aliyun_cli("GET", f"/v1/http-apis/{http_api_id}/routes/{route_id}")
-                        data = self._check_response(response, "获取路由详情")
-                        route_name = data.get("name")
-                        if route_name:
-                            route_id_to_name[route_id] = route_name
-                            self.logger.info(f"从插件挂载发现路由: {route_name} (ID: {route_id})")
-                    except Exception as e:
-                        self.logger.warning(f"获取路由 {route_id} 信息失败: {e}")
-
-            # 方法2：如果插件挂载没有找到路由，直接查询所有路由并过滤MCP相关的
-            if not route_id_to_name:
-                self.logger.info("插件挂载中未找到路由，尝试直接查询所有路由")
-                try:
-                    response = self._execute_aliyun_cli("GET", f"/v1/http-apis/{http_api_id}/routes",
-                                                        gatewayId=gateway_id,
-                                                        gatewayType="AI",
-                                                        environmentId=environment_id)
-                    data = self._check_response(response, "获取所有路由")
-
-                    all_routes = data.get("items", [])
-                    self.logger.info(f"查询到 {len(all_routes)} 个路由")
-
-                    # 过滤出可能的MCP路由（排除系统路由）
-                    for route in all_routes:
-                        route_id = route.get("routeId")
-                        route_name = route.get("name", "")
-
-                        # 排除系统路由和空名称路由
-                        if route_name and not route_name.startswith("system-") and route_id:
-                            route_id_to_name[route_id] = route_name
-                            self.logger.info(f"发现可能的MCP路由: {route_name} (ID: {route_id})")
-
-                except Exception as e:
-                    self.logger.warning(f"查询所有路由失败: {e}")
+            route_id_to_name = self._select_cleanup_routes(http_api_id, environment_routes, attachments)
 
             # 获取所有要清理的工具
-            tools_to_cleanup = list(set(route_id_to_name.values()))
+            tools_to_cleanup = sorted(set(route_id_to_name.values()))
             self.logger.info(f"发现 {len(tools_to_cleanup)} 个MCP工具需要清理: {tools_to_cleanup}")
 
             if not tools_to_cleanup:
@@ -575,35 +1096,33 @@ class MCPGatewayRegistrar:
                 return 0, 0, [], []
 
             # 先删除所有相关的插件挂载
-            if attachments:
-                self.logger.info("🧹 删除插件挂载")
-                for attachment in attachments:
-                    attachment_id = attachment.get("attachmentId")
-                    attached_routes = attachment.get("attachResourceIds", [])
-
-                    # 检查是否包含我们要清理的路由
-                    if any(route_id in route_id_to_name for route_id in attached_routes):
-                        if attachment_id:
-                            self.delete_plugin_attachment(attachment_id)
+            attachment_ids = [
+                self._attachment_id(attachment) for attachment in attachments
+                if self._attachment_id(attachment)
+                and any(route_id in route_id_to_name for route_id in attachment.get("attachResourceIds") or [])
+            ]
+            if attachment_ids:
+                self.logger.info(f"🧹 删除 {len(attachment_ids)} 个插件挂载")
+                self._run_concurrently(self.delete_plugin_attachment, attachment_ids)
 
             # 再删除所有路由
-            self.logger.info("🧹 删除路由")
-            for route_id, route_name in route_id_to_name.items():
-                try:
-                    if self.delete_route(http_api_id, route_id):
-                        success_tools.append(route_name)
-                        self.logger.info(f"✅ 工具 {route_name} 清理成功")
-                    else:
-                        failed_tools.append(route_name)
-                        self.logger.error(f"❌ 工具 {route_name} 清理失败")
-                except Exception as e:
-                    self.logger.error(f"❌ 清理工具 {route_name} 时发生异常: {e}")
+            self.logger.info(f"🧹 删除 {len(route_id_to_name)} 个路由")
+            route_ids = list(route_id_to_name)
+            deleted = self._run_concurrently(lambda route_id: self.delete_route(http_api_id, route_id), route_ids)
+
+            success_tools, failed_tools = [], []
+            for route_id, ok in zip(route_ids, deleted):
+                route_name = route_id_to_name[route_id]
+                if ok:
+                    success_tools.append(route_name)
+                    self.logger.info(f"✅ 工具 {route_name} 清理成功")
+                else:
                     failed_tools.append(route_name)
+                    self.logger.error(f"❌ 工具 {route_name} 清理失败")
 
-            # 检查是否需要清理共享服务
-            if success_tools or failed_tools:
-                self.logger.info("🧹 检查是否需要清理共享MCP服务")
-                self._cleanup_shared_service_if_needed(gateway_id, http_api_id)
+            # 检查是否需要清理共享服务；共享服务可能被其他环境的路由使用，需要重新查询全部环境的路由
+            self.logger.info("🧹 检查是否需要清理共享MCP服务")
+            self._cleanup_shared_service_if_needed(gateway_id, http_api_id)
 
             # 去重（避免同一工具被重复计算）
             success_tools = list(set(success_tools))
@@ -615,6 +1134,76 @@ class MCPGatewayRegistrar:
             self.logger.error(f"清理网关资源失败: {e}")
             raise
 
+    def _list_environment_routes(self, gateway_id: str, http_api_id: str,
+                                 environment_id: str) -> Optional[List[Dict]]:
+        """获取MCP HTTP API在当前环境下的路由列表，失败时返回 None"""
+        try:
+            routes = self._list_items(f"/v1/http-apis/{http_api_id}/routes", "获取所有路由",
+                                      gatewayId=gateway_id,
+                                      gatewayType="AI",
+                                      environmentId=environment_id)
+            self.logger.info(f"查询到 {len(routes)} 个路由")
+            return routes
+        except Exception as e:
+            self.logger.warning(f"查询所有路由失败: {e}")
+            return None
+
+    def _get_route_name(self, http_api_id: str, route_id: str) -> Optional[str]:
+        """按ID查询单个路由的名称，失败时返回 None"""
+        try:
+            response = self._execute_aliyun_cli("GET", f"/v1/http-apis/{http_api_id}/routes/{route_id}")
+            return self._check_response(response, "获取路由详情").get("name")
+        except Exception as e:
+            self.logger.warning(f"获取路由 {route_id} 信息失败: {e}")
+            return None
+
+    def _select_cleanup_routes(self, http_api_id: str, routes: Optional[List[Dict]],
+                               attachments: List[Dict]) -> Dict[str, str]:
+        """
+        将挂载中的路由ID与当前环境的路由列表关联，返回 {route_id: route_name}
+
+        不在列表中的路由（其他环境，或列表获取失败）逐个按ID查询。
+        挂载中没有找到任何路由时，退回到清理当前环境的所有非系统路由；路由列表获取失败时不做回退。
+        """
+        routes_by_id = {route.get("routeId"): route for route in routes or [] if route.get("routeId")}
+
+        route_id_to_name = {}
+        for attachment in attachments:
+            for route_id in attachment.get("attachResourceIds") or []:
+                if route_id in route_id_to_name:
+                    continue
+                if route_id in routes_by_id:
+                    route_name = routes_by_id[route_id].get("name")
+                else:
+                    route_name = self._get_route_name(http_api_id, route_id)
+                if route_name:
+                    route_id_to_name[route_id] = route_name
+                    self.logger.info(f"从插件挂载发现路由: {route_name} (ID: {route_id})")
+
+        if route_id_to_name:
+            return route_id_to_name
+
+        if routes is None:
+            self.logger.warning("插件挂载中未找到路由，且路由列表获取失败，跳过按路由列表清理")
+            return route_id_to_name
+
+        self.logger.info("插件挂载中未找到路由，清理当前环境的所有非系统路由")
+        for route_id, route in routes_by_id.items():
+            route_name = route.get("name", "")
+            # 排除系统路由和空名称路由
+            if route_name and not route_name.startswith("system-"):
+                route_id_to_name[route_id] = route_name
+                self.logger.info(f"发现可能的MCP路由: {route_name} (ID: {route_id})")
+        return route_id_to_name
+
+    def _run_concurrently(self, func, items: List[Any]) -> List[Any]:
+        """以 self.concurrency 为上限并发执行，结果顺序与 items 一致"""
+        if self.concurrency <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(items)),
+                                thread_name_prefix="cleanup") as executor:
+            return list(executor.map(func, items))
+
     def delete_service(self, gateway_id: str, service_id: str) -> bool:
         """删除服务"""
         try:
@@ -625,6 +1214,8 @@ class MCPGatewayRegistrar:
                                                 gatewayType="AI")
             self._check_response(response, "删除服务")
             self.logger.info(f"服务 {service_id} 删除成功")
+            if self.cache:
+                self.cache.invalidate(self.region, gateway_id, "shared_service_id")
             return True
         except Exception as e:
             self.logger.error(f"删除服务 {service_id} 失败: {e}")
@@ -634,7 +1225,7 @@ class MCPGatewayRegistrar:
         """如果共享服务不再被任何路由使用，则清理它"""
         try:
             # 查找共享服务
-            shared_service_name = "mcp-shared-service"
+            shared_service_name = SHARED_SERVICE_NAME
             existing_services = self._find_items_by_name(gateway_id, "/v1/services", shared_service_name)
 
             if not existing_services:
@@ -644,14 +1235,12 @@ class MCPGatewayRegistrar:
             shared_service_id = existing_services[0].get("serviceId")
             self.logger.info(f"找到共享MCP服务，ID: {shared_service_id}")
 
-            # 检查是否还有路由在使用这个服务
-            response = self._execute_aliyun_cli("GET", f"/v1/http-apis/{http_api_id}/routes",
+            # 检查是否还有路由在使用这个服务，找到一个即可停止翻页
+            remaining_routes = self._iter_items(f"/v1/http-apis/{http_api_id}/routes", "检查剩余路由",
                                                 gatewayId=gateway_id,
                                                 gatewayType="AI")
-            data = self._check_response(response, "检查剩余路由")
-
             service_in_use = False
-            for route in data.get("items", []):
+            for route in remaining_routes:
                 backend_config = route.get("backendConfig", {})
                 services_config = backend_config.get("services", [])
                 for svc in services_config:
@@ -675,6 +1264,471 @@ class MCPGatewayRegistrar:
             self.logger.warning(f"检查共享服务状态失败: {e}")
 
 
+
+class AsyncMCPGatewayRegistrar(MCPGatewayRegistrar):
+    """
+    基于asyncio的注册引擎
+
+    CLI调用使用异步子进程，互不依赖的发现调用并发执行，
+    每个工具按 获取规范 → 转换 → 路由 → 挂载 的流水线推进，各阶段并发数有上限。
+    """
+
+    def __init__(self, region: str = "cn-hangzhou", log_level: str = "INFO", debug_response: bool = False,
+                 transport=None, cache: GatewayDiscoveryCache = None, converter: str = "binary",
+                 config_cache: MCPConfigCache = None, concurrency: int = 4, shared_attachments: bool = False,
+                 spec_fetcher: SpecFetcher = None, retry_policy: RetryPolicy = None, tracer: Tracer = None):
+        super().__init__(region, log_level, debug_response, transport, cache, converter, config_cache, concurrency,
+                         shared_attachments, spec_fetcher, retry_policy, tracer)
+        self.page_prefetch = self.concurrency
+
+    async def _aexecute_aliyun_cli(self, method: str, endpoint: str, body: Dict = None, **params) -> Dict[str, Any]:
+        """异步执行APIG调用，CLI传输层使用异步子进程"""
+        self.logger.info(f"执行CLI: {method} {endpoint}")
+        with self.tracer.request_span("apig", method, endpoint):
+            returncode, stdout, stderr = await self.retry_policy.acall(
+                method, endpoint, lambda: self.transport.aexecute(method, endpoint, body, params),
+                classify_cli_result)
+        return self._parse_cli_output(method, endpoint, returncode, stdout, stderr)
+
+    def _aiter_items(self, endpoint: str, operation: str, page_size: int = DEFAULT_PAGE_SIZE, **params):
+        """异步分页迭代器，已知总页数时以并发数为窗口预取后续页"""
+        async def fetch_page(page_number: int, size: int) -> Dict:
+            response = await self._aexecute_aliyun_cli("GET", endpoint, pageNumber=str(page_number),
+                                                       pageSize=str(size), **params)
+            return self._check_response(response, operation)
+
+        return aiter_pages(fetch_page, page_size, self.page_prefetch)
+
+    async def _alist_items(self, endpoint: str, operation: str, until=None, **params) -> List[Dict]:
+        """
+        异步获取列表条目
+
+        Args:
+            until: 条目判定函数，出现满足条件的条目后停止翻页
+        """
+        items = []
+        pages = self._aiter_items(endpoint, operation, **params)
+        try:
+            async for item in pages:
+                items.append(item)
+                if until and until(item):
+                    break
+        finally:
+            await pages.aclose()
+        return items
+
+    async def _afind_items_by_name(self, gateway_id: str, endpoint: str, name: str, **extra_params) -> List[Dict]:
+        """异步按名称查找资源"""
+        try:
+            return await self._alist_items(endpoint, f"查询{endpoint}",
+                                           gatewayId=gateway_id,
+                                           gatewayType="AI",
+                                           name=name,
+                                           **extra_params)
+        except Exception:
+            return []
+
+    async def _acached_lookup(self, gateway_id: str, key: str, loader) -> Any:
+        """异步版本的 _cached_lookup，loader 为协程函数"""
+        if self.cache:
+            value = self.cache.get(self.region, gateway_id, key)
+            if value:
+                self.logger.info(f"使用缓存的{key}: {value}")
+                self._cache_hits.add((gateway_id, key))
+                return value
+        self._cache_hits.discard((gateway_id, key))
+        value = await loader(gateway_id)
+        if self.cache and value:
+            self.cache.set(self.region, gateway_id, key, value)
+        return value
+
+    async def aget_http_api_id(self, gateway_id: str) -> str:
+        """异步获取MCP类型的HTTP API ID"""
+        return await self._acached_lookup(gateway_id, "http_api_id", self._adiscover_http_api_id)
+
+    async def _adiscover_http_api_id(self, gateway_id: str) -> str:
+        items = await self._alist_items("/v1/http-apis", "获取HTTP API列表", until=self._is_mcp_http_api,
+                                        gatewayId=gateway_id, gatewayType="AI")
+        return self._select_http_api_id(items)
+
+    async def aget_environment_id(self, gateway_id: str) -> str:
+        """异步获取环境ID"""
+        return await self._acached_lookup(gateway_id, "environment_id", self._adiscover_environment_id)
+
+    async def _adiscover_environment_id(self, gateway_id: str) -> str:
+        items = await self._alist_items("/v1/environments", "获取环境列表", until=self._is_default_environment,
+                                        gatewayId=gateway_id, gatewayType="AI")
+        return self._select_environment_id(items)
+
+    async def aensure_domain(self, gateway_id: str, domain_id: str = None) -> str:
+        """异步确保域名存在，逻辑与 ensure_domain 一致"""
+        if domain_id:
+            try:
+                self.logger.info(f"检查指定域名ID: {domain_id}")
+                response = await self._aexecute_aliyun_cli("GET", f"/v1/domains/{domain_id}")
+                data = self._check_response(response, "验证域名可用性")
+                self.logger.info(f"✅ 域名ID {domain_id} 可用，域名: {data.get('name', 'Unknown')}")
+                return domain_id
+            except Exception as e:
+                raise RuntimeError(f"❌ 指定的域名ID {domain_id} 不可用或无效: {e}")
+
+        self.logger.info("未指定域名ID，查找或创建通配符域名")
+        return await self._acached_lookup(gateway_id, "wildcard_domain_id", self._afind_or_create_wildcard_domain)
+
+    async def _afind_or_create_wildcard_domain(self, gateway_id: str) -> str:
+        try:
+            items = await self._alist_items("/v1/domains", "查询通配符域名", until=self._is_wildcard_domain,
+                                            gatewayType="AI", nameLike="*")
+            found_domain_id = self._select_wildcard_domain_id(items)
+            if found_domain_id:
+                self.logger.info(f"✅ 找到现有通配符域名，ID: {found_domain_id}")
+                return found_domain_id
+        except Exception as e:
+            self.logger.warning(f"查询通配符域名失败: {e}")
+
+        self.logger.info("🔨 创建新的通配符域名")
+        try:
+            response = await self._aexecute_aliyun_cli("POST", "/v1/domains",
+                                                       {"name": "*", "protocol": "HTTP", "gatewayType": "AI"})
+            data = self._check_response(response, "创建通配符域名")
+            new_domain_id = data.get("domainId")
+            self.logger.info(f"✅ 通配符域名创建成功，ID: {new_domain_id}")
+            return new_domain_id
+        except RuntimeError as e:
+            if "Conflict.DomainExisted" not in str(e) and "域名*已存在" not in str(e):
+                raise RuntimeError(f"创建通配符域名失败: {e}")
+
+        self.logger.warning("⚠️  通配符域名已存在，重新查询")
+        try:
+            items = await self._alist_items("/v1/domains", "重新查询通配符域名", until=self._is_wildcard_domain,
+                                            gatewayId=gateway_id, gatewayType="AI", nameLike="*")
+            existing_domain_id = self._select_wildcard_domain_id(items)
+        except Exception as query_e:
+            raise RuntimeError(f"通配符域名已存在但重新查询失败: {query_e}")
+        if not existing_domain_id:
+            raise RuntimeError("通配符域名已存在但无法查询到对应的域名ID")
+        self.logger.info(f"✅ 重新查询找到通配符域名，ID: {existing_domain_id}")
+        return existing_domain_id
+
+    async def aensure_shared_service(self, gateway_id: str, private_ip: str) -> str:
+        """异步确保共享的MCP服务存在"""
+        async def find_or_create(gw_id):
+            return await self._afind_or_create_shared_service(gw_id, private_ip)
+
+        return await self._acached_lookup(gateway_id, "shared_service_id", find_or_create)
+
+    async def _afind_or_create_shared_service(self, gateway_id: str, private_ip: str) -> str:
+        existing_services = await self._afind_items_by_name(gateway_id, "/v1/services", SHARED_SERVICE_NAME)
+        if existing_services:
+            service_id = existing_services[0].get("serviceId")
+            self.logger.info(f"✅ 共享MCP服务已存在，ID: {service_id}")
+            return service_id
+
+        self.logger.info(f"🔨 创建共享MCP服务: {SHARED_SERVICE_NAME}")
+        body = self._build_shared_service_body(gateway_id, private_ip)
+        response = await self._aexecute_aliyun_cli("POST", "/v1/services", body)
+        data = self._check_response(response, "创建共享MCP服务")
+        return self._extract_shared_service_id(data)
+
+    async def aensure_route(self, http_api_id: str, gateway_id: str, environment_id: str,
+                            tool_name: str, domain_id: str, service_id: str, force_update: bool) -> Tuple[str, bool]:
+        """异步确保路由存在，返回值含义与 ensure_route 相同"""
+        existing_routes = await self._afind_items_by_name(gateway_id, f"/v1/http-apis/{http_api_id}/routes",
+                                                          tool_name, environmentId=environment_id)
+        if existing_routes:
+            route_id = existing_routes[0].get("routeId")
+            self.logger.info(f"路由 {tool_name} 已存在，ID: {route_id}")
+
+            try:
+                response = await self._aexecute_aliyun_cli("GET", f"/v1/http-apis/{http_api_id}/routes/{route_id}")
+                route_data = self._check_response(response, "获取路由详情")
+                if domain_id not in route_data.get("domainIds", []):
+                    self.logger.info(f"路由 {tool_name} 需要更新域名配置")
+                    update_body = self._build_route_domain_update_body(route_data, tool_name, domain_id, environment_id)
+                    await self._aexecute_aliyun_cli("PUT", f"/v1/http-apis/{http_api_id}/routes/{route_id}",
+                                                    update_body)
+                    self.logger.info(f"路由 {tool_name} 域名配置已更新")
+            except Exception as e:
+                self.logger.warning(f"检查或更新路由域名配置失败: {e}")
+
+            return route_id, force_update
+
+        self.logger.info(f"创建路由: {tool_name}")
+        body = self._build_route_body(tool_name, domain_id, environment_id, service_id)
+        response = await self._aexecute_aliyun_cli("POST", f"/v1/http-apis/{http_api_id}/routes", body)
+        data = self._check_response(response, "创建路由")
+        return self._extract_route_id(data), True
+
+    async def agenerate_mcp_config(self, tool_name: str, openapi_base_url: str, api_key: str, skip_auth: bool,
+                                   fetch_limit: asyncio.Semaphore, convert_limit: asyncio.Semaphore) -> str:
+        """异步生成MCP配置：规范获取和转换分别受各自阶段的并发上限约束"""
+        loop = asyncio.get_event_loop()
+
+        async with fetch_limit:
+            fetched = await loop.run_in_executor(None, self._fetch_spec, tool_name, openapi_base_url)
+        spec = fetched.spec
+
+        async with convert_limit:
+            with self.tracer.span("mcp_convert", tool=tool_name) as span:
+                cache_key, cached = await loop.run_in_executor(None, self._lookup_mcp_config, tool_name, spec,
+                                                               openapi_base_url, api_key, skip_auth, fetched.digest)
+                span.set("cached", bool(cached))
+                if cached:
+                    return cached
+
+                if self.converter == "native":
+                    return await loop.run_in_executor(None, self._build_native_mcp_config, tool_name, spec,
+                                                      openapi_base_url, api_key, skip_auth, cache_key)
+
+                json_file, yaml_file = self._prepare_conversion_files(tool_name, spec)
+                process = await asyncio.create_subprocess_exec(
+                    *self._build_convert_command(tool_name, json_file, yaml_file),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                _, stderr = await process.communicate()
+                if process.returncode != 0:
+                    raise RuntimeError(f"转换OpenAPI失败: {stderr.decode('utf-8')}")
+
+                return await loop.run_in_executor(None, self._finalize_mcp_config, tool_name, yaml_file,
+                                                  openapi_base_url, api_key, skip_auth, cache_key)
+
+    async def aget_route_attachments(self, gateway_id: str, plugin_id: str) -> Dict[str, Dict]:
+        """异步获取插件挂载并按路由ID建立索引"""
+        try:
+            items = await self._alist_items("/v1/plugin-attachments", "获取插件挂载列表",
+                                            gatewayId=gateway_id,
+                                            gatewayType="AI",
+                                            pluginId=plugin_id)
+            return self._index_attachments_by_route(items)
+        except Exception as e:
+            self.logger.warning(f"获取插件挂载列表失败: {e}")
+            return {}
+
+    async def _aget_attachment_config(self, attachment: Dict) -> Optional[str]:
+        """异步取出挂载当前的插件配置"""
+        if attachment.get("pluginConfig") is not None:
+            return attachment["pluginConfig"]
+        attachment_id = self._attachment_id(attachment)
+        if not attachment_id:
+            return None
+        try:
+            response = await self._aexecute_aliyun_cli("GET", f"/v1/plugin-attachments/{attachment_id}")
+            return self._check_response(response, "获取插件挂载详情").get("pluginConfig")
+        except Exception as e:
+            self.logger.warning(f"获取插件挂载 {attachment_id} 详情失败: {e}")
+            return None
+
+    async def areconcile_plugin_attachment(self, gateway_id: str, plugin_id: str, route_id: str,
+                                           plugin_config: str, attachment: Dict = None, force: bool = False) -> bool:
+        """异步对比配置哈希，只在配置变化时更新挂载"""
+        if attachment and not force:
+            if self._attachment_up_to_date(await self._aget_attachment_config(attachment), plugin_config):
+                self.logger.info(f"路由 {route_id} 的插件配置未变化，跳过更新")
+                return False
+        if attachment and len(attachment.get("attachResourceIds") or []) > 1:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self.detach_routes, attachment, [route_id])
+            attachment = None
+        await self.aupdate_plugin_attachment(gateway_id, plugin_id, route_id, plugin_config, attachment)
+        return True
+
+    async def aupdate_plugin_attachment(self, gateway_id: str, plugin_id: str, route_id: str, plugin_config: str,
+                                        attachment: Dict = None):
+        """异步原地更新或创建插件挂载"""
+        if attachment:
+            await self._aput_plugin_attachment(attachment, route_id, plugin_config)
+            return
+
+        self.logger.info("创建插件挂载")
+        body = self._build_attachment_body(gateway_id, plugin_id, route_id, plugin_config)
+        try:
+            response = await self._aexecute_aliyun_cli("POST", "/v1/plugin-attachments", body)
+            self._check_response(response, "创建插件挂载")
+            self.logger.info("插件挂载创建成功")
+        except RuntimeError as e:
+            self._handle_attachment_error(e)
+            attachment = (await self.aget_route_attachments(gateway_id, plugin_id)).get(route_id)
+            if attachment:
+                await self._aput_plugin_attachment(attachment, route_id, plugin_config)
+
+    async def _aput_plugin_attachment(self, attachment: Dict, route_id: str, plugin_config: str):
+        attachment_id = self._attachment_id(attachment)
+        self.logger.info(f"更新插件挂载: {attachment_id}")
+        body = self._build_attachment_update_body(attachment, route_id, plugin_config)
+        response = await self._aexecute_aliyun_cli("PUT", f"/v1/plugin-attachments/{attachment_id}", body)
+        self._check_response(response, "更新插件挂载")
+        self.logger.info(f"插件挂载 {attachment_id} 更新成功")
+
+    async def _adiscover_gateway(self, gateway_id: str, plugin_id: str, private_ip: str,
+                                 domain_id: str = None) -> Tuple[str, str, str, str, Dict[str, Dict]]:
+        """异步并发获取注册所需的网关基础信息和已有插件挂载"""
+        with self.tracer.span("discovery"):
+            http_api_id, domain_id, environment_id, shared_service_id, attachments = await asyncio.gather(
+                self.aget_http_api_id(gateway_id),
+                self.aensure_domain(gateway_id, domain_id),
+                self.aget_environment_id(gateway_id),
+                self.aensure_shared_service(gateway_id, private_ip),
+                self.aget_route_attachments(gateway_id, plugin_id)
+            )
+        self.logger.info(f"🔧 所有MCP工具将使用共享服务，ID: {shared_service_id}")
+        return http_api_id, domain_id, environment_id, shared_service_id, attachments
+
+    async def _aprocess_tool(self, tool: str, config_future: "asyncio.Future", api_limit: asyncio.Semaphore,
+                             http_api_id: str, gateway_id: str, environment_id: str, domain_id: str,
+                             service_id: str, plugin_id: str, force_update: bool, attachments: Dict[str, Dict]):
+        """单个工具的路由和挂载阶段，配置生成在后台并行进行"""
+        self.logger.info(f"📝 处理工具: {tool}")
+        async with api_limit:
+            with self.tracer.span("route", tool=tool):
+                route_id, need_update = await self.aensure_route(http_api_id, gateway_id, environment_id,
+                                                                 tool, domain_id, service_id, force_update)
+
+        # 等待后台配置生成的时间，反映流水线中路由阶段与转换阶段的重叠程度
+        with self.tracer.span("config_wait", tool=tool):
+            plugin_config = await config_future
+        if self.shared_attachments:
+            return route_id, plugin_config
+        async with api_limit:
+            with self.tracer.span("plugin", tool=tool):
+                updated = await self.areconcile_plugin_attachment(gateway_id, plugin_id, route_id, plugin_config,
+                                                                  attachments.get(route_id), force=need_update)
+        if updated:
+            self.logger.info(f"✅ 工具 {tool} 配置已更新")
+        else:
+            self.logger.info(f"⏭️  工具 {tool} 跳过配置更新")
+
+    async def aregister_tools(self, gateway_id: str, plugin_id: str, private_ip: str,
+                              tools_config: str, api_key: str, openapi_base_url: str = "http://127.0.0.1:8000",
+                              skip_auth: bool = False, force_update: bool = False, domain_id: str = None,
+                              tools: List[str] = None) -> Tuple[int, int, List[str], List[str]]:
+        """异步注册工具到AI网关，tools 为空时注册配置文件中的全部工具"""
+        self.logger.info(f"开始注册MCP工具到AI网关 (asyncio引擎，并发数: {self.concurrency})")
+        if tools is None:
+            tools = self.extract_tools_from_config(tools_config)
+
+        fetch_limit = asyncio.Semaphore(self.concurrency)
+        convert_limit = asyncio.Semaphore(min(self.concurrency, os.cpu_count() or 1))
+        api_limit = asyncio.Semaphore(self.concurrency)
+
+        # 规范获取和转换不依赖网关信息，与发现调用同时开始
+        config_futures = [
+            asyncio.ensure_future(self.agenerate_mcp_config(tool, openapi_base_url, api_key, skip_auth,
+                                                            fetch_limit, convert_limit))
+            for tool in tools
+        ]
+
+        try:
+            http_api_id, resolved_domain_id, environment_id, shared_service_id, attachments = \
+                await self._adiscover_gateway(gateway_id, plugin_id, private_ip, domain_id)
+
+            outcomes = await asyncio.gather(*[
+                self._aprocess_tool(tool, config_future, api_limit, http_api_id, gateway_id, environment_id,
+                                    resolved_domain_id, shared_service_id, plugin_id, force_update, attachments)
+                for tool, config_future in zip(tools, config_futures)
+            ], return_exceptions=True)
+
+            # 缓存的ID在控制台已被删除时，清除缓存重新发现一次，再重试因资源不存在而失败的工具
+            stale_keys = set()
+            for outcome in outcomes:
+                if isinstance(outcome, Exception):
+                    stale_keys.update(self._invalidate_stale_ids(gateway_id, outcome))
+            if stale_keys:
+                if "mcp_plugin_id" in stale_keys:
+                    plugin_id = await asyncio.get_event_loop().run_in_executor(None, self.get_mcp_plugin_id,
+                                                                               gateway_id)
+                http_api_id, resolved_domain_id, environment_id, shared_service_id, attachments = \
+                    await self._adiscover_gateway(gateway_id, plugin_id, private_ip, domain_id)
+                retry_indexes = [index for index, outcome in enumerate(outcomes)
+                                 if isinstance(outcome, Exception) and _NOT_FOUND_PATTERN.search(str(outcome))]
+                retried = await asyncio.gather(*[
+                    self._aprocess_tool(tools[index], config_futures[index], api_limit, http_api_id, gateway_id,
+                                        environment_id, resolved_domain_id, shared_service_id, plugin_id,
+                                        force_update, attachments)
+                    for index in retry_indexes
+                ], return_exceptions=True)
+                for index, outcome in zip(retry_indexes, retried):
+                    outcomes[index] = outcome
+        except Exception as e:
+            self.logger.error(f"注册工具失败: {e}")
+            self.tracer.log_summary(self.logger, "各阶段及APIG调用耗时")
+            raise
+        finally:
+            for config_future in config_futures:
+                config_future.cancel()
+            await asyncio.gather(*config_futures, return_exceptions=True)
+
+        success_tools, failed_tools, prepared = [], [], {}
+        for tool, outcome in zip(tools, outcomes):
+            if isinstance(outcome, Exception):
+                self.logger.error(f"❌ 处理工具 {tool} 失败: {outcome}")
+                failed_tools.append(tool)
+            elif self.shared_attachments:
+                prepared[tool] = outcome
+            else:
+                success_tools.append(tool)
+
+        if prepared:
+            # 分组挂载需要看到全部工具的配置，在所有工具处理完成后统一执行
+            loop = asyncio.get_event_loop()
+            with self.tracer.span("shared_attach", tools=len(prepared)):
+                attach_failed = await loop.run_in_executor(
+                    None, self.apply_shared_attachments, gateway_id, plugin_id, prepared,
+                    self._unique_attachments(attachments), force_update)
+            failed_tools.extend(attach_failed)
+            success_tools.extend(tool for tool in prepared if tool not in attach_failed)
+
+        self.tracer.log_summary(self.logger, "各阶段及APIG调用耗时")
+        return len(success_tools), len(failed_tools), success_tools, failed_tools
+
+    def register_tools(self, *args, **kwargs) -> Tuple[int, int, List[str], List[str]]:
+        """在独立的事件循环中运行异步注册流程"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.concurrency))
+        try:
+            return loop.run_until_complete(self.aregister_tools(*args, **kwargs))
+        finally:
+            loop.close()
+
+
+def print_latency_summary(transport):
+    """打印传输层记录的APIG调用耗时统计"""
+    print(f"\n{'=' * 50}")
+    print(f"⏱️  APIG调用耗时统计 (传输层: {transport.name}, 共 {transport.stats.total_calls()} 次调用)")
+    print(f"{'=' * 50}")
+    for line in transport.stats.summary_lines():
+        print(f"   {line}")
+
+
+def export_trace(tracer: Tracer, path: str, trace_format: str):
+    """导出各阶段和APIG调用的耗时时间线"""
+    try:
+        tracer.write(path, trace_format)
+        print(f"🕒 耗时时间线已写入: {path} ({trace_format})")
+    except (OSError, ValueError) as e:
+        print(f"⚠️  写入耗时时间线失败: {e}")
+
+
+def watch_and_sync(registrar: MCPGatewayRegistrar, args, plugin_id: str, initial_settings: Dict[str, Any],
+                   success_tools: List[str]):
+    """监听工具配置文件，变化后增量同步到AI网关，直到收到中断信号"""
+    # 首次注册失败的工具不计入基准，会在第一次同步时作为新增工具重试
+    applied = {name: settings for name, settings in initial_settings.items() if name in success_tools}
+
+    def sync(changes, desired):
+        return registrar.sync_tools(args.gateway_id, plugin_id, args.private_ip, changes, args.api_key,
+                                    args.openapi_base_url, args.skip_auth, args.domain_id)
+
+    print(f"👀 监听工具配置文件变化: {args.tools_config} (Ctrl+C 退出)")
+    try:
+        watch_config(args.tools_config, sync, applied, debounce=args.watch_debounce,
+                     poll_interval=args.watch_poll_interval, use_inotify=not args.watch_polling,
+                     logger=registrar.logger)
+    except KeyboardInterrupt:
+        print("👋 停止监听")
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description="MCP工具自动注册和清理工具")
@@ -692,19 +1746,62 @@ def main():
     register_parser.add_argument("--openapi-base-url", default="http://127.0.0.1:8000", help="OpenAPI基础URL")
     register_parser.add_argument("--domain-id", help="指定域名ID（不提供则使用通配符域名）")
     register_parser.add_argument("--skip-auth", action="store_true", help="跳过添加鉴权信息")
-    register_parser.add_argument("--force-update", action="store_true", help="强制更新配置")
+    register_parser.add_argument("--force-update", action="store_true", help="强制更新配置，不对比插件配置哈希")
+    register_parser.add_argument("--converter", default="binary", choices=["binary", "native"],
+                                 help="OpenAPI转换方式：binary调用./openapi-to-mcp，native进程内转换"
+                                      "（converter_parity.py的样例全部录制并一致后才可使用）")
+    register_parser.add_argument("--config-cache-dir", default=DEFAULT_CONFIG_CACHE_DIR,
+                                 help="按OpenAPI内容缓存生成的MCP配置的目录")
+    register_parser.add_argument("--no-config-cache", action="store_true", help="不使用MCP配置缓存，每次都重新转换")
+    register_parser.add_argument("--spec-store-dir", default=DEFAULT_SPEC_STORE_DIR,
+                                 help="保存OpenAPI规范及其ETag/Last-Modified的目录，用于条件请求")
+    register_parser.add_argument("--no-spec-store", action="store_true", help="不在磁盘保存OpenAPI规范")
+    register_parser.add_argument("--shared-attachment", action="store_true",
+                                 help="配置相同的工具共用一个插件挂载（按配置哈希分组）")
+    register_parser.add_argument("--engine", default="sync", choices=["sync", "async"],
+                                 help="注册引擎：sync逐个处理，async使用asyncio流水线并发处理")
+    register_parser.add_argument("--watch", action="store_true",
+                                 help="注册完成后持续监听工具配置文件，只同步新增、修改和删除的工具")
+    register_parser.add_argument("--watch-debounce", type=float, default=DEFAULT_DEBOUNCE,
+                                 help="监听模式下合并连续修改的防抖秒数")
+    register_parser.add_argument("--watch-poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                                 help="inotify不可用时轮询配置文件的间隔秒数")
+    register_parser.add_argument("--watch-polling", action="store_true", help="监听模式下不使用inotify，直接轮询")
 
     # 清理命令
     cleanup_parser = subparsers.add_parser("cleanup", help="清理AI网关侧所有MCP资源")
     cleanup_parser.add_argument("--gateway-id", required=True, help="AI网关ID")
     cleanup_parser.add_argument("--plugin-id", help="插件ID（不提供则自动获取）")
 
+    # 缓存失效命令
+    invalidate_parser = subparsers.add_parser("invalidate-cache", help="清除指定网关的发现结果缓存")
+    invalidate_parser.add_argument("--gateway-id", required=True, help="AI网关ID")
+    invalidate_parser.add_argument("--key", help="只清除指定的缓存项（如 http_api_id），不提供则清除全部")
+
     # 通用参数
-    for subparser in [register_parser, cleanup_parser]:
+    for subparser in [register_parser, cleanup_parser, invalidate_parser]:
         subparser.add_argument("--region", default="cn-hangzhou", help="阿里云区域")
+        subparser.add_argument("--cache-file", default=DEFAULT_CACHE_PATH, help="网关发现结果缓存文件")
+
+    for subparser in [register_parser, cleanup_parser]:
+        subparser.add_argument("--concurrency", type=int, default=4,
+                               help="async引擎各阶段以及清理时删除操作的最大并发数")
+        subparser.add_argument("--cache-ttl", type=float, default=DEFAULT_CACHE_TTL, help="发现结果缓存有效期（秒）")
+        subparser.add_argument("--no-cache", action="store_true", help="不使用网关发现结果缓存")
         subparser.add_argument("-d", "--debug-response", action="store_true", help="打印详细响应信息")
         subparser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
                                help="日志级别")
+        subparser.add_argument("--transport", default="cli", choices=["cli", "http"],
+                               help="APIG调用方式：cli调用./aliyun，http进程内签名并复用长连接")
+        subparser.add_argument("--apig-endpoint", help="http传输层使用的APIG地址（默认 https://apig.<region>.aliyuncs.com）")
+        subparser.add_argument("--ram-role-name", help="http传输层从ECS元数据获取凭证时使用的RAM角色名")
+        subparser.add_argument("--show-latency", action="store_true", help="结束时打印每个APIG接口的调用耗时统计")
+        subparser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                               help="APIG调用遇到限流或服务暂时不可用时的最大尝试次数（POST只在限流时重试）")
+        subparser.add_argument("--retry-budget", type=int, default=DEFAULT_RETRY_BUDGET, help="本次运行允许的重试总次数")
+        subparser.add_argument("--trace-file", help="结束时将各阶段和APIG调用的耗时时间线写入该文件")
+        subparser.add_argument("--trace-format", default=CHROME, choices=TRACE_FORMATS,
+                               help="时间线格式：chrome 可在 chrome://tracing 或 Perfetto 中打开，otlp 为 OTLP-JSON")
 
     args = parser.parse_args()
 
@@ -713,8 +1810,46 @@ def main():
         parser.print_help()
         sys.exit(1)
 
+    if args.command == "register" and args.converter == "native":
+        converter_error = native_converter_error()
+        if converter_error:
+            parser.error(converter_error)
+
+    if args.command == "invalidate-cache":
+        GatewayDiscoveryCache(args.cache_file).invalidate(args.region, args.gateway_id, args.key)
+        print(f"✅ 已清除网关 {args.gateway_id} 的发现结果缓存")
+        sys.exit(0)
+
     try:
-        registrar = MCPGatewayRegistrar(args.region, args.log_level, args.debug_response)
+        cache = None if args.no_cache else GatewayDiscoveryCache(args.cache_file, args.cache_ttl)
+        config_cache = None
+        spec_fetcher = None
+        if args.command == "register":
+            if not args.no_config_cache:
+                config_cache = MCPConfigCache(args.config_cache_dir)
+            spec_fetcher = SpecFetcher(None if args.no_spec_store else args.spec_store_dir,
+                                       pool_size=args.concurrency)
+        retry_policy = RetryPolicy("APIG", max_attempts=args.max_attempts, retry_budget=args.retry_budget,
+                                   logger=logging.getLogger("MCPGatewayRegistrar"))
+        if getattr(args, "engine", "sync") == "async":
+            registrar = AsyncMCPGatewayRegistrar(args.region, args.log_level, args.debug_response, cache=cache,
+                                                 converter=args.converter, config_cache=config_cache,
+                                                 concurrency=args.concurrency,
+                                                 shared_attachments=args.shared_attachment, spec_fetcher=spec_fetcher,
+                                                 retry_policy=retry_policy)
+        else:
+            registrar = MCPGatewayRegistrar(args.region, args.log_level, args.debug_response, cache=cache,
+                                            converter=getattr(args, "converter", "binary"),
+                                            config_cache=config_cache, concurrency=args.concurrency,
+                                            shared_attachments=getattr(args, "shared_attachment", False),
+                                            spec_fetcher=spec_fetcher, retry_policy=retry_policy)
+        registrar.transport = create_transport(args.transport, args.region, registrar.logger,
+                                               endpoint=args.apig_endpoint, ram_role_name=args.ram_role_name,
+                                               pool_size=args.concurrency)
+        if args.show_latency:
+            atexit.register(print_latency_summary, registrar.transport)
+        if args.trace_file:
+            atexit.register(export_trace, registrar.tracer, args.trace_file, args.trace_format)
 
         # 获取插件ID
         plugin_id = args.plugin_id
@@ -727,6 +1862,9 @@ def main():
             print(f"✅ 获取到插件ID: {plugin_id}")
 
         if args.command == "register":
+            # 监听模式以注册前读取的内容作为比较基准，注册期间的修改会在之后被识别出来
+            initial_settings = load_tool_settings(args.tools_config) if args.watch else None
+
             # 执行注册
             success_count, failed_count, success_tools, failed_tools = registrar.register_tools(
                 gateway_id=args.gateway_id,
@@ -752,8 +1890,17 @@ def main():
             if failed_tools:
                 print(f"   {', '.join(failed_tools)}")
             print(f"📈 总计: {success_count + failed_count} 个工具")
+            if config_cache:
+                print(f"🗂️  MCP配置缓存: 命中 {config_cache.hits} 个，未命中 {config_cache.misses} 个")
+            print(f"📄 OpenAPI规范获取: {registrar.spec_fetcher.summary()}")
+            if registrar.retry_policy.retries:
+                print(f"🔁 APIG调用重试: {registrar.retry_policy.retries} 次")
             print(f"{'=' * 50}")
 
+            if args.watch:
+                watch_and_sync(registrar, args, plugin_id, initial_settings, success_tools)
+                sys.exit(0)
+
             # 设置退出码
             if failed_count == 0:
                 print("🎉 所有工具都已成功注册！")
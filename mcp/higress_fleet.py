@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+由一个控制节点并发配置多台 Higress 实例
+
+清单文件（YAML 或 JSON）列出各实例的控制台地址，defaults 中的字段对所有主机生效，主机条目中的同名字段优先：
+
+    defaults:
+      api_key: "******"
+      config: /root/config.json
+    hosts:
+      - 10.0.0.11                      # 只写地址时，控制台为 http://地址:8001，mcpo 为 http://地址:8000
+      - name: ecs-2
+        domain: 10.0.0.12
+        base_url: http://10.0.0.12:8001
+        openapi_url: http://10.0.0.12:8000
+        state: redis://10.0.0.12:6379/0  # 可选，与该主机上的单机运行共用配置锁和共享状态
+
+每台主机使用独立的 HigressClient（独立的会话、连接池和日志文件），--max-hosts 限制同时配置的主机数，
+每台主机内部按 --concurrency 并发配置工具；MCP 配置缓存在各主机间共用。
+整体耗时取决于最慢的主机，而不是各主机耗时之和。完成后输出主机 × 工具的成功/失败矩阵。
+
+批量模式只通过控制台 API 配置消费者、服务来源、路由和 MCP 插件，不会写入目标主机上的
+configmaps/higress-config.yaml（mcpServer 的 Redis 地址、match_list、连接参数）。
+因此只能用于已在本机执行过单机部署（higress_client.py）的主机的重新配置：
+未完成单机部署的主机即使在矩阵中显示 ✓，其 MCP Server 也无法工作。
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+import unicodedata
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+from converter_parity import native_converter_error
+from higress_client import HigressClient
+from log_pipeline import DEFAULT_PIPELINE
+from mcp_config_cache import DEFAULT_CONFIG_CACHE_DIR, MCPConfigCache
+from provision_state import (DEFAULT_LEASE_TTL, DEFAULT_LOCK_WAIT, DEFAULT_STATE_PREFIX, PROVISION_LOCK,
+                             open_state_store)
+from readiness import DEFAULT_READY_TIMEOUT, wait_until_ready
+from retry_policy import DEFAULT_MAX_ATTEMPTS, DEFAULT_RETRY_BUDGET, RetryPolicy
+from spec_store import DEFAULT_SPEC_STORE_DIR
+
+DEFAULT_MAX_HOSTS = 8
+DEFAULT_LOG_DIR = "fleet-logs"
+
+HOST_FIELDS = ("name", "domain", "base_url", "openapi_url", "username", "api_key", "config", "state")
+FleetHost = namedtuple("FleetHost", HOST_FIELDS)
+# status: ok 全部成功，partial 部分工具失败，failed 连接或配置流程失败；tools 为 {工具名: ok/unchanged/failed}
+HostResult = namedtuple("HostResult", ["host", "status", "tools", "error", "elapsed"])
+
+MATRIX_SYMBOLS = {"ok": "✓", "unchanged": "=", "failed": "✗"}
+
+
+def load_inventory(path: str, defaults: Dict[str, Any] = None) -> List[FleetHost]:
+    """
+    读取主机清单
+
+    Args:
+        defaults: 命令行给出的默认值，优先级低于清单中的 defaults 和主机条目
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    if isinstance(data, list):
+        data = {"hosts": data}
+    if not isinstance(data, dict) or not isinstance(data.get("hosts"), list) or not data["hosts"]:
+        raise ValueError(f"主机清单 {path} 中没有 hosts 列表")
+
+    base = {field: value for field, value in (defaults or {}).items() if value is not None}
+    base.update(data.get("defaults") or {})
+    hosts = []
+    for index, entry in enumerate(data["hosts"]):
+        if isinstance(entry, str):
+            entry = {"domain": entry}
+        if not isinstance(entry, dict):
+            raise ValueError(f"主机清单第 {index + 1} 项格式错误: {entry!r}")
+        values = dict(base, **entry)
+        unknown = set(values) - set(HOST_FIELDS)
+        if unknown:
+            raise ValueError(f"主机清单第 {index + 1} 项包含未知字段: {', '.join(sorted(unknown))}")
+        domain = values.get("domain")
+        if not domain:
+            raise ValueError(f"主机清单第 {index + 1} 项缺少 domain")
+        host = str(domain).split("://")[-1].split("/")[0].split(":")[0]
+        values.setdefault("name", str(domain))
+        values.setdefault("base_url", f"http://{host}:8001")
+        values.setdefault("openapi_url", f"http://{host}:8000")
+        values.setdefault("username", "admin")
+        hosts.append(FleetHost(**{field: values.get(field) for field in HOST_FIELDS}))
+
+    names = [host.name for host in hosts]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"主机清单中的主机名重复: {', '.join(duplicates)}")
+    missing_config = [host.name for host in hosts if not host.config]
+    if missing_config:
+        raise ValueError(f"以下主机未指定 MCP 配置文件 (config): {', '.join(missing_config)}")
+    return hosts
+
+
+class FleetProgress:
+    """逐行输出各主机的阶段变化，多个线程共用"""
+
+    def __init__(self, total: int, stream=None):
+        self.total = total
+        self.done = 0
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def update(self, host: str, message: str, finished: bool = False):
+        with self._lock:
+            if finished:
+                self.done += 1
+            print(f"[{self.done}/{self.total}] {host}: {message}", file=self.stream, flush=True)
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", name)
+
+
+def _short(text: str, limit: int = 80) -> str:
+    text = text.splitlines()[0] if text else ""
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _tool_status(tool: Dict[str, Any]) -> str:
+    if "error" in tool:
+        return "failed"
+    return "unchanged" if tool.get("status") == "unchanged" else "ok"
+
+
+def provision_host(host: FleetHost, args, progress: FleetProgress, config_cache: Optional[MCPConfigCache],
+                   log_dir: str) -> HostResult:
+    """配置单台主机，任何异常都记录在结果中而不抛出"""
+    started = time.monotonic()
+    client = None
+    try:
+        api_key = host.api_key or ("admin" if args.skip_auth else None)
+        if not api_key:
+            raise ValueError("在不使用 --skip-auth 时需要 api_key")
+        client = HigressClient(
+            domain=host.domain,
+            base_url=host.base_url,
+            username=host.username,
+            apikey=api_key,
+            verbose=args.verbose,
+            config_cache=config_cache,
+            reconcile=args.reconcile,
+            connect=False,
+            spec_store_dir=None if args.no_spec_store else args.spec_store_dir,
+            retry_policy=RetryPolicy(f"Higress 控制台 {host.name}", max_attempts=args.max_attempts,
+                                     retry_budget=args.retry_budget),
+            state_store=open_state_store(host.state, args.state_prefix) if host.state else None,
+            write_config=False,
+            logger_name=f"HigressClient[{host.name}]",
+            log_file=os.path.join(log_dir, f"{_safe_name(host.name)}.log"),
+            log_to_console=False,
+            log_thread_name=args.concurrency > 1,
+        )
+        # 详细日志只写入该主机自己的文件，控制台只显示进度
+        client.logger.propagate = False
+
+        progress.update(host.name, f"连接控制台 {host.base_url}")
+        if args.wait_ready:
+            wait_until_ready(f"{host.name} 控制台", client.connect, args.ready_timeout, logger=client.logger)
+        else:
+            client.connect()
+
+        lease = None
+        if client.state_store is not None:
+            progress.update(host.name, "获取配置锁")
+            lease = client.state_store.acquire(PROVISION_LOCK, ttl=args.state_lock_ttl, wait=args.state_lock_wait,
+                                               logger=client.logger).start()
+            client.state_lease = lease
+        try:
+            progress.update(host.name, "配置工具")
+            result = client.setup_from_config(
+                config_path=host.config,
+                openapi_base_url=host.openapi_url,
+                api_key=api_key,
+                domain=host.domain,
+                skip_auth=args.skip_auth,
+                concurrency=args.concurrency,
+                converter=args.converter,
+                use_inventory=not args.no_inventory
+            )
+        finally:
+            if lease is not None:
+                client.state_lease = None
+                lease.release()
+
+        tools = {tool["name"]: _tool_status(tool) for tool in result["tools"]}
+        failed = [name for name, status in tools.items() if status == "failed"]
+        status = "partial" if failed else "ok"
+        elapsed = time.monotonic() - started
+        progress.update(host.name, f"完成 {len(tools) - len(failed)}/{len(tools)} 个工具 ({elapsed:.1f} 秒)",
+                        finished=True)
+        return HostResult(host.name, status, tools, None, elapsed)
+    except Exception as e:
+        elapsed = time.monotonic() - started
+        if client is not None:
+            client.logger.error(f"配置主机 {host.name} 失败: {str(e)}")
+            client.logger.error(traceback.format_exc())
+        progress.update(host.name, f"失败 ({elapsed:.1f} 秒): {_short(str(e))}", finished=True)
+        return HostResult(host.name, "failed", {}, str(e), elapsed)
+
+
+def provision_fleet(hosts: List[FleetHost], args, progress: FleetProgress = None) -> List[HostResult]:
+    """在有界线程池中并发配置各主机，结果顺序与 hosts 一致"""
+    progress = progress or FleetProgress(len(hosts))
+    config_cache = None if args.no_config_cache else MCPConfigCache(args.config_cache_dir)
+    os.makedirs(args.log_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max(1, min(args.max_hosts, len(hosts))),
+                            thread_name_prefix="fleet") as executor:
+        futures = [executor.submit(provision_host, host, args, progress, config_cache, args.log_dir)
+                   for host in hosts]
+        return [future.result() for future in futures]
+
+
+def _display_width(text: str) -> int:
+    return sum(2 if unicodedata.east_asian_width(char) in "WF" else 1 for char in text)
+
+
+def _pad(text: str, width: int) -> str:
+    return text + " " * (width - _display_width(text))
+
+
+def render_matrix(results: List[HostResult]) -> str:
+    """主机 × 工具矩阵：✓ 成功，= 无变化已跳过，✗ 失败，- 未执行"""
+    tools = []
+    for result in results:
+        tools.extend(tool for tool in result.tools if tool not in tools)
+    host_width = max(_display_width(text) for text in ["主机"] + [result.host for result in results])
+    widths = [_display_width(tool) for tool in tools]
+
+    header = [_pad("主机", host_width)] + [_pad(tool, width) for tool, width in zip(tools, widths)]
+    lines = ["  ".join(header + ["结果"])]
+    for result in results:
+        cells = [_pad(result.host, host_width)]
+        for tool, width in zip(tools, widths):
+            cells.append(_pad(MATRIX_SYMBOLS.get(result.tools.get(tool), "-"), width))
+        succeeded = len([status for status in result.tools.values() if status != "failed"])
+        summary = f"{succeeded}/{len(result.tools)} {result.elapsed:.1f}s"
+        if result.error:
+            summary = f"失败 {result.elapsed:.1f}s: {_short(result.error)}"
+        lines.append("  ".join(cells + [summary]))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="并发重新配置多台已完成单机部署的 Higress 实例",
+                                     epilog="不会写入目标主机的 higress-config.yaml，清单中的主机须已在本机运行过 "
+                                            "higress_client.py，否则路由和插件配置成功后 MCP Server 仍无法工作",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--inventory", required=True,
+                        help="主机清单文件 (YAML/JSON)，只应列出已完成单机部署的主机")
+    parser.add_argument("--config", help="MCP 配置文件路径，清单中未指定 config 的主机使用")
+    parser.add_argument("--api-key", help="API 密钥，清单中未指定 api_key 的主机使用")
+    parser.add_argument("--username", default="admin", help="控制台登录用户名")
+    parser.add_argument("--skip-auth", action="store_true", help="跳过创建消费者和路由认证配置")
+    parser.add_argument("--max-hosts", type=int, default=DEFAULT_MAX_HOSTS, help="同时配置的主机数上限")
+    parser.add_argument("--concurrency", type=int, default=1, help="每台主机内并发配置工具的线程数")
+    parser.add_argument("--converter", default="binary", choices=["binary", "native"],
+                        help="OpenAPI 到 MCP 的转换方式（native 需要 converter_parity.py 的样例全部录制并一致）")
+    parser.add_argument("--reconcile", action="store_true", help="只对有变化的资源发起写请求")
+    parser.add_argument("--no-inventory", action="store_true", help="不预先批量读取资源快照")
+    parser.add_argument("--config-cache-dir", default=DEFAULT_CONFIG_CACHE_DIR, help="各主机共用的 MCP 配置缓存目录")
+    parser.add_argument("--no-config-cache", action="store_true", help="不使用 MCP 配置缓存")
+    parser.add_argument("--spec-store-dir", default=DEFAULT_SPEC_STORE_DIR, help="保存 OpenAPI 规范的目录")
+    parser.add_argument("--no-spec-store", action="store_true", help="不在磁盘保存 OpenAPI 规范")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="控制台请求的最大尝试次数")
+    parser.add_argument("--retry-budget", type=int, default=DEFAULT_RETRY_BUDGET, help="每台主机允许的重试总次数")
+    parser.add_argument("--wait-ready", action="store_true", help="按指数退避等待各主机控制台可登录")
+    parser.add_argument("--ready-timeout", type=float, default=DEFAULT_READY_TIMEOUT, help="--wait-ready 的最长等待秒数")
+    parser.add_argument("--state-prefix", default=DEFAULT_STATE_PREFIX, help="清单中 state 对应 Redis 的键前缀")
+    parser.add_argument("--state-lock-ttl", type=float, default=DEFAULT_LEASE_TTL, help="配置锁的租约秒数")
+    parser.add_argument("--state-lock-wait", type=float, default=DEFAULT_LOCK_WAIT, help="等待配置锁的最长秒数")
+    parser.add_argument("--log-dir", default=DEFAULT_LOG_DIR, help="各主机详细日志的目录，每台主机一个文件")
+    parser.add_argument("--json", help="将各主机结果写入该 JSON 文件")
+    parser.add_argument("--verbose", "-v", action="store_true", help="主机日志中记录 DEBUG 级别")
+    args = parser.parse_args(argv)
+
+    if args.max_hosts < 1 or args.concurrency < 1:
+        parser.error("--max-hosts 和 --concurrency 必须大于等于 1")
+    if args.converter == "native":
+        converter_error = native_converter_error()
+        if converter_error:
+            parser.error(converter_error)
+
+    # 控制台只输出进度和警告以上的日志，详细内容写入各主机的日志文件
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.WARNING)
+    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s'))
+    os.makedirs(args.log_dir, exist_ok=True)
+    file_handler = DEFAULT_PIPELINE.file_handler(
+        os.path.join(args.log_dir, "fleet.log"),
+        logging.Formatter('%(asctime)s - %(levelname)s - %(threadName)s - %(name)s - %(message)s'), fresh=True)
+    DEFAULT_PIPELINE.install(root_logger, [console_handler, file_handler])
+    logger = logging.getLogger("higress_fleet")
+
+    try:
+        hosts = load_inventory(args.inventory, {"config": args.config, "api_key": args.api_key,
+                                                "username": args.username})
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        logger.error(f"读取主机清单失败: {str(e)}")
+        return 1
+
+    started = time.monotonic()
+    print(f"配置 {len(hosts)} 台主机，同时最多 {min(args.max_hosts, len(hosts))} 台，日志目录: {args.log_dir}")
+    results = provision_fleet(hosts, args)
+    elapsed = time.monotonic() - started
+
+    print()
+    print(render_matrix(results))
+    ok = len([result for result in results if result.status == "ok"])
+    print(f"\n{ok}/{len(results)} 台主机全部成功，总耗时 {elapsed:.1f} 秒，"
+          f"各主机耗时之和 {sum(result.elapsed for result in results):.1f} 秒")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"elapsed": elapsed, "hosts": [result._asdict() for result in results]}, f,
+                      ensure_ascii=False, indent=2)
+    DEFAULT_PIPELINE.flush()
+    return 0 if ok == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
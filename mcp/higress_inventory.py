@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Higress 控制台资源的内存快照
+
+每次运行开始时批量列出 Consumer、服务来源、路由和 MCP 插件实例，按名称建立索引，
+之后的存在性检查和版本号读取都在内存中完成，写请求成功后同步更新快照。
+"""
+
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+CONSUMERS = "consumers"
+SERVICE_SOURCES = "service-sources"
+ROUTES = "routes"
+PLUGIN_INSTANCES = "plugin-instances"
+
+# 可以通过 GET /v1/{kind} 一次列出的资源类型
+LISTABLE_KINDS = (CONSUMERS, SERVICE_SOURCES, ROUTES)
+
+
+class HigressInventory:
+    """按资源类型和名称索引的资源快照，None 表示已确认不存在"""
+
+    def __init__(self):
+        self._resources = {}  # type: Dict[str, Dict[str, Optional[Dict[str, Any]]]]
+        self._complete = set()
+        self._stale = {}
+        self._lock = threading.Lock()
+
+    def load(self, kind: str, items: Iterable[Dict[str, Any]], key: str = "name"):
+        """用完整列表填充某类资源，列表之外的名称视为不存在"""
+        with self._lock:
+            self._resources[kind] = {item[key]: item for item in items if item.get(key)}
+            self._complete.add(kind)
+            self._stale.pop(kind, None)
+
+    def knows(self, kind: str, name: str) -> bool:
+        """快照能否回答该资源是否存在"""
+        with self._lock:
+            if name in self._stale.get(kind, ()):
+                return False
+            return name in self._resources.get(kind, {}) or kind in self._complete
+
+    def get(self, kind: str, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._resources.get(kind, {}).get(name)
+
+    def set(self, kind: str, name: str, resource: Optional[Dict[str, Any]]):
+        """记录资源的最新状态，resource 为 None 表示确认不存在"""
+        with self._lock:
+            self._resources.setdefault(kind, {})[name] = resource
+            self._stale.get(kind, set()).discard(name)
+
+    def discard(self, kind: str, name: str):
+        """丢弃某个资源的快照，下次查询时重新读取"""
+        with self._lock:
+            self._resources.get(kind, {}).pop(name, None)
+            self._stale.setdefault(kind, set()).add(name)
+
+    def count(self, kind: str) -> int:
+        with self._lock:
+            return sum(1 for resource in self._resources.get(kind, {}).values() if resource is not None)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+higress-config.yaml 中 downstream/upstream 连接参数的性能配置
+
+- 预设 small / standard / high-concurrency，small 与原模板中的固定值一致
+- auto 按 CPU 核数和预期并发 SSE 会话数选择预设，按工具数放大 HTTP/2 并发流上限，
+  并按内存限制每个会话占用的缓冲区
+- 可用 YAML/JSON 覆盖文件显式指定任意参数，覆盖文件最后生效
+
+模板中以 ${downstream.http2.maxConcurrentStreams} 形式的占位符引用各参数。
+"""
+
+import os
+from collections import namedtuple
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+AUTO = "auto"
+SMALL = "small"
+STANDARD = "standard"
+HIGH_CONCURRENCY = "high-concurrency"
+
+KiB = 1024
+MiB = 1024 * 1024
+
+# 参数名即 higress 配置中的路径，模板中的占位符为 ${参数名}
+PRESETS = {
+    SMALL: {
+        "downstream.connectionBufferLimits": 32768,
+        "downstream.http2.initialConnectionWindowSize": 1 * MiB,
+        "downstream.http2.initialStreamWindowSize": 65535,
+        "downstream.http2.maxConcurrentStreams": 100,
+        "downstream.idleTimeout": 180,
+        "downstream.maxRequestHeadersKb": 60,
+        # SSE 会话长期保持，路由不设超时
+        "downstream.routeTimeout": 0,
+        "upstream.connectionBufferLimits": 10 * MiB,
+        "upstream.idleTimeout": 10,
+    },
+    STANDARD: {
+        "downstream.connectionBufferLimits": 64 * KiB,
+        "downstream.http2.initialConnectionWindowSize": 4 * MiB,
+        "downstream.http2.initialStreamWindowSize": 256 * KiB,
+        "downstream.http2.maxConcurrentStreams": 256,
+        "downstream.idleTimeout": 300,
+        "downstream.maxRequestHeadersKb": 60,
+        "downstream.routeTimeout": 0,
+        "upstream.connectionBufferLimits": 16 * MiB,
+        "upstream.idleTimeout": 60,
+    },
+    HIGH_CONCURRENCY: {
+        "downstream.connectionBufferLimits": 128 * KiB,
+        "downstream.http2.initialConnectionWindowSize": 16 * MiB,
+        "downstream.http2.initialStreamWindowSize": 1 * MiB,
+        "downstream.http2.maxConcurrentStreams": 1024,
+        "downstream.idleTimeout": 600,
+        "downstream.maxRequestHeadersKb": 60,
+        "downstream.routeTimeout": 0,
+        "upstream.connectionBufferLimits": 32 * MiB,
+        "upstream.idleTimeout": 300,
+    },
+}
+PROFILE_CHOICES = (AUTO, SMALL, STANDARD, HIGH_CONCURRENCY)
+PROFILE_KEYS = tuple(PRESETS[SMALL])
+
+# 参数取值范围 (Envoy 对 HTTP/2 窗口和并发流的限制)
+_LIMITS = {
+    "downstream.http2.initialConnectionWindowSize": (65535, 2 ** 31 - 1),
+    "downstream.http2.initialStreamWindowSize": (65535, 2 ** 31 - 1),
+    "downstream.http2.maxConcurrentStreams": (1, 2 ** 31 - 1),
+    "downstream.routeTimeout": (0, 2 ** 31 - 1),
+}
+_DEFAULT_LIMIT = (1, 2 ** 31 - 1)
+
+# 未指定预期会话数时按每个 CPU 核心的会话数估算
+DEFAULT_SESSIONS_PER_CPU = 64
+# 连接缓冲区最多占用的内存比例
+BUFFER_MEMORY_SHARE = 0.25
+MAX_AUTO_STREAMS = 1024
+
+HostInfo = namedtuple("HostInfo", ["cpus", "memory_bytes"])
+# values 为 {参数名: 值}，reasons 为 auto 推导过程的说明
+HigressProfile = namedtuple("HigressProfile", ["name", "values", "reasons"])
+
+
+def detect_host() -> HostInfo:
+    """当前进程可用的 CPU 核数和物理内存，无法获取内存时为 None"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        memory = None
+    return HostInfo(cpus, memory)
+
+
+def _next_power_of_two(value: int) -> int:
+    return 1 << max(0, int(value) - 1).bit_length()
+
+
+def _select_preset(cpus: int, sessions: int) -> str:
+    if cpus > 16 or sessions > 2000:
+        return HIGH_CONCURRENCY
+    if cpus > 4 or sessions > 500:
+        return STANDARD
+    return SMALL
+
+
+def _auto_values(host: HostInfo, tool_count: int, sessions: int, reasons: List[str]) -> Dict[str, int]:
+    preset = _select_preset(host.cpus, sessions)
+    values = dict(PRESETS[preset])
+    reasons.append(f"{host.cpus} 核、预期 {sessions} 个并发 SSE 会话，基于 {preset} 预设")
+
+    # 一个客户端可能通过同一个 HTTP/2 连接为每个工具保持一个 SSE 流，同时还有消息请求
+    streams_key = "downstream.http2.maxConcurrentStreams"
+    needed_streams = min(MAX_AUTO_STREAMS, _next_power_of_two(tool_count * 2))
+    if needed_streams > values[streams_key]:
+        values[streams_key] = needed_streams
+        reasons.append(f"{tool_count} 个工具，单连接并发流上限提高到 {needed_streams}")
+
+    # 每个会话占用一份下游缓冲区和一个流窗口，总量不超过内存的 BUFFER_MEMORY_SHARE
+    if host.memory_bytes:
+        budget = host.memory_bytes * BUFFER_MEMORY_SHARE
+        buffer_key = "downstream.connectionBufferLimits"
+        window_key = "downstream.http2.initialStreamWindowSize"
+        floor = PRESETS[SMALL]
+        reduced = False
+        while (sessions * (values[buffer_key] + values[window_key]) > budget
+               and (values[buffer_key] > floor[buffer_key] or values[window_key] > floor[window_key])):
+            values[buffer_key] = max(floor[buffer_key], values[buffer_key] // 2)
+            values[window_key] = max(floor[window_key], values[window_key] // 2)
+            reduced = True
+        if reduced:
+            reasons.append(f"内存 {host.memory_bytes // MiB} MiB，每会话缓冲区降为 {values[buffer_key]} 字节、"
+                           f"流窗口降为 {values[window_key]} 字节")
+    return values
+
+
+def load_overrides(path: str) -> Dict[str, int]:
+    """读取覆盖文件，支持嵌套结构 (downstream: {http2: {...}}) 或点分参数名"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    if not isinstance(data, dict):
+        raise ValueError(f"性能配置覆盖文件必须是对象: {path}")
+
+    overrides = {}
+
+    def flatten(prefix: str, node: Dict[str, Any]):
+        for key, value in node.items():
+            name = f"{prefix}{key}"
+            if isinstance(value, dict):
+                flatten(f"{name}.", value)
+            else:
+                overrides[name] = value
+
+    flatten("", data)
+    return validate_values(overrides, path)
+
+
+def validate_values(values: Dict[str, Any], source: str = "覆盖参数") -> Dict[str, int]:
+    """检查参数名和取值范围"""
+    validated = {}
+    for name, value in values.items():
+        if name not in PROFILE_KEYS:
+            raise ValueError(f"{source} 中包含未知参数 {name}，可用参数: {', '.join(PROFILE_KEYS)}")
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"{source} 中 {name} 必须是整数: {value!r}")
+        low, high = _LIMITS.get(name, _DEFAULT_LIMIT)
+        if not low <= value <= high:
+            raise ValueError(f"{source} 中 {name} 必须在 {low} 到 {high} 之间: {value}")
+        validated[name] = value
+    return validated
+
+
+def build_profile(name: str = AUTO, tool_count: int = 0, sse_sessions: Optional[int] = None,
+                  host: Optional[HostInfo] = None, overrides: Optional[Dict[str, int]] = None) -> HigressProfile:
+    """
+    生成性能配置
+
+    Args:
+        name: auto 或预设名称，预设按原样使用
+        tool_count: 要配置的工具数量
+        sse_sessions: 预期的并发 SSE 会话数，为空时按 CPU 核数估算
+        host: 主机信息，为空时检测当前主机
+        overrides: 显式指定的参数，最后生效
+    """
+    if name not in PROFILE_CHOICES:
+        raise ValueError(f"未知的性能配置: {name}，可选: {', '.join(PROFILE_CHOICES)}")
+    reasons = []
+    if name == AUTO:
+        host = host or detect_host()
+        sessions = sse_sessions if sse_sessions else host.cpus * DEFAULT_SESSIONS_PER_CPU
+        values = _auto_values(host, tool_count, sessions, reasons)
+    else:
+        values = dict(PRESETS[name])
+    if overrides:
+        values.update(overrides)
+        reasons.append(f"覆盖参数: {', '.join(sorted(overrides))}")
+    return HigressProfile(name, values, reasons)
+
+
+def default_profile() -> HigressProfile:
+    """与原模板固定值一致的配置"""
+    return build_profile(SMALL)
+
+
+def render_profile(template: str, profile: HigressProfile) -> str:
+    """替换模板中的性能参数占位符"""
+    for key, value in profile.values.items():
+        template = template.replace("${" + key + "}", str(value))
+    return template
+
+
+def has_profile_placeholders(template: str) -> bool:
+    return any("${" + key + "}" in template for key in PROFILE_KEYS)
+
+
+def describe_profile(profile: HigressProfile) -> List[str]:
+    """用于日志输出的参数和推导说明"""
+    lines = [f"性能配置: {profile.name}"]
+    lines.extend(f"  {reason}" for reason in profile.reasons)
+    lines.extend(f"  {key} = {profile.values[key]}" for key in PROFILE_KEYS)
+    return lines
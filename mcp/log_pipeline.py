@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+低开销的日志输出
+
+- LazyJson: 请求体、响应体等负载只在日志记录真正输出时才序列化，DEBUG 关闭时没有任何序列化开销
+- LogPipeline: 调用线程只负责生成日志文本并放入队列，控制台和文件写入由后台线程完成
+- 日志文件按大小轮转，多个处理器写同一个文件时共用一个文件流
+- 请求体、响应体日志可按比例采样并截断过长内容（默认关闭，输出与直接使用 logging 处理器时一致）
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+from typing import Any, Dict, List, Sequence
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 3
+
+# 作为 extra 传给日志方法，标记该条日志为请求/响应负载，参与采样和截断
+PAYLOAD = {"payload": True}
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+
+class LazyJson:
+    """str() 时才执行 json.dumps 的包装，配合 %s 占位符使用"""
+
+    __slots__ = ("obj", "indent")
+
+    def __init__(self, obj: Any, indent: int = None):
+        self.obj = obj
+        self.indent = indent
+
+    def __str__(self) -> str:
+        return json.dumps(self.obj, indent=self.indent, ensure_ascii=False)
+
+
+class PayloadSampler(logging.Filter):
+    """标记为负载的日志每 sample_every 条保留一条，同一条日志经过多个处理器时只判断一次"""
+
+    def __init__(self, sample_every: int = 1):
+        super().__init__()
+        self.sample_every = max(1, sample_every)
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "payload", False):
+            return True
+        keep = getattr(record, "payload_kept", None)
+        if keep is None:
+            keep = next(self._counter) % self.sample_every == 0
+            record.payload_kept = keep
+        return keep
+
+
+def truncate_payload(message: str, max_chars: int) -> str:
+    if not max_chars or len(message) <= max_chars:
+        return message
+    return f"{message[:max_chars]}...(已截断，共 {len(message)} 个字符)"
+
+
+class RotatingLogStream:
+    """按大小轮转的日志文件流：超过 max_bytes 时依次改名为 .1 .. .backup_count"""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, backup_count: int = DEFAULT_BACKUP_COUNT,
+                 fresh: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+        self._stream = None
+        if fresh and os.path.exists(path) and os.path.getsize(path) > 0:
+            # 新一次运行从空文件开始，上一次的日志保留为备份
+            self._rotate()
+        self._open()
+
+    def _open(self):
+        self._stream = open(self.path, 'a', encoding='utf-8')
+        self._size = self._stream.tell()
+
+    def _rotate(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def write(self, text: str):
+        size = len(text.encode('utf-8'))
+        with self._lock:
+            if self.max_bytes and self._size and self._size + size > self.max_bytes:
+                self._stream.flush()
+                self._rotate()
+                self._open()
+            self._stream.write(text)
+            self._size += size
+
+    def flush(self):
+        with self._lock:
+            if self._stream is not None:
+                self._stream.flush()
+
+    def close(self):
+        with self._lock:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+
+
+class _PipelineHandler(logging.Handler):
+    """在调用线程中生成日志文本，连同目标处理器一起放入队列"""
+
+    def __init__(self, pipeline: "LogPipeline", targets: Sequence[logging.Handler], payload_limit: int = 0):
+        super().__init__()
+        self.pipeline = pipeline
+        self.targets = list(targets)
+        self.payload_limit = payload_limit
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 负载对象可能在记录之后被修改，因此在调用线程中生成正文和异常堆栈，只把写入留给后台线程。
+        # 直接修改记录本身：传给上级记录器的处理器时得到的正文相同，不必再格式化或截断一次
+        if getattr(record, "pipeline_prepared", False):
+            return record
+        record.pipeline_prepared = True
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if getattr(record, "payload", False):
+            record.msg = truncate_payload(str(record.msg), self.payload_limit)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+        return record
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.pipeline.put(self.prepare(record), self.targets)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        for target in self.targets:
+            target.close()
+        super().close()
+
+
+class LogPipeline:
+    """进程内共用一个后台线程写出所有日志，保持各条日志的先后顺序"""
+
+    _SENTINEL = object()
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, backup_count: int = DEFAULT_BACKUP_COUNT,
+                 payload_limit: int = 0, payload_sample: int = 1):
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.payload_limit = payload_limit
+        self.payload_sample = payload_sample
+        self._sampler = PayloadSampler(payload_sample)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._streams = {}  # type: Dict[str, RotatingLogStream]
+
+    def configure(self, max_bytes: int = None, backup_count: int = None, payload_limit: int = None,
+                  payload_sample: int = None):
+        """修改之后创建的文件处理器和安装的记录器使用的参数"""
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        if backup_count is not None:
+            self.backup_count = backup_count
+        if payload_limit is not None:
+            self.payload_limit = payload_limit
+        if payload_sample is not None:
+            self.payload_sample = payload_sample
+            self._sampler = PayloadSampler(payload_sample)
+
+    def file_handler(self, path: str, formatter: logging.Formatter, level: int = logging.NOTSET,
+                     fresh: bool = False) -> logging.StreamHandler:
+        """写入按大小轮转的日志文件的处理器，同一路径的处理器共用一个文件流"""
+        path = os.path.abspath(path)
+        with self._lock:
+            stream = self._streams.get(path)
+            if stream is None:
+                stream = RotatingLogStream(path, self.max_bytes, self.backup_count, fresh)
+                self._streams[path] = stream
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(formatter)
+        handler.setLevel(level)
+        return handler
+
+    def install(self, logger: logging.Logger, handlers: List[logging.Handler]) -> logging.Logger:
+        """用经由后台线程写出的 handlers 替换 logger 现有的处理器"""
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            if isinstance(handler, _PipelineHandler):
+                handler.close()
+        pipeline_handler = _PipelineHandler(self, handlers, self.payload_limit)
+        if self.payload_sample > 1:
+            pipeline_handler.addFilter(self._sampler)
+        logger.addHandler(pipeline_handler)
+        self._start()
+        return logger
+
+    def put(self, record: logging.LogRecord, targets: List[logging.Handler]):
+        self._queue.put((record, targets))
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is self._SENTINEL:
+                    break
+                record, targets = item
+                for target in targets:
+                    if record.levelno >= target.level:
+                        target.handle(record)
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """等待队列中已有的日志全部写出"""
+        if self._thread is not None:
+            self._queue.join()
+        for stream in list(self._streams.values()):
+            stream.flush()
+
+    def stop(self):
+        """写出队列中剩余的日志并停止后台线程"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(self._SENTINEL)
+        thread.join()
+        self.flush()
+
+
+# 进程内默认使用的日志管道
+DEFAULT_PIPELINE = LogPipeline()
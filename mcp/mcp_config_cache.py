@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按内容寻址的 MCP 配置缓存
+
+缓存键由规范化后的 OpenAPI 文档、baseUrl、skip_auth、API 密钥摘要、转换器版本和网关侧改写规则共同计算，
+不包含工具名称：规范完全相同的工具共享同一个缓存条目，读取时再填入各自的 server.name。
+"""
+
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+import yaml
+
+from openapi_to_mcp import CONVERTER_VERSION, dump_mcp_yaml
+
+DEFAULT_CONFIG_CACHE_DIR = os.path.expanduser("~/.cache/quickstart-mcp/mcp-configs")
+
+# 缓存中代替 server.name 的占位符
+SERVER_NAME_PLACEHOLDER = "__quickstart_mcp_server_name__"
+
+
+def canonical_spec_digest(spec: Dict[str, Any]) -> str:
+    """对 OpenAPI 文档做规范化 (键排序、紧凑分隔符) 后计算 sha256"""
+    canonical = json.dumps(spec, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class MCPConfigCache:
+    """以文件形式保存最终 MCP YAML 的内容寻址缓存"""
+
+    def __init__(self, directory: str = DEFAULT_CONFIG_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(spec: Dict[str, Any], base_url: str, api_key: Optional[str], skip_auth: bool,
+                 converter: str = "binary", spec_digest: str = None, rewrite: str = "gateway") -> str:
+        """
+        计算缓存键，spec_digest 已知时可跳过对规范的重新哈希
+
+        rewrite 区分网关侧改写规则：开源版与企业版共用缓存目录，但对同一规范的改写结果不同
+        """
+        api_key_digest = "" if skip_auth else hashlib.sha256((api_key or "").encode('utf-8')).hexdigest()
+        material = "\n".join([
+            spec_digest or canonical_spec_digest(spec),
+            base_url,
+            "skip_auth" if skip_auth else "auth",
+            api_key_digest,
+            f"{converter}:{CONVERTER_VERSION}",
+            rewrite,
+        ])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.yaml")
+
+    @staticmethod
+    def _render_name(server_name: str) -> str:
+        # 与 yaml.dump 在映射中输出该名称的方式保持一致（必要时加引号）
+        return yaml.dump({"name": server_name}, allow_unicode=True)[len("name: "):].rstrip("\n")
+
+    def get(self, key: str, server_name: str) -> Optional[str]:
+        """命中时返回填入 server_name 后的 YAML 文本，否则返回 None"""
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                template = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return template.replace(SERVER_NAME_PLACEHOLDER, self._render_name(server_name))
+
+    def get_encoded(self, key: str, server_name: str) -> Optional[str]:
+        """命中时返回 base64 编码的插件配置"""
+        yaml_content = self.get(key, server_name)
+        if yaml_content is None:
+            return None
+        return base64.b64encode(yaml_content.encode('utf-8')).decode('utf-8')
+
+    def put(self, key: str, config: Dict[str, Any]):
+        """以占位符替换 server.name 后写入缓存"""
+        server = config.setdefault("server", {})
+        original_name = server.get("name")
+        server["name"] = SERVER_NAME_PLACEHOLDER
+        try:
+            template = dump_mcp_yaml(config)
+        finally:
+            server["name"] = original_name
+
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # 配置中包含 API 密钥，只允许当前用户读写
+        fd, temp_path = tempfile.mkstemp(prefix=".mcp-config-", dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(template)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
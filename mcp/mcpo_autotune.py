@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按实测吞吐选择 mcpo 的 worker 数
+
+读取容器实际可用的 CPU/内存限制（cgroup v2/v1、docker inspect），按 config.json 中的工具数
+估算每个 worker 的内存占用，得到候选 worker 数；依次以各候选值重启 mcpo，就绪后对各工具的
+/{tool}/openapi.json 做一段并发压测，选出吞吐最高的值（相差 5% 以内时取较少的 worker），
+写回 docker-compose.yaml 中 mcpo 服务的 WORKERS。
+
+每个 worker 都会为每个 stdio 工具启动一个子进程，worker 数受内存限制；
+uvicorn worker 为异步进程，超过 CPU 配额后通常不再提升吞吐。
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from config_watcher import load_tool_settings
+from higress_profile import detect_host
+from readiness import openapi_check, wait_until_ready
+from tracing import percentile
+
+MiB = 1024 * 1024
+
+DEFAULT_COMPOSE_FILE = "docker-compose.yaml"
+DEFAULT_SERVICE = "mcpo-service"
+DEFAULT_DURATION = 10.0
+DEFAULT_WARMUP = 2.0
+DEFAULT_CLIENTS = 32
+DEFAULT_READY_TIMEOUT = 600.0
+# 单个 worker（uvicorn + mcpo）本身和每个 stdio 工具子进程的内存估算
+DEFAULT_WORKER_MEMORY_MB = 120
+DEFAULT_STDIO_SERVER_MEMORY_MB = 60
+# worker 最多占用的内存比例，其余留给 Higress、Redis 和系统
+MEMORY_SHARE = 0.6
+MAX_ERROR_RATE = 0.01
+# 吞吐相差在该比例以内时选择较少的 worker
+THROUGHPUT_TOLERANCE = 0.05
+
+_WORKERS_LINE = re.compile(r"^(\s*WORKERS:\s*).*$", re.MULTILINE)
+
+ResourceLimits = namedtuple("ResourceLimits", ["cpus", "memory_bytes", "source"])
+LoadResult = namedtuple("LoadResult", ["workers", "requests", "errors", "seconds", "rps", "p50", "p95"])
+
+
+def _read_file(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_limits() -> ResourceLimits:
+    """当前进程所在 cgroup 的 CPU 配额和内存上限，未设置时取主机的 CPU 核数和物理内存"""
+    host = detect_host()
+    cpus, memory, source = float(host.cpus), host.memory_bytes, "主机"
+
+    # cgroup v2: cpu.max 为 "<quota> <period>" 或 "max <period>"
+    cpu_max = _read_file("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            cpus, source = min(cpus, int(quota) / int(period)), "cgroup"
+    else:
+        quota = _read_file("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+        period = _read_file("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if quota and period and int(quota) > 0:
+            cpus, source = min(cpus, int(quota) / int(period)), "cgroup"
+
+    memory_max = _read_file("/sys/fs/cgroup/memory.max") or _read_file("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+    if memory_max and memory_max != "max":
+        # cgroup v1 未设置上限时为一个接近 2^63 的值
+        if memory is None or int(memory_max) < memory:
+            memory, source = int(memory_max), "cgroup"
+    return ResourceLimits(cpus, memory, source)
+
+
+def container_limits(container: str, base: ResourceLimits) -> ResourceLimits:
+    """用 docker inspect 读取容器的 CPU/内存限制，与 base 取较小值；docker 不可用时返回 base"""
+    try:
+        completed = subprocess.run(
+            ["docker", "inspect", "--format", "{{.HostConfig.NanoCpus}} {{.HostConfig.Memory}}", container],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return base
+    if completed.returncode != 0:
+        return base
+    nano_cpus, memory = (int(value) for value in completed.stdout.split())
+    cpus, memory_bytes, source = base
+    if nano_cpus:
+        cpus, source = min(cpus, nano_cpus / 1e9), f"容器 {container}"
+    if memory and (memory_bytes is None or memory < memory_bytes):
+        memory_bytes, source = memory, f"容器 {container}"
+    return ResourceLimits(cpus, memory_bytes, source)
+
+
+def count_stdio_servers(settings: Dict[str, Dict]) -> int:
+    """由 mcpo 以子进程方式启动的工具数（有 command 的工具；url 类工具不占用 worker 内存）"""
+    return sum(1 for server in settings.values() if isinstance(server, dict) and server.get("command"))
+
+
+def candidate_workers(limits: ResourceLimits, stdio_servers: int,
+                      worker_memory_mb: int = DEFAULT_WORKER_MEMORY_MB,
+                      stdio_server_memory_mb: int = DEFAULT_STDIO_SERVER_MEMORY_MB) -> List[int]:
+    """1、2、4 ... 直到 CPU 配额和内存允许的上限，上限本身也作为候选"""
+    cpu_cap = max(1, int(math.ceil(limits.cpus)))
+    cap = cpu_cap
+    if limits.memory_bytes:
+        per_worker = (worker_memory_mb + stdio_servers * stdio_server_memory_mb) * MiB
+        cap = min(cap, max(1, int(limits.memory_bytes * MEMORY_SHARE // per_worker)))
+    candidates = []
+    workers = 1
+    while workers < cap:
+        candidates.append(workers)
+        workers *= 2
+    candidates.append(cap)
+    return candidates
+
+
+def run_load_test(urls: List[str], workers: int, duration: float = DEFAULT_DURATION, warmup: float = DEFAULT_WARMUP,
+                  clients: int = DEFAULT_CLIENTS, headers: Dict[str, str] = None) -> LoadResult:
+    """clients 个线程轮流请求 urls，预热 warmup 秒后统计 duration 秒内的吞吐和延迟"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    start = time.monotonic() + warmup
+    deadline = start + duration
+
+    def client(offset: int):
+        session = requests.Session()
+        index = offset
+        local_latencies, local_errors = [], 0
+        while True:
+            began = time.monotonic()
+            if began >= deadline:
+                break
+            try:
+                ok = session.get(urls[index % len(urls)], headers=headers, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            ended = time.monotonic()
+            index += 1
+            if began < start:
+                continue
+            if ok:
+                local_latencies.append(ended - began)
+            else:
+                local_errors += 1
+        session.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, args=(i,), name=f"load-{i}", daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    total = len(latencies) + errors[0]
+    return LoadResult(workers, total, errors[0], duration, len(latencies) / duration,
+                      percentile(latencies, 50) if latencies else 0.0,
+                      percentile(latencies, 95) if latencies else 0.0)
+
+
+def choose_best(results: List[LoadResult]) -> Optional[LoadResult]:
+    """错误率不超过 1% 的结果中吞吐最高者；相差 5% 以内时取 worker 较少的"""
+    valid = [result for result in results if result.requests and result.errors / result.requests <= MAX_ERROR_RATE]
+    if not valid:
+        return None
+    best_rps = max(result.rps for result in valid)
+    return min((result for result in valid if result.rps >= best_rps * (1 - THROUGHPUT_TOLERANCE)),
+               key=lambda result: result.workers)
+
+
+def set_compose_workers(compose_file: str, workers: int):
+    """将 WORKERS 改为 ${MCPO_WORKERS:-workers}，仍可用环境变量 MCPO_WORKERS 覆盖"""
+    with open(compose_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    updated, count = _WORKERS_LINE.subn(lambda match: match.group(1) + "${MCPO_WORKERS:-%d}" % workers, content)
+    if count != 1:
+        raise RuntimeError(f"{compose_file} 中应有且只有一个 WORKERS 配置，实际找到 {count} 个")
+    if updated != content:
+        with open(compose_file, 'w', encoding='utf-8') as f:
+            f.write(updated)
+
+
+class ComposeLauncher:
+    """通过 docker compose 以指定的 worker 数重建 mcpo 服务"""
+
+    def __init__(self, compose_file: str, service: str = DEFAULT_SERVICE, logger: logging.Logger = None):
+        self.compose_file = compose_file
+        self.service = service
+        self.logger = logger or logging.getLogger(__name__)
+
+    def start(self, workers: int):
+        set_compose_workers(self.compose_file, workers)
+        command = ["docker", "compose", "-f", self.compose_file, "up", "-d", "--no-deps", self.service]
+        self.logger.info(f"以 {workers} 个 worker 重建 {self.service}: {' '.join(command)}")
+        environment = dict(os.environ)
+        # 已有的 MCPO_WORKERS 环境变量会覆盖 compose 文件中的默认值
+        environment.pop("MCPO_WORKERS", None)
+        completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   universal_newlines=True, env=environment)
+        if completed.returncode != 0:
+            raise RuntimeError(f"重建 {self.service} 失败: {completed.stdout.strip()}")
+
+    def stop(self):
+        # 服务保持运行，最终由选出的 worker 数再重建一次
+        pass
+
+
+class LocalLauncher:
+    """在本机以子进程方式启动 mcpo，用于没有 docker 的环境"""
+
+    def __init__(self, command: str, config_path: str, port: int, api_key: str = None,
+                 logger: logging.Logger = None):
+        self.command = command
+        self.config_path = config_path
+        self.port = port
+        self.api_key = api_key
+        self.logger = logger or logging.getLogger(__name__)
+        self._process = None
+
+    def start(self, workers: int):
+        self.stop()
+        command = shlex.split(self.command) + ["--config", self.config_path, "--port", str(self.port),
+                                               "--host", "127.0.0.1", "--workers", str(workers)]
+        if self.api_key:
+            command += ["--api-key", self.api_key]
+        self.logger.info(f"以 {workers} 个 worker 启动 mcpo: {' '.join(shlex.quote(part) for part in command)}")
+        # 单独的进程组，停止时连同 worker 和 stdio 工具子进程一起结束
+        self._process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                         start_new_session=True)
+
+    def stop(self):
+        if self._process is None:
+            return
+        try:
+            os.killpg(self._process.pid, 15)
+            self._process.wait(timeout=30)
+        except ProcessLookupError:
+            pass
+        except subprocess.TimeoutExpired:
+            os.killpg(self._process.pid, 9)
+            self._process.wait()
+        self._process = None
+
+
+def autotune(launcher, urls: List[str], candidates: List[int], duration: float = DEFAULT_DURATION,
+             warmup: float = DEFAULT_WARMUP, clients: int = DEFAULT_CLIENTS, ready_timeout: float = DEFAULT_READY_TIMEOUT,
+             headers: Dict[str, str] = None, logger: logging.Logger = None) -> List[LoadResult]:
+    """依次以各候选 worker 数启动 mcpo 并压测，返回各候选的结果"""
+    logger = logger or logging.getLogger(__name__)
+    session = requests.Session()
+    if headers:
+        session.headers.update(headers)
+    results = []
+    try:
+        for workers in candidates:
+            launcher.start(workers)
+            for url in urls:
+                wait_until_ready(url, openapi_check(url, session), ready_timeout, logger=logger)
+            result = run_load_test(urls, workers, duration, warmup, clients, headers)
+            logger.info(f"workers={workers}: {result.rps:.1f} 请求/秒, p50={result.p50 * 1000:.0f}ms, "
+                        f"p95={result.p95 * 1000:.0f}ms, 失败 {result.errors}/{result.requests}")
+            results.append(result)
+    finally:
+        launcher.stop()
+        session.close()
+    return results
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="按实测吞吐选择 mcpo 的 worker 数并写回 docker-compose.yaml",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--config", required=True, help="MCP 配置文件路径 (config.json)")
+    parser.add_argument("--compose-file", default=DEFAULT_COMPOSE_FILE, help="写入 WORKERS 的 docker-compose 文件")
+    parser.add_argument("--service", default=DEFAULT_SERVICE, help="compose 中 mcpo 服务（容器）名称")
+    parser.add_argument("--launcher", default="compose", choices=["compose", "local"],
+                        help="compose 通过 docker compose 重建服务，local 在本机启动 mcpo 子进程")
+    parser.add_argument("--mcpo-command", default="mcpo", help="--launcher local 时启动 mcpo 的命令")
+    parser.add_argument("--openapi-url", default="http://localhost:8000", help="mcpo 服务基础 URL")
+    parser.add_argument("--api-key", help="mcpo 的 API 密钥")
+    parser.add_argument("--candidates", help="逗号分隔的候选 worker 数，默认按 CPU/内存限制生成")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="每个候选的压测秒数")
+    parser.add_argument("--warmup", type=float, default=DEFAULT_WARMUP, help="每个候选压测前的预热秒数")
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS, help="并发请求线程数")
+    parser.add_argument("--ready-timeout", type=float, default=DEFAULT_READY_TIMEOUT, help="等待 mcpo 就绪的最长秒数")
+    parser.add_argument("--worker-memory-mb", type=int, default=DEFAULT_WORKER_MEMORY_MB,
+                        help="单个 worker 自身的内存估算 (MiB)")
+    parser.add_argument("--stdio-server-memory-mb", type=int, default=DEFAULT_STDIO_SERVER_MEMORY_MB,
+                        help="每个 worker 中每个 stdio 工具子进程的内存估算 (MiB)")
+    parser.add_argument("--dry-run", action="store_true", help="只输出资源限制和候选值，不压测也不修改文件")
+    parser.add_argument("--json", help="将各候选的压测结果写入该 JSON 文件")
+    args = parser.parse_args(argv)
+
+    if args.clients < 1:
+        parser.error("--clients 必须大于等于 1")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger("mcpo-autotune")
+
+    settings = load_tool_settings(args.config)
+    if not settings:
+        logger.error(f"{args.config} 中没有工具")
+        return 1
+    stdio_servers = count_stdio_servers(settings)
+
+    limits = cgroup_limits()
+    if args.launcher == "compose":
+        limits = container_limits(args.service, limits)
+    memory = f"{limits.memory_bytes // MiB} MiB" if limits.memory_bytes else "未知"
+    logger.info(f"资源限制 ({limits.source}): CPU {limits.cpus:g} 核, 内存 {memory}; "
+                f"{len(settings)} 个工具, 其中 {stdio_servers} 个 stdio 工具")
+
+    if args.candidates:
+        try:
+            candidates = sorted({int(value) for value in args.candidates.split(",") if value.strip()})
+        except ValueError:
+            parser.error("--candidates 必须是逗号分隔的整数")
+        if not candidates or candidates[0] < 1:
+            parser.error("--candidates 中的 worker 数必须大于等于 1")
+    else:
+        candidates = candidate_workers(limits, stdio_servers, args.worker_memory_mb, args.stdio_server_memory_mb)
+    logger.info(f"候选 worker 数: {candidates}")
+    if args.dry_run:
+        return 0
+
+    base_url = args.openapi_url.rstrip('/')
+    urls = [f"{base_url}/{tool}/openapi.json" for tool in settings]
+    headers = {"Authorization": f"Bearer {args.api_key}"} if args.api_key else None
+    if args.launcher == "compose":
+        launcher = ComposeLauncher(args.compose_file, args.service, logger)
+    else:
+        launcher = LocalLauncher(args.mcpo_command, os.path.abspath(args.config),
+                                 urlparse(base_url).port or 8000, args.api_key, logger)
+
+    try:
+        results = autotune(launcher, urls, candidates, args.duration, args.warmup, args.clients,
+                           args.ready_timeout, headers, logger)
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([result._asdict() for result in results], f, ensure_ascii=False, indent=2)
+
+    best = choose_best(results)
+    if best is None:
+        logger.error("所有候选的错误率都超过 1%，未修改 worker 数")
+        return 1
+    logger.info(f"选择 workers={best.workers} ({best.rps:.1f} 请求/秒)")
+    try:
+        if args.launcher == "compose":
+            # 以选出的值重建服务，同时写回 compose 文件
+            launcher.start(best.workers)
+        else:
+            set_compose_workers(args.compose_file, best.workers)
+    except (OSError, RuntimeError) as e:
+        logger.error(f"写入 worker 数失败: {e}")
+        return 1
+    logger.info(f"已将 {args.compose_file} 中的 WORKERS 设为 {best.workers}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
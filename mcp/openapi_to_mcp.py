@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内的 OpenAPI → MCP Server 配置转换
+
+转换规则参照 higress openapi-to-mcp 工具（工具名、参数、requestTemplate、responseTemplate），
+并在内存中完成网关侧的改写：URL 使用 {{.config.baseUrl}} 模板变量，按需注入 Authorization 头。
+这样每个工具不再需要 fork ./openapi-to-mcp 和三次临时文件读写。
+与二进制输出的一致性由 converter_parity.py 对照 converter_fixtures 中录制的输出检查。
+"""
+
+import base64
+import logging
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+# 转换规则变化时递增，用于区分缓存的转换结果
+CONVERTER_VERSION = "2"
+
+HTTP_METHODS = ["get", "put", "post", "delete", "options", "head", "patch", "trace"]
+
+# 响应结构描述的最大递归深度，与 openapi-to-mcp 保持一致
+MAX_SCHEMA_DEPTH = 10
+
+
+class _RefResolver:
+    """解析文档内部的 $ref 引用 (#/components/...)"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+
+    def resolve(self, node: Any, seen: tuple = ()) -> Any:
+        if not isinstance(node, dict) or "$ref" not in node:
+            return node
+        ref = node["$ref"]
+        if not ref.startswith("#/") or ref in seen:
+            return {}
+        target = self.spec
+        for part in ref[2:].split("/"):
+            part = part.replace("~1", "/").replace("~0", "~")
+            if not isinstance(target, dict) or part not in target:
+                return {}
+            target = target[part]
+        return self.resolve(target, seen + (ref,))
+
+
+def _operation_id(path: str, method: str, operation: Dict[str, Any]) -> str:
+    """生成工具名：优先使用 operationId，否则由方法和路径拼接"""
+    if operation.get("operationId"):
+        return operation["operationId"]
+    clean_path = path.lstrip("/").replace("/", "_").replace("{", "by_").replace("}", "")
+    return f"{method.lower()}_{clean_path}"
+
+
+def _description(operation: Dict[str, Any]) -> str:
+    summary = operation.get("summary") or ""
+    description = operation.get("description") or ""
+    if summary:
+        return f"{summary} - {description}" if description else summary
+    return description
+
+
+def _schema_type(schema: Dict[str, Any]) -> str:
+    schema_type = schema.get("type") or ""
+    # OpenAPI 3.1 允许 type 为列表，取第一个非 null 类型
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), "")
+    return schema_type
+
+
+def _schema_summary(resolver: _RefResolver, schema: Dict[str, Any], depth: int = 0) -> Dict[str, Any]:
+    """将 items/properties 中的子 schema 转成参数描述用的字典"""
+    schema = resolver.resolve(schema) or {}
+    result = {}
+    schema_type = _schema_type(schema)
+    if schema_type:
+        result["type"] = schema_type
+    if schema.get("description"):
+        result["description"] = schema["description"]
+    if schema.get("enum"):
+        result["enum"] = list(schema["enum"])
+    if depth >= MAX_SCHEMA_DEPTH:
+        return result
+    if schema_type == "array" and schema.get("items"):
+        result["items"] = _schema_summary(resolver, schema["items"], depth + 1)
+    if schema_type == "object" and schema.get("properties"):
+        result["properties"] = {
+            name: _schema_summary(resolver, prop, depth + 1)
+            for name, prop in sorted(schema["properties"].items())
+        }
+    return result
+
+
+def _build_arg(resolver: _RefResolver, name: str, description: str, schema: Dict[str, Any],
+               required: bool, position: str) -> Dict[str, Any]:
+    schema = resolver.resolve(schema) or {}
+    arg = {"name": name, "description": description or ""}
+    schema_type = _schema_type(schema)
+    if schema_type:
+        arg["type"] = schema_type
+    if required:
+        arg["required"] = True
+    if "default" in schema and schema["default"] is not None:
+        arg["default"] = schema["default"]
+    if schema.get("enum"):
+        arg["enum"] = list(schema["enum"])
+    if schema_type == "array" and schema.get("items"):
+        arg["items"] = _schema_summary(resolver, schema["items"], 1)
+    if schema_type == "object" and schema.get("properties"):
+        arg["properties"] = {
+            prop_name: _schema_summary(resolver, prop, 1)
+            for prop_name, prop in sorted(schema["properties"].items())
+        }
+    if position:
+        arg["position"] = position
+    return arg
+
+
+def _convert_parameters(resolver: _RefResolver, parameters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    args = []
+    for parameter in parameters:
+        parameter = resolver.resolve(parameter)
+        if not parameter or not parameter.get("name"):
+            continue
+        args.append(_build_arg(resolver, parameter["name"], parameter.get("description"),
+                               parameter.get("schema") or {}, bool(parameter.get("required")),
+                               parameter.get("in", "")))
+    return args
+
+
+def _convert_request_body(resolver: _RefResolver, request_body: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    request_body = resolver.resolve(request_body) if request_body else None
+    if not request_body:
+        return []
+    args = []
+    for media_type in (request_body.get("content") or {}).values():
+        schema = (media_type or {}).get("schema")
+        if schema is None:
+            continue
+        schema = resolver.resolve(schema) or {}
+        if _schema_type(schema) == "object" and schema.get("properties"):
+            required = set(schema.get("required") or [])
+            for name, prop in schema["properties"].items():
+                prop = resolver.resolve(prop) or {}
+                args.append(_build_arg(resolver, name, prop.get("description"), prop, name in required, "body"))
+        # 只处理第一个 content type
+        break
+    return args
+
+
+def _request_template(spec: Dict[str, Any], path: str, method: str, operation: Dict[str, Any],
+                      resolver: _RefResolver) -> Dict[str, Any]:
+    servers = spec.get("servers") or []
+    server_url = (servers[0].get("url") or "") if servers else ""
+    template = {
+        "url": server_url.rstrip("/") + path,
+        "method": method.upper(),
+    }
+    request_body = resolver.resolve(operation.get("requestBody")) if operation.get("requestBody") else None
+    content = (request_body or {}).get("content") or {}
+    if content:
+        # 只使用第一个 content type
+        template["headers"] = [{"key": "Content-Type", "value": next(iter(content))}]
+    return template
+
+
+def _describe_properties(lines: List[str], resolver: _RefResolver, schema: Dict[str, Any], path: str, depth: int):
+    """递归输出嵌套字段说明"""
+    if depth > MAX_SCHEMA_DEPTH:
+        return
+    schema = resolver.resolve(schema) or {}
+    indent = "  " * depth
+    schema_type = _schema_type(schema)
+
+    if schema_type == "array" and schema.get("items"):
+        item_schema = resolver.resolve(schema["items"]) or {}
+        item_type = _schema_type(item_schema)
+        if item_type == "object" and item_schema.get("properties"):
+            for name, prop in sorted(item_schema["properties"].items()):
+                prop = resolver.resolve(prop) or {}
+                prop_path = f"{path}[].{name}"
+                lines.append(_field_line(indent, prop_path, prop))
+                _describe_properties(lines, resolver, prop, prop_path, depth + 1)
+        elif item_type:
+            lines.append(f"{indent}- **{path}[]**: Items of type {item_type}\n")
+        return
+
+    if schema_type == "object" and schema.get("properties"):
+        for name, prop in sorted(schema["properties"].items()):
+            prop = resolver.resolve(prop) or {}
+            prop_path = f"{path}.{name}"
+            lines.append(_field_line(indent, prop_path, prop))
+            _describe_properties(lines, resolver, prop, prop_path, depth + 1)
+
+
+def _field_line(indent: str, name: str, schema: Dict[str, Any]) -> str:
+    line = f"{indent}- **{name}**: {schema.get('description') or ''}"
+    schema_type = _schema_type(schema)
+    if schema_type:
+        line += f" (Type: {schema_type})"
+    return line + "\n"
+
+
+def _response_template(resolver: _RefResolver, operation: Dict[str, Any]) -> Dict[str, Any]:
+    success = None
+    for code, response in (operation.get("responses") or {}).items():
+        if str(code).startswith("2") and response:
+            success = resolver.resolve(response)
+            break
+    if not success or not success.get("content"):
+        return {}
+
+    lines = [
+        "# API Response Information\n\n",
+        "Below is the response from an API call. To help you understand the data, I've provided:\n\n",
+        "1. A detailed description of all fields in the response structure\n",
+        "2. The complete API response\n\n",
+        "## Response Structure\n\n",
+    ]
+    for content_type, media_type in success["content"].items():
+        # 空 schema ({}) 也是声明过的响应结构，同样输出 Content-Type，只有缺少 schema 时才跳过
+        schema = (media_type or {}).get("schema")
+        if schema is None:
+            continue
+        schema = resolver.resolve(schema) or {}
+        lines.append(f"> Content-Type: {content_type}\n\n")
+        schema_type = _schema_type(schema)
+        if schema_type == "array" and schema.get("items"):
+            lines.append("- **items**: Array of items (Type: array)\n")
+            _describe_properties(lines, resolver, resolver.resolve(schema["items"]), "items", 1)
+        elif schema_type == "object" and schema.get("properties"):
+            for name, prop in sorted(schema["properties"].items()):
+                prop = resolver.resolve(prop) or {}
+                lines.append(_field_line("", name, prop))
+                _describe_properties(lines, resolver, prop, name, 1)
+    lines.append("\n## Original Response\n\n")
+    return {"prependBody": "".join(lines)}
+
+
+def convert_openapi(spec: Dict[str, Any], server_name: str) -> Dict[str, Any]:
+    """
+    将 OpenAPI 文档转换为 MCP Server 配置，输出与 openapi-to-mcp 工具相同的结构
+
+    Args:
+        spec: 已解析的 OpenAPI 文档
+        server_name: MCP Server 名称
+
+    Returns:
+        dict: 包含 server 和 tools 的 MCP 配置
+    """
+    resolver = _RefResolver(spec)
+    tools = []
+    for path, path_item in (spec.get("paths") or {}).items():
+        path_item = resolver.resolve(path_item) or {}
+        shared_parameters = path_item.get("parameters") or []
+        for method in HTTP_METHODS:
+            operation = path_item.get(method)
+            if not operation:
+                continue
+            args = _convert_parameters(resolver, shared_parameters + (operation.get("parameters") or []))
+            args.extend(_convert_request_body(resolver, operation.get("requestBody")))
+            args.sort(key=lambda arg: arg["name"])
+            tools.append({
+                "name": _operation_id(path, method, operation),
+                "description": _description(operation),
+                "args": args,
+                "requestTemplate": _request_template(spec, path, method, operation, resolver),
+                "responseTemplate": _response_template(resolver, operation),
+            })
+    tools.sort(key=lambda tool: tool["name"])
+    return {"server": {"name": server_name}, "tools": tools}
+
+
+def apply_gateway_config(config: Dict[str, Any], base_url: str, api_key: str = None, skip_auth: bool = False,
+                         logger: logging.Logger = None) -> Dict[str, Any]:
+    """
+    将 baseUrl 和 apikey 写入 server.config，并让 requestTemplate 通过模板变量引用它们
+
+    Args:
+        config: MCP 配置（原地修改）
+        base_url: 基础 URL 前缀
+        api_key: API 密钥
+        skip_auth: 是否跳过添加鉴权信息
+
+    Returns:
+        dict: 修改后的配置
+    """
+    logger = logger or logging.getLogger(__name__)
+
+    server = config.setdefault('server', {})
+    server_config = server.setdefault('config', {})
+    # 设置 baseUrl (无论是否跳过鉴权都需要)
+    server_config['baseUrl'] = base_url
+    # 只有在不跳过鉴权时才设置 apikey
+    if not skip_auth:
+        server_config['apikey'] = api_key
+
+    for tool in config.get('tools') or []:
+        request_template = tool.get('requestTemplate')
+        if request_template is None:
+            continue
+
+        if 'url' in request_template:
+            original_url = request_template['url']
+            if original_url.startswith('http://') or original_url.startswith('https://'):
+                # 绝对 URL，提取路径部分
+                path_parts = original_url.split('/', 3)
+                path = path_parts[3] if len(path_parts) >= 4 else ""
+            else:
+                # 相对路径，直接使用
+                path = original_url.lstrip('/')
+            request_template['url'] = "{{.config.baseUrl}}/" + path
+            logger.debug(f"URL 已修改: {original_url} -> {request_template['url']}")
+
+        if not skip_auth:
+            headers = request_template.setdefault('headers', [])
+            auth_header = next((header for header in headers if header.get('key') == 'Authorization'), None)
+            if auth_header is not None:
+                auth_header['value'] = "Bearer {{.config.apikey}}"
+            else:
+                headers.append({'key': 'Authorization', 'value': "Bearer {{.config.apikey}}"})
+
+    return config
+
+
+def apply_enterprise_gateway_config(config: Dict[str, Any], base_url: str, api_key: str = None,
+                                    skip_auth: bool = False) -> Dict[str, Any]:
+    """
+    AI 网关（企业版）的改写规则，输出与 apply_gateway_config 不同，需保持不变：
+    URL 一律取第三个 "/" 之后的部分，已有的 Authorization 头保持原值
+
+    Args:
+        config: MCP 配置（原地修改）
+        base_url: 基础 URL 前缀
+        api_key: API 密钥
+        skip_auth: 是否跳过添加鉴权信息
+
+    Returns:
+        dict: 修改后的配置
+    """
+    if 'server' not in config:
+        config['server'] = {}
+    if 'config' not in config['server']:
+        config['server']['config'] = {}
+
+    config['server']['config']['baseUrl'] = base_url
+    if not skip_auth:
+        config['server']['config']['apikey'] = api_key
+
+    for tool in config.get('tools', []):
+        if 'requestTemplate' in tool:
+            if 'url' in tool['requestTemplate']:
+                original_url = tool['requestTemplate']['url']
+                path = original_url.split('/', 3)[-1] if '/' in original_url else original_url.lstrip('/')
+                tool['requestTemplate']['url'] = f"{{{{.config.baseUrl}}}}/{path}"
+
+            if not skip_auth:
+                if 'headers' not in tool['requestTemplate']:
+                    tool['requestTemplate']['headers'] = []
+
+                has_auth = any(h.get('key') == 'Authorization' for h in tool['requestTemplate']['headers'])
+                if not has_auth:
+                    tool['requestTemplate']['headers'].append({
+                        'key': 'Authorization',
+                        'value': "Bearer {{.config.apikey}}"
+                    })
+
+    return config
+
+
+def build_mcp_config(spec: Dict[str, Any], server_name: str, base_url: str, api_key: str = None,
+                     skip_auth: bool = False, logger: logging.Logger = None) -> Dict[str, Any]:
+    """转换 OpenAPI 文档并完成网关侧改写，返回最终的 MCP Server 配置"""
+    config = convert_openapi(spec, server_name)
+    return apply_gateway_config(config, base_url, api_key, skip_auth, logger)
+
+
+def dump_mcp_yaml(config: Dict[str, Any]) -> str:
+    """按网关插件使用的格式输出 YAML"""
+    return yaml.dump(config, allow_unicode=True, default_flow_style=False)
+
+
+def encode_mcp_config(config: Dict[str, Any]) -> str:
+    """输出 YAML 并进行 base64 编码，用于 AI 网关插件挂载"""
+    return base64.b64encode(dump_mcp_yaml(config).encode('utf-8')).decode('utf-8')
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HigressClient 配置流程的基准测试
+
+在本地启动一个模拟的 Higress 控制台（/system/init、/session/login、/v1/consumers、/v1/service-sources、
+/v1/routes 和 /v1/routes/{name}/plugin-instances/mcp-server）和一个返回合成 openapi.json 的模拟 mcpo，
+对 10/100/1000 个工具运行 HigressClient.setup_from_config，并按需注入每个请求的延迟，
+输出耗时、请求数和内存峰值，便于对比改动前后的性能。
+
+    python provision_benchmark.py --tools 10 100 1000 --latency 0 0.005 --concurrency 1 8
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, namedtuple
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Dict, List, Optional
+
+from higress_client import HigressClient
+from log_pipeline import DEFAULT_PIPELINE
+from tracing import normalize_endpoint
+
+DEFAULT_TOOL_COUNTS = (10, 100, 1000)
+DEFAULT_OPERATIONS = 5
+
+BenchmarkResult = namedtuple("BenchmarkResult", [
+    "tools", "latency", "concurrency", "run", "seconds", "console_calls", "writes", "spec_requests", "peak_mib",
+    "failed",
+])
+
+_PLUGIN_INSTANCE_PATH = re.compile(r"^/v1/routes/([^/]+)/plugin-instances/mcp-server$")
+_RESOURCE_PATH = re.compile(r"^/v1/(consumers|service-sources|routes)(?:/([^/]+))?$")
+_SPEC_PATH = re.compile(r"^/([^/]+)/openapi\.json$")
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    # 支持长连接，与真实服务一样允许客户端复用连接；响应头和响应体分两次写出，
+    # 需关闭 Nagle 算法，否则与客户端的延迟确认叠加，每个请求多出约 40ms
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: Any):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+
+class _FakeServer:
+    """在后台线程中运行的本地 HTTP 服务，每个请求先等待 latency 秒"""
+
+    handler_class = _JsonHandler
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(self.handler_class):
+            owner = server
+
+        self._server = _ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, method: str, path: str):
+        with self._lock:
+            self.calls[(method, normalize_endpoint(path))] += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def total_calls(self, writes_only: bool = False) -> int:
+        """请求总数，writes_only 时只统计对 /v1 资源的写请求（不含初始化和登录）"""
+        with self._lock:
+            return sum(count for (method, path), count in self.calls.items()
+                       if not writes_only or (method != "GET" and path.startswith("/v1/")))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _ConsoleHandler(_JsonHandler):
+
+    def do_GET(self):
+        console = self.owner
+        path = self.path.split("?", 1)[0]
+        if path == "/health":
+            return self._send(200, {"status": "ok"})
+        console.record("GET", path)
+        match = _PLUGIN_INSTANCE_PATH.match(path)
+        if match:
+            instance = console.get("plugin-instances", match.group(1))
+            return self._send(200, instance) if instance else self._not_found()
+        match = _RESOURCE_PATH.match(path)
+        if not match:
+            return self._not_found()
+        kind, name = match.groups()
+        if name is None:
+            items = console.list(kind)
+            return self._send(200, {"success": True, "data": items, "total": len(items)})
+        resource = console.get(kind, name)
+        if resource is None:
+            return self._not_found()
+        # 路由详情与真实控制台一样包装在 data 中
+        return self._send(200, {"success": True, "data": resource} if kind == "routes" else resource)
+
+    def do_POST(self):
+        console = self.owner
+        path = self.path.split("?", 1)[0]
+        body = self._body()
+        console.record("POST", path)
+        if path == "/system/init":
+            return self._send(200, {"success": True})
+        if path == "/session/login":
+            return self._send(200, {"displayName": body.get("username", "admin")})
+        match = _RESOURCE_PATH.match(path)
+        if not match or match.group(2) is not None:
+            return self._not_found()
+        if not console.create(match.group(1), body):
+            return self._send(409, {"success": False, "message": f"{body.get('name')} already exists"})
+        return self._send(200, body)
+
+    def do_PUT(self):
+        console = self.owner
+        path = self.path.split("?", 1)[0]
+        body = self._body()
+        console.record("PUT", path)
+        match = _PLUGIN_INSTANCE_PATH.match(path)
+        if match:
+            return self._send(200, console.put("plugin-instances", match.group(1), body))
+        match = _RESOURCE_PATH.match(path)
+        if not match or match.group(2) is None:
+            return self._not_found()
+        return self._send(200, console.put(match.group(1), match.group(2), body))
+
+    def do_DELETE(self):
+        console = self.owner
+        path = self.path.split("?", 1)[0]
+        console.record("DELETE", path)
+        match = _PLUGIN_INSTANCE_PATH.match(path)
+        if match:
+            console.delete("plugin-instances", match.group(1))
+            return self._send(200, {"success": True})
+        match = _RESOURCE_PATH.match(path)
+        if not match or match.group(2) is None:
+            return self._not_found()
+        console.delete(match.group(1), match.group(2))
+        return self._send(200, {"success": True})
+
+    def _not_found(self):
+        self._send(404, {"success": False, "message": "not found"})
+
+
+class FakeHigressConsole(_FakeServer):
+    """
+    内存中的 Higress 控制台，资源按类型和名称保存，写入时递增 version
+
+    与控制台一致，消费者、服务来源和插件实例的 version 为整数，路由的 version 为字符串。
+    """
+
+    handler_class = _ConsoleHandler
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        super().__init__(latency, host, port)
+        self._resources = {"consumers": {}, "service-sources": {}, "routes": {}, "plugin-instances": {}}
+
+    def list(self, kind: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._resources[kind].values())
+
+    def get(self, kind: str, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._resources[kind].get(name)
+
+    @staticmethod
+    def _version(kind: str, number: int):
+        return str(number) if kind == "routes" else number
+
+    def create(self, kind: str, resource: Dict[str, Any]) -> bool:
+        with self._lock:
+            if resource.get("name") in self._resources[kind]:
+                return False
+            resource["version"] = self._version(kind, 1)
+            self._resources[kind][resource.get("name")] = resource
+            return True
+
+    def put(self, kind: str, name: str, resource: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            current = self._resources[kind].get(name) or {}
+            resource["version"] = self._version(kind, int(current.get("version") or 0) + 1)
+            self._resources[kind][name] = resource
+            return resource
+
+    def delete(self, kind: str, name: str):
+        with self._lock:
+            self._resources[kind].pop(name, None)
+
+    def count(self, kind: str) -> int:
+        with self._lock:
+            return len(self._resources[kind])
+
+
+def synthetic_openapi(tool: str, operations: int = DEFAULT_OPERATIONS) -> Dict[str, Any]:
+    """生成包含 operations 个 POST 接口的 OpenAPI 文档，结构与 mcpo 的输出相近"""
+    paths = {}
+    for index in range(operations):
+        paths[f"/op_{index}"] = {"post": {
+            "summary": f"{tool} operation {index}",
+            "description": f"Synthetic operation {index} of {tool} used for provisioning benchmarks.",
+            "operationId": f"op_{index}_post",
+            "requestBody": {"required": True, "content": {"application/json": {"schema": {
+                "$ref": f"#/components/schemas/op_{index}_form_model"}}}},
+            "responses": {"200": {"description": "Successful Response",
+                                  "content": {"application/json": {"schema": {}}}}},
+        }}
+    schemas = {f"op_{index}_form_model": {
+        "type": "object",
+        "title": f"op_{index}_form_model",
+        "required": ["query"],
+        "properties": {
+            "query": {"type": "string", "title": "Query", "description": "Text to process"},
+            "limit": {"type": "integer", "title": "Limit", "default": 10},
+            "tags": {"type": "array", "items": {"type": "string"}, "title": "Tags"},
+        },
+    } for index in range(operations)}
+    return {"openapi": "3.1.0", "info": {"title": tool, "version": "1.0.0"}, "paths": paths,
+            "components": {"schemas": schemas}}
+
+
+class _McpoHandler(_JsonHandler):
+
+    def do_GET(self):
+        mcpo = self.owner
+        path = self.path.split("?", 1)[0]
+        mcpo.record("GET", "/{tool}/openapi.json")
+        match = _SPEC_PATH.match(path)
+        if not match:
+            return self._send(404, {"detail": "Not Found"})
+        self._send(200, mcpo.spec(match.group(1)))
+
+
+class FakeMcpo(_FakeServer):
+    """为任意工具名返回合成的 openapi.json，operations 控制文档大小"""
+
+    handler_class = _McpoHandler
+
+    def __init__(self, operations: int = DEFAULT_OPERATIONS, latency: float = 0.0, host: str = "127.0.0.1",
+                 port: int = 0):
+        super().__init__(latency, host, port)
+        self.operations = operations
+
+    def spec(self, tool: str) -> Dict[str, Any]:
+        return synthetic_openapi(tool, self.operations)
+
+
+def write_tools_config(path: str, count: int) -> List[str]:
+    """写入包含 count 个工具的 MCP 配置文件，返回工具名"""
+    tools = [f"tool-{index:04d}" for index in range(count)]
+    config = {"mcpServers": {tool: {"command": "uvx", "args": [f"mcp-server-{tool}"]} for tool in tools}}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    return tools
+
+
+def _quiet_console(logger: logging.Logger):
+    # 只屏蔽控制台输出，文件日志照常写入，日志开销仍计入结果；不再传递给根日志记录器，避免重复输出
+    logger.propagate = False
+    for handler in logger.handlers:
+        for target in getattr(handler, "targets", [handler]):
+            if type(target) is logging.StreamHandler and target.stream is sys.stderr:
+                target.setLevel(logging.WARNING)
+
+
+def _peak_rss_mib() -> float:
+    # Linux 上 ru_maxrss 单位为 KiB，macOS 上为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_setup(console_url: str, mcpo_url: str, config_path: str, concurrency: int = 1, reconcile: bool = False,
+              converter: str = "native", trace_memory: bool = False, verbose: bool = False):
+    """
+    在当前目录下运行一次完整的连接和 setup_from_config
+
+    Returns:
+        tuple: (耗时秒数, 内存峰值 MiB, 失败工具数)；trace_memory 时内存为 tracemalloc 统计的 Python 堆峰值，
+        否则为进程的 RSS 峰值
+    """
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        if not verbose:
+            # 构造函数在日志记录器配置完成后立即输出一条 INFO
+            logging.disable(logging.INFO)
+        try:
+            client = HigressClient(domain="127.0.0.1", base_url=console_url, apikey="admin", verbose=verbose,
+                                   reconcile=reconcile, connect=False)
+        finally:
+            logging.disable(logging.NOTSET)
+        if not verbose:
+            _quiet_console(client.logger)
+        client.connect()
+        result = client.setup_from_config(config_path, openapi_base_url=mcpo_url, api_key="benchmark",
+                                          domain="127.0.0.1", concurrency=concurrency, converter=converter)
+        # 日志由后台线程写出，写完之后才算结束
+        DEFAULT_PIPELINE.flush()
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if trace_memory else _peak_rss_mib()
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        # HigressClient 的文件日志写在工作目录中，结束后关闭
+        client_logger = logging.getLogger("HigressClient")
+        for handler in list(client_logger.handlers):
+            client_logger.removeHandler(handler)
+            handler.close()
+    return seconds, peak, sum(1 for tool in result["tools"] if "error" in tool)
+
+
+def _isolated_setup(workdir: str, *args):
+    # 在独立进程中运行，RSS 峰值只反映本次配置
+    os.chdir(workdir)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    return run_setup(*args)
+
+
+def run_case(tools: int, latency: float = 0.0, concurrency: int = 1, operations: int = DEFAULT_OPERATIONS,
+             rerun: bool = True, trace_memory: bool = False, isolate: bool = True,
+             verbose: bool = False) -> List[BenchmarkResult]:
+    """
+    对一组参数运行基准：首次配置空控制台；rerun 时再按默认方式覆盖配置一次（走各资源的更新路径），
+    最后用对比模式重复配置一次
+
+    模拟服务运行在当前进程中，isolate 时每次配置在新启动的进程中运行，内存峰值不受之前运行和模拟服务影响。
+    HigressClient 会在工作目录写入 configmaps 和日志文件，因此在临时目录中运行。
+    """
+    results = []
+    workdir = tempfile.mkdtemp(prefix="higress-benchmark-")
+    previous_dir = os.getcwd()
+    try:
+        os.chdir(workdir)
+        config_path = os.path.join(workdir, "config.json")
+        write_tools_config(config_path, tools)
+        with FakeHigressConsole(latency) as console, FakeMcpo(operations, latency) as mcpo:
+            runs = [("首次", False)] + ([("覆盖", False), ("对比", True)] if rerun else [])
+            for label, reconcile in runs:
+                console_calls, console_writes = console.total_calls(), console.total_calls(writes_only=True)
+                spec_requests = mcpo.total_calls()
+                args = (console.url, mcpo.url, config_path, concurrency, reconcile, "native", trace_memory, verbose)
+                if isolate:
+                    with multiprocessing.get_context("spawn").Pool(1) as pool:
+                        seconds, peak, failed = pool.apply(_isolated_setup, (workdir,) + args)
+                else:
+                    seconds, peak, failed = run_setup(*args)
+                results.append(BenchmarkResult(
+                    tools, latency, concurrency, label, seconds, console.total_calls() - console_calls,
+                    console.total_calls(writes_only=True) - console_writes, mcpo.total_calls() - spec_requests,
+                    peak, failed))
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def format_results(results: List[BenchmarkResult]) -> List[str]:
+    lines = [f"{'工具数':>6} {'延迟ms':>7} {'并发':>4} {'轮次':>4} {'耗时s':>8} {'控制台请求':>8} {'写请求':>6} "
+             f"{'规范请求':>6} {'内存峰值MiB':>10} {'失败':>4}"]
+    for result in results:
+        lines.append(f"{result.tools:>9} {result.latency * 1000:>9.1f} {result.concurrency:>6} {result.run:>4} "
+                     f"{result.seconds:>10.2f} {result.console_calls:>13} {result.writes:>9} "
+                     f"{result.spec_requests:>10} {result.peak_mib:>15.1f} {result.failed:>6}")
+    return lines
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="在本地模拟的 Higress 控制台和 mcpo 上测量 HigressClient 的配置性能",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--tools", type=int, nargs="+", default=list(DEFAULT_TOOL_COUNTS), help="工具数量")
+    parser.add_argument("--latency", type=float, nargs="+", default=[0.0], help="每个请求注入的延迟秒数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1], help="setup_from_config 的并发数")
+    parser.add_argument("--operations", type=int, default=DEFAULT_OPERATIONS,
+                        help="每个合成 OpenAPI 文档包含的接口数，控制规范大小")
+    parser.add_argument("--no-rerun", action="store_true", help="不测量首次配置之后的覆盖配置和对比模式下的重复配置")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="用 tracemalloc 统计 Python 堆峰值代替进程 RSS 峰值（会明显拖慢运行，耗时仅供参考）")
+    parser.add_argument("--in-process", action="store_true",
+                        help="在当前进程中运行配置，不为每次运行启动新进程（RSS 峰值会包含之前的运行）")
+    parser.add_argument("--json", help="将结果写入 JSON 文件，便于与历史结果对比")
+    parser.add_argument("--verbose", action="store_true", help="输出 HigressClient 日志")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = []
+    for tools in args.tools:
+        for latency in args.latency:
+            for concurrency in args.concurrency:
+                case = run_case(tools, latency, concurrency, args.operations, not args.no_rerun,
+                                args.tracemalloc, not args.in_process, args.verbose)
+                for line in format_results(case)[1:]:
+                    print(line, file=sys.stderr)
+                results.extend(case)
+
+    print("\n".join(format_results(results)))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([result._asdict() for result in results], f, ensure_ascii=False, indent=2)
+    return 1 if any(result.failed for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多节点共享的配置状态与分布式配置锁
+
+各部署都已运行 higress-redis，这里把配置状态保存在其中（也可使用进程内的替身）：
+
+- 每个工具保存一条记录：期望配置的指纹（OpenAPI 内容摘要、baseUrl、鉴权方式、转换器和域名）
+  以及配置后服务来源、路由和 MCP 插件的 version。任一节点再次配置时，指纹一致且资源 version
+  未被他人修改的工具直接跳过
+- 配置锁是带过期时间的租约，持有期间后台线程定时续期；每次获取都会递增 fencing token，
+  状态写入只在 token 仍是最新时生效，租约过期后被其他节点接管的旧持有者无法覆盖新状态
+
+Redis 访问只使用 RESP 协议的少量命令（EVAL、GET、HGET、HGETALL），不依赖 redis 客户端库。
+"""
+
+import abc
+import argparse
+import hashlib
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import namedtuple
+from typing import Dict, Optional
+from urllib.parse import unquote, urlparse
+
+from mcp_config_cache import MCPConfigCache
+
+DEFAULT_STATE_PREFIX = "quickstart-mcp"
+DEFAULT_LEASE_TTL = 30.0
+DEFAULT_LOCK_WAIT = 600.0
+# 配置 Higress 资源时使用的锁
+PROVISION_LOCK = "provision"
+MEMORY = "memory"
+
+# fingerprint: 期望配置的指纹；versions: {service/route/plugin: version}；owner/token: 写入者及其 fencing token
+ToolState = namedtuple("ToolState", ["fingerprint", "versions", "owner", "token", "updated_at"])
+# 当前持有锁的节点，token 为其 fencing token
+LockHolder = namedtuple("LockHolder", ["owner", "token"])
+
+
+class StateError(RuntimeError):
+    """状态后端访问失败"""
+
+
+class LeaseLostError(StateError):
+    """租约已过期或已被其他节点接管"""
+
+
+def default_owner() -> str:
+    """主机名、进程号加随机后缀，区分同一主机上的多次运行"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def tool_fingerprint(spec_digest: str, base_url: str, api_key: Optional[str], skip_auth: bool, converter: str,
+                     domain: str) -> str:
+    """工具期望配置的指纹：MCP 配置缓存键再加上服务来源使用的域名"""
+    config_key = MCPConfigCache.make_key(None, base_url, api_key, skip_auth, converter, spec_digest)
+    return hashlib.sha256(f"{config_key}\n{domain}".encode('utf-8')).hexdigest()
+
+
+def _encode_state(state: ToolState) -> str:
+    return json.dumps(state._asdict(), sort_keys=True, separators=(',', ':'))
+
+
+def _decode_state(raw) -> Optional[ToolState]:
+    if raw is None:
+        return None
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8')
+    try:
+        data = json.loads(raw)
+        return ToolState(**{field: data.get(field) for field in ToolState._fields})
+    except (ValueError, TypeError):
+        return None
+
+
+class Lease:
+    """已获取的配置锁，作为上下文管理器使用时在后台定时续期，退出时释放"""
+
+    def __init__(self, store: "StateStore", name: str, owner: str, token: int, ttl: float,
+                 logger: logging.Logger = None):
+        self.store = store
+        self.name = name
+        self.owner = owner
+        self.token = token
+        self.ttl = ttl
+        self.logger = logger or logging.getLogger(__name__)
+        self._lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def lost(self) -> bool:
+        return self._lost.is_set()
+
+    def ensure(self):
+        """租约已丢失时抛出 LeaseLostError，写 Higress 资源前调用"""
+        if self._lost.is_set():
+            raise LeaseLostError(f"配置锁 {self.name} (token {self.token}) 已丢失，停止写入")
+
+    def renew(self) -> bool:
+        try:
+            renewed = self.store.renew(self.name, self.owner, self.token, self.ttl)
+        except StateError as e:
+            # 暂时无法访问后端时不判定丢失，租约到期前还有机会续期
+            self.logger.warning(f"续期配置锁 {self.name} 失败: {str(e)}")
+            return False
+        if not renewed:
+            self._lost.set()
+            self.logger.error(f"配置锁 {self.name} (token {self.token}) 已过期或被其他节点接管")
+        return renewed
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.ttl / 3) and not self._lost.is_set():
+            self.renew()
+
+    def start(self) -> "Lease":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._heartbeat, name=f"lease-{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._lost.is_set():
+            return
+        try:
+            if self.store.release(self.name, self.owner, self.token):
+                self.logger.info(f"已释放配置锁 {self.name} (token {self.token})")
+        except StateError as e:
+            # 释放失败时由过期时间兜底
+            self.logger.warning(f"释放配置锁 {self.name} 失败，将在 {self.ttl:.0f} 秒后过期: {str(e)}")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class StateStore(abc.ABC):
+    """状态后端的公共部分；子类实现单次获取、续期、释放和带 fencing 的读写"""
+
+    @abc.abstractmethod
+    def try_acquire(self, name: str, owner: str, ttl: float) -> Optional[int]:
+        """锁空闲时获取并返回新的 fencing token，否则返回 None"""
+
+    @abc.abstractmethod
+    def renew(self, name: str, owner: str, token: int, ttl: float) -> bool:
+        """仍由 owner/token 持有时延长过期时间，否则返回 False"""
+
+    @abc.abstractmethod
+    def release(self, name: str, owner: str, token: int) -> bool:
+        """仍由 owner/token 持有时释放，否则返回 False"""
+
+    @abc.abstractmethod
+    def holder(self, name: str) -> Optional[LockHolder]:
+        """当前持有者，锁空闲时返回 None"""
+
+    @abc.abstractmethod
+    def get_tool(self, tool: str) -> Optional[ToolState]:
+        """工具的状态记录，没有记录时返回 None"""
+
+    @abc.abstractmethod
+    def tools(self) -> Dict[str, ToolState]:
+        """所有工具的状态记录"""
+
+    @abc.abstractmethod
+    def _write_tool(self, tool: str, state: Optional[ToolState], lease: Optional[Lease]) -> bool:
+        """写入（state 为 None 时删除）工具状态，lease 的 token 已过期时返回 False"""
+
+    def put_tool(self, tool: str, state: ToolState, lease: Lease = None) -> bool:
+        """写入工具状态；提供 lease 时只有其 token 仍是最新时写入，否则返回 False"""
+        return self._write_tool(tool, state, lease)
+
+    def delete_tool(self, tool: str, lease: Lease = None) -> bool:
+        return self._write_tool(tool, None, lease)
+
+    def acquire(self, name: str, owner: str = None, ttl: float = DEFAULT_LEASE_TTL, wait: float = DEFAULT_LOCK_WAIT,
+                logger: logging.Logger = None) -> Lease:
+        """
+        获取锁，被占用时轮询等待
+
+        Args:
+            wait: 最长等待秒数，超时抛出 StateError
+        """
+        logger = logger or logging.getLogger(__name__)
+        owner = owner or default_owner()
+        deadline = time.monotonic() + wait
+        delay = 0.2
+        reported = False
+        while True:
+            token = self.try_acquire(name, owner, ttl)
+            if token is not None:
+                logger.info(f"已获取配置锁 {name}: {owner} (token {token})")
+                return Lease(self, name, owner, token, ttl, logger)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                current = self.holder(name)
+                raise StateError(f"等待配置锁 {name} 超时，当前持有者: {current.owner if current else '未知'}")
+            if not reported:
+                current = self.holder(name)
+                logger.info(f"配置锁 {name} 被 {current.owner if current else '其他节点'} 持有，等待释放")
+                reported = True
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 2.0)
+
+
+class MemoryStateStore(StateStore):
+    """进程内的状态后端，语义与 Redis 后端一致，用于测试和单节点运行"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks = {}  # type: Dict[str, tuple]
+        self._fences = {}  # type: Dict[str, int]
+        self._tools = {}  # type: Dict[str, str]
+
+    def _current(self, name: str) -> Optional[tuple]:
+        held = self._locks.get(name)
+        if held is not None and held[2] <= time.monotonic():
+            del self._locks[name]
+            return None
+        return held
+
+    def try_acquire(self, name, owner, ttl):
+        with self._lock:
+            if self._current(name) is not None:
+                return None
+            token = self._fences.get(name, 0) + 1
+            self._fences[name] = token
+            self._locks[name] = (owner, token, time.monotonic() + ttl)
+            return token
+
+    def renew(self, name, owner, token, ttl):
+        with self._lock:
+            held = self._current(name)
+            if held is None or held[:2] != (owner, token):
+                return False
+            self._locks[name] = (owner, token, time.monotonic() + ttl)
+            return True
+
+    def release(self, name, owner, token):
+        with self._lock:
+            held = self._current(name)
+            if held is None or held[:2] != (owner, token):
+                return False
+            del self._locks[name]
+            return True
+
+    def holder(self, name):
+        with self._lock:
+            held = self._current(name)
+            return LockHolder(held[0], held[1]) if held else None
+
+    def get_tool(self, tool):
+        with self._lock:
+            return _decode_state(self._tools.get(tool))
+
+    def tools(self):
+        with self._lock:
+            return {tool: _decode_state(raw) for tool, raw in self._tools.items()}
+
+    def _write_tool(self, tool, state, lease):
+        with self._lock:
+            if lease is not None and self._fences.get(lease.name) != lease.token:
+                return False
+            if state is None:
+                self._tools.pop(tool, None)
+            else:
+                self._tools[tool] = _encode_state(state)
+            return True
+
+
+class RespClient:
+    """最小的 RESP2 客户端：单连接、线程安全，连接断开时重连一次"""
+
+    def __init__(self, host: str = "localhost", port: int = 6379, password: str = None, username: str = None,
+                 db: int = 0, timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.username = username
+        self.db = db
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = 5.0) -> "RespClient":
+        """redis://[[用户名]:密码@]主机[:端口][/库]"""
+        parsed = urlparse(url)
+        if parsed.scheme != "redis" or not parsed.hostname:
+            raise ValueError(f"无效的 Redis 地址: {url}")
+        path = parsed.path.strip("/")
+        if path and not path.isdigit():
+            raise ValueError(f"无效的 Redis 库编号: {path}")
+        return cls(parsed.hostname, parsed.port or 6379,
+                   password=unquote(parsed.password) if parsed.password else None,
+                   username=unquote(parsed.username) if parsed.username else None,
+                   db=int(path or 0), timeout=timeout)
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Redis 连接已关闭")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode('utf-8')
+        if kind == b"-":
+            raise StateError(f"Redis 返回错误: {body.decode('utf-8', 'replace')}")
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Redis 连接已关闭")
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise StateError(f"无法识别的 Redis 应答: {line[:32]!r}")
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile('rb')
+        if self.password:
+            self._call("AUTH", *([self.username] if self.username else []), self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def _call(self, *args):
+        self._sock.sendall(self._encode(args))
+        return self._read_reply()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        for resource in (self._reader, self._sock):
+            if resource is not None:
+                try:
+                    resource.close()
+                except OSError:
+                    pass
+        self._sock = self._reader = None
+
+    def execute(self, *args):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(*args)
+                except StateError:
+                    raise
+                except (OSError, ConnectionError) as e:
+                    self._close()
+                    if attempt:
+                        raise StateError(f"访问 Redis {self.host}:{self.port} 失败: {str(e)}")
+
+
+# 锁值为 "owner|token"；获取时先递增 fencing 计数器
+_ACQUIRE = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return false end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], ARGV[1] .. '|' .. token, 'PX', ARGV[2])
+return token
+"""
+_RENEW = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+"""
+_RELEASE = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+return redis.call('DEL', KEYS[1])
+"""
+# ARGV[1] 为空表示不检查 fencing token；ARGV[3] 为空表示删除
+_WRITE_TOOL = """
+if ARGV[1] ~= '' and redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+if ARGV[3] == '' then redis.call('HDEL', KEYS[2], ARGV[2]) else redis.call('HSET', KEYS[2], ARGV[2], ARGV[3]) end
+return 1
+"""
+
+
+class RedisStateStore(StateStore):
+    """
+    保存在 Redis 中的状态，键均以 prefix 开头：
+
+    - {prefix}:lock:{锁名} 锁值 "owner|token"，带过期时间
+    - {prefix}:fence:{锁名} fencing 计数器
+    - {prefix}:tools 哈希，字段为工具名，值为 ToolState 的 JSON
+    """
+
+    def __init__(self, client: RespClient, prefix: str = DEFAULT_STATE_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    def _lock_key(self, name):
+        return f"{self.prefix}:lock:{name}"
+
+    def _fence_key(self, name):
+        return f"{self.prefix}:fence:{name}"
+
+    @property
+    def _tools_key(self):
+        return f"{self.prefix}:tools"
+
+    def try_acquire(self, name, owner, ttl):
+        return self.client.execute("EVAL", _ACQUIRE, 2, self._lock_key(name), self._fence_key(name),
+                                   owner, int(ttl * 1000))
+
+    def renew(self, name, owner, token, ttl):
+        return self.client.execute("EVAL", _RENEW, 1, self._lock_key(name), f"{owner}|{token}",
+                                   int(ttl * 1000)) == 1
+
+    def release(self, name, owner, token):
+        return self.client.execute("EVAL", _RELEASE, 1, self._lock_key(name), f"{owner}|{token}") == 1
+
+    def holder(self, name):
+        value = self.client.execute("GET", self._lock_key(name))
+        if value is None:
+            return None
+        owner, _, token = value.decode('utf-8').rpartition("|")
+        return LockHolder(owner, int(token))
+
+    def get_tool(self, tool):
+        return _decode_state(self.client.execute("HGET", self._tools_key, tool))
+
+    def tools(self):
+        flat = self.client.execute("HGETALL", self._tools_key) or []
+        return {field.decode('utf-8'): _decode_state(value) for field, value in zip(flat[::2], flat[1::2])}
+
+    def _write_tool(self, tool, state, lease):
+        fence = self._fence_key(lease.name) if lease is not None else self._fence_key(PROVISION_LOCK)
+        return self.client.execute("EVAL", _WRITE_TOOL, 2, fence, self._tools_key,
+                                   lease.token if lease is not None else "", tool,
+                                   _encode_state(state) if state is not None else "") == 1
+
+
+def open_state_store(url: str, prefix: str = DEFAULT_STATE_PREFIX, timeout: float = 5.0) -> StateStore:
+    """memory 返回进程内后端，redis://... 返回 Redis 后端"""
+    if url == MEMORY:
+        return MemoryStateStore()
+    return RedisStateStore(RespClient.from_url(url, timeout), prefix)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="查看和清理保存在 Redis 中的配置状态",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--state", default="redis://localhost:6379/0", help="状态后端地址 redis://...")
+    parser.add_argument("--prefix", default=DEFAULT_STATE_PREFIX, help="状态键的前缀")
+    subparsers = parser.add_subparsers(dest="action")
+    subparsers.required = True
+    subparsers.add_parser("show", help="输出配置锁的持有者和各工具的状态")
+    forget_parser = subparsers.add_parser("forget", help="删除工具的状态，下次配置时重新执行")
+    forget_parser.add_argument("tools", nargs="+")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger("provision_state")
+    try:
+        store = open_state_store(args.state, args.prefix)
+        if args.action == "forget":
+            for tool in args.tools:
+                store.delete_tool(tool)
+                logger.info(f"已删除工具 {tool} 的状态")
+            return 0
+        holder = store.holder(PROVISION_LOCK)
+        print(json.dumps({
+            "lock": holder._asdict() if holder else None,
+            "tools": {tool: state._asdict() if state else None for tool, state in sorted(store.tools().items())},
+        }, ensure_ascii=False, indent=2))
+        return 0
+    except (StateError, ValueError) as e:
+        logger.error(str(e))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+部署时的就绪探测
+
+并发探测 mcpo 各工具的 /{tool}/openapi.json、Higress 控制台 /health 和 Redis，
+失败后按指数退避重试，取代按固定间隔轮询 docker logs 再固定等待的做法。
+可以单独运行，也可以由 higress_client.py --wait-ready 调用：
+后者在 mcpo 就绪后立即开始获取和转换 OpenAPI 规范，与 Higress 启动重叠进行。
+"""
+
+import argparse
+import logging
+import random
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+
+from config_watcher import load_tool_settings
+
+DEFAULT_READY_TIMEOUT = 1800.0
+DEFAULT_INITIAL_DELAY = 0.5
+DEFAULT_MAX_DELAY = 8.0
+DEFAULT_REDIS_PORT = 6379
+
+
+def wait_until_ready(name: str, check: Callable[[], Any], timeout: float = DEFAULT_READY_TIMEOUT,
+                     initial_delay: float = DEFAULT_INITIAL_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+                     logger: logging.Logger = None, stop_event: threading.Event = None) -> Any:
+    """
+    反复执行 check 直到不再抛出异常，两次探测之间按指数退避等待
+
+    Returns:
+        check 的返回值
+
+    Raises:
+        RuntimeError: 超过 timeout 秒仍未就绪，或 stop_event 被设置
+    """
+    logger = logger or logging.getLogger(__name__)
+    stop_event = stop_event or threading.Event()
+    started = time.monotonic()
+    delay = initial_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            result = check()
+            logger.info(f"{name} 已就绪 (第 {attempt} 次探测，等待 {time.monotonic() - started:.1f} 秒)")
+            return result
+        except Exception as e:
+            last_error = e
+        remaining = timeout - (time.monotonic() - started)
+        if remaining <= 0:
+            raise RuntimeError(f"等待 {name} 就绪超时 ({timeout:.0f} 秒): {last_error}")
+        logger.debug(f"{name} 尚未就绪: {last_error}，{delay:.1f} 秒后重试")
+        # 加少量抖动，避免多个探测同时打到刚启动的服务
+        if stop_event.wait(min(delay * random.uniform(1.0, 1.2), remaining)):
+            raise RuntimeError(f"停止等待 {name}: {last_error}")
+        delay = min(delay * 2, max_delay)
+
+
+def http_check(url: str, session: requests.Session = None, timeout: float = 5.0) -> Callable[[], requests.Response]:
+    """返回一个探测函数：GET url 返回 200 时成功"""
+    session = session or requests.Session()
+
+    def check():
+        response = session.get(url, timeout=timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return response
+
+    return check
+
+
+def openapi_check(url: str, session: requests.Session = None, timeout: float = 30.0) -> Callable[[], Dict]:
+    """返回一个探测函数：成功时返回解析后的 OpenAPI 文档"""
+    get = http_check(url, session, timeout)
+
+    def check():
+        spec = get().json()
+        if not isinstance(spec, dict) or "paths" not in spec:
+            raise RuntimeError("响应不是 OpenAPI 文档")
+        return spec
+
+    return check
+
+
+def redis_check(host: str, port: int = DEFAULT_REDIS_PORT, timeout: float = 3.0) -> Callable[[], None]:
+    """返回一个探测函数：Redis 对 PING 作出 RESP 应答时成功（要求认证的错误应答也说明服务已启动）"""
+
+    def check():
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(b"PING\r\n")
+            reply = sock.recv(64)
+        if not reply.startswith((b"+PONG", b"-NOAUTH", b"-WRONGPASS")):
+            raise RuntimeError(f"Redis 应答异常: {reply[:32]!r}")
+
+    return check
+
+
+def split_address(address: str, default_port: int) -> Tuple[str, int]:
+    """解析 host[:port]"""
+    host, separator, port = address.rpartition(":")
+    if not separator:
+        return address, default_port
+    return host, int(port)
+
+
+class ReadinessOrchestrator:
+    """在线程池中并发运行多个就绪探测，任一探测超时即失败"""
+
+    def __init__(self, timeout: float = DEFAULT_READY_TIMEOUT, max_workers: int = 8, logger: logging.Logger = None):
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="readiness")
+        self._futures = {}
+        self._stop_event = threading.Event()
+        self._started = time.monotonic()
+
+    def probe(self, name: str, check: Callable[[], Any]):
+        """开始探测，返回 Future"""
+        future = self._executor.submit(wait_until_ready, name, check, self.timeout, logger=self.logger,
+                                       stop_event=self._stop_event)
+        self._futures[name] = future
+        return future
+
+    def submit(self, name: str, func: Callable, *args, **kwargs):
+        """在探测线程池中运行其他任务（例如 mcpo 就绪后的规范预取）"""
+        future = self._executor.submit(func, *args, **kwargs)
+        self._futures[name] = future
+        return future
+
+    def wait_all(self, names=None) -> Dict[str, Any]:
+        """等待指定（默认全部）任务完成，返回 {名称: 结果}，任一失败时抛出其异常"""
+        futures = {name: future for name, future in self._futures.items() if names is None or name in names}
+        done, _ = wait(list(futures.values()), return_when=FIRST_EXCEPTION)
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
+        results = {name: future.result() for name, future in futures.items()}
+        self.logger.info(f"{', '.join(futures)} 均已就绪，用时 {time.monotonic() - self._started:.1f} 秒")
+        return results
+
+    @property
+    def stop_event(self) -> threading.Event:
+        """关闭时被设置，submit 的任务可以用它提前结束自己的等待"""
+        return self._stop_event
+
+    def close(self):
+        # 某个探测失败后不再等待其余探测
+        self._stop_event.set()
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="等待 mcpo、Higress 控制台和 Redis 就绪",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--config", help="MCP 配置文件路径，提供时逐个探测各工具的 openapi.json")
+    parser.add_argument("--openapi-url", default="http://localhost:8000", help="mcpo 服务基础 URL")
+    parser.add_argument("--base-url", default="http://localhost:8001", help="Higress 控制台基础 URL，为空时不探测")
+    parser.add_argument("--redis", default="localhost:6379", help="Redis 地址 host[:port]，为空时不探测")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_READY_TIMEOUT, help="最长等待秒数")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger("readiness")
+
+    tools = list(load_tool_settings(args.config)) if args.config else []
+    # 每个探测独占一个线程直到就绪，线程数要覆盖全部探测
+    with ReadinessOrchestrator(args.timeout, max_workers=len(tools) + 2, logger=logger) as orchestrator:
+        for tool in tools:
+            orchestrator.probe(f"mcpo/{tool}", openapi_check(f"{args.openapi_url}/{tool}/openapi.json"))
+        if args.base_url:
+            orchestrator.probe("Higress 控制台", http_check(f"{args.base_url.rstrip('/')}/health"))
+        if args.redis:
+            orchestrator.probe("Redis", redis_check(*split_address(args.redis, DEFAULT_REDIS_PORT)))
+        try:
+            orchestrator.wait_all()
+        except RuntimeError as e:
+            logger.error(str(e))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
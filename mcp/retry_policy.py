@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Higress 控制台和 APIG 调用共用的重试策略
+
+- 指数退避加随机抖动，服务端给出 Retry-After 时按其等待
+- 幂等方法 (GET/HEAD/PUT/DELETE) 在限流、5xx 网关错误和连接失败时重试；
+  POST 只在被明确限流拒绝（请求未被执行）时重试，超时和 5xx 不重试，避免重复创建
+- 每次运行共享一份重试预算，预算耗尽后不再重试
+- 熔断器：连续失败达到阈值后在冷却期内直接失败，冷却后放行一个探测请求
+"""
+
+import asyncio
+import email.utils
+import logging
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 10.0
+DEFAULT_RETRY_BUDGET = 30
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+# 服务端要求的等待时间上限，避免一个 Retry-After 卡住整个流程
+MAX_RETRY_AFTER = 60.0
+
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+
+# kind: THROTTLED 请求被限流拒绝，TRANSIENT 服务暂时不可用或连接失败；retry_after 为服务端要求的等待秒数
+Failure = namedtuple("Failure", ["kind", "retry_after", "reason"])
+
+_TRANSIENT_STATUS = frozenset([502, 503, 504])
+_THROTTLING_PATTERN = re.compile(r"Throttling|TooManyRequests|Too Many Requests|StatusCode:\s*429|HTTP 429")
+_TRANSIENT_PATTERN = re.compile(
+    r"ServiceUnavailable|ServiceTimeout|InternalError|StatusCode:\s*50[234]|HTTP 50[234]|"
+    r"timed out|Connection (?:refused|reset|aborted)|请求 \S+ 失败")
+_RETRY_AFTER_PATTERN = re.compile(r"Retry-After:\s*([^)\r\n]+)")
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开期间直接失败"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期），无法解析时返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_http_response(response) -> Optional[Failure]:
+    """判断 requests 响应是否为可重试的失败"""
+    status = response.status_code
+    if status == 429:
+        return Failure(THROTTLED, parse_retry_after(response.headers.get("Retry-After")), f"HTTP {status}")
+    if status in _TRANSIENT_STATUS:
+        return Failure(TRANSIENT, parse_retry_after(response.headers.get("Retry-After")), f"HTTP {status}")
+    return None
+
+
+def classify_cli_result(result: Tuple[int, str, str]) -> Optional[Failure]:
+    """判断传输层返回的 (returncode, stdout, stderr) 是否为可重试的失败"""
+    returncode, _, stderr = result
+    if returncode == 0:
+        return None
+    match = _RETRY_AFTER_PATTERN.search(stderr or "")
+    retry_after = parse_retry_after(match.group(1)) if match else None
+    if _THROTTLING_PATTERN.search(stderr or ""):
+        return Failure(THROTTLED, retry_after, "限流")
+    if _TRANSIENT_PATTERN.search(stderr or ""):
+        return Failure(TRANSIENT, retry_after, (stderr or "").strip().splitlines()[0][:200])
+    return None
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后打开，冷却结束后放行一个探测请求，探测成功则恢复"""
+
+    def __init__(self, name: str, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT, logger: logging.Logger = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def before_call(self):
+        """熔断打开时抛出 CircuitOpenError"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or self._probing:
+                raise CircuitOpenError(f"{self.name} 连续失败 {self._failures} 次，已熔断，"
+                                       f"{max(remaining, 0):.0f} 秒后再试")
+            # 冷却结束，放行一个探测请求
+            self._probing = True
+
+    def release_probe(self):
+        """探测请求以无法判断服务状态的异常结束时，允许下一个请求继续探测"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                self.logger.info(f"{self.name} 已恢复，关闭熔断")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self.logger.error(f"{self.name} 连续失败 {self._failures} 次，熔断 {self.reset_timeout:.0f} 秒")
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class RetryPolicy:
+    """按方法幂等性、失败类型和剩余预算决定是否重试"""
+
+    def __init__(self, name: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS, base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY, retry_budget: int = DEFAULT_RETRY_BUDGET,
+                 breaker: CircuitBreaker = None, retry_exceptions: Tuple[type, ...] = (OSError,),
+                 logger: logging.Logger = None):
+        self.name = name
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_exceptions = retry_exceptions
+        self.logger = logger or logging.getLogger(__name__)
+        self.breaker = breaker or CircuitBreaker(name, logger=self.logger)
+        self.retries = 0
+        self._budget = retry_budget
+        self._budget_warned = False
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间：指数增长，在上限一半到上限之间随机取值"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self._budget <= 0:
+                if not self._budget_warned:
+                    self.logger.warning(f"{self.name} 本次运行的重试预算已用完，后续失败不再重试")
+                    self._budget_warned = True
+                return False
+            self._budget -= 1
+            self.retries += 1
+            return True
+
+    def _record(self, failure: Optional[Failure]):
+        # 限流说明服务仍在响应，与成功一样不计入熔断
+        if failure is None or failure.kind == THROTTLED:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def _retry_delay(self, method: str, failure: Optional[Failure], attempt: int) -> Optional[float]:
+        if failure is None or attempt >= self.max_attempts:
+            return None
+        if failure.kind == TRANSIENT and method.upper() not in IDEMPOTENT_METHODS:
+            return None
+        if not self._take_budget():
+            return None
+        if failure.retry_after is not None:
+            return min(failure.retry_after, MAX_RETRY_AFTER)
+        return self.backoff(attempt)
+
+    def _outcome(self, attempt_result, error: Optional[BaseException],
+                 classify: Callable[[Any], Optional[Failure]]) -> Optional[Failure]:
+        if error is not None:
+            return Failure(TRANSIENT, None, str(error))
+        return classify(attempt_result)
+
+    def call(self, method: str, target: str, attempt: Callable[[], Any],
+             classify: Callable[[Any], Optional[Failure]]) -> Any:
+        """执行 attempt，可重试的失败按策略重试，最终返回最后一次结果或抛出最后一次异常"""
+        attempt_number = 0
+        while True:
+            self.breaker.before_call()
+            attempt_number += 1
+            result, error = None, None
+            try:
+                result = attempt()
+            except self.retry_exceptions as e:
+                error = e
+            except Exception:
+                self.breaker.release_probe()
+                raise
+            failure = self._outcome(result, error, classify)
+            self._record(failure)
+            delay = self._retry_delay(method, failure, attempt_number)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return result
+            self.logger.warning(f"{method} {target} 失败 ({failure.reason})，{delay:.1f} 秒后第 {attempt_number} 次重试")
+            time.sleep(delay)
+
+    async def acall(self, method: str, target: str, attempt: Callable[[], Awaitable[Any]],
+                    classify: Callable[[Any], Optional[Failure]]) -> Any:
+        """call 的异步版本，attempt 返回协程"""
+        attempt_number = 0
+        while True:
+            self.breaker.before_call()
+            attempt_number += 1
+            result, error = None, None
+            try:
+                result = await attempt()
+            except self.retry_exceptions as e:
+                error = e
+            except Exception:
+                self.breaker.release_probe()
+                raise
+            failure = self._outcome(result, error, classify)
+            self._record(failure)
+            delay = self._retry_delay(method, failure, attempt_number)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return result
+            self.logger.warning(f"{method} {target} 失败 ({failure.reason})，{delay:.1f} 秒后第 {attempt_number} 次重试")
+            await asyncio.sleep(delay)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+带条件请求和磁盘存储的 OpenAPI 规范获取
+
+每个规范 URL 在存储目录中保存一份记录：ETag、Last-Modified、过期时间、规范内容和内容摘要。
+再次获取时带上 If-None-Match / If-Modified-Since，服务端返回 304 时直接使用存储的规范；
+Cache-Control max-age 未过期时不发请求；mcpo 不返回校验字段时仍需完整下载，
+但用规范化内容摘要判断规范是否变化，摘要可直接作为 MCP 配置缓存键的一部分，跳过重复转换。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from mcp_config_cache import canonical_spec_digest
+
+DEFAULT_SPEC_STORE_DIR = os.path.expanduser("~/.cache/quickstart-mcp/openapi-specs")
+
+# status: not_modified 服务端返回 304，fresh 存储未过期未发请求，unchanged 完整下载但内容未变，changed 新内容
+FetchedSpec = namedtuple("FetchedSpec", ["spec", "digest", "status"])
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class SpecFetcher:
+    """复用连接池获取 OpenAPI 规范，directory 为空时只在内存中保存记录"""
+
+    def __init__(self, directory: Optional[str] = DEFAULT_SPEC_STORE_DIR, session: requests.Session = None,
+                 pool_size: int = 4, timeout: float = 30, logger: logging.Logger = None):
+        self.directory = directory
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.stats = {"not_modified": 0, "fresh": 0, "unchanged": 0, "changed": 0}
+        self._entries = {}  # type: Dict[str, Dict[str, Any]]
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is not None or not self.directory:
+            return entry
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("url") != url:
+            return None
+        with self._lock:
+            self._entries[url] = entry
+        return entry
+
+    def _save(self, url: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[url] = entry
+        if not self.directory:
+            return
+        path = self._path(url)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix=".spec-", dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            # 存储失败只影响下次运行的条件请求，不影响本次结果
+            self.logger.warning(f"保存 OpenAPI 规范记录失败: {e}")
+
+    def _count(self, status: str):
+        with self._lock:
+            self.stats[status] += 1
+
+    @staticmethod
+    def _expires_at(response: requests.Response) -> Optional[float]:
+        match = _MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        if not match or "no-cache" in response.headers.get("Cache-Control", ""):
+            return None
+        return time.time() + int(match.group(1))
+
+    def fetch(self, url: str) -> FetchedSpec:
+        """获取规范，失败时抛出 requests 异常或 ValueError"""
+        entry = self._load(url)
+        if entry is not None and entry.get("expires_at") and time.time() < entry["expires_at"]:
+            self.logger.info(f"OpenAPI 规范未过期，使用存储的内容: {url}")
+            self._count("fresh")
+            return FetchedSpec(entry["spec"], entry["digest"], "fresh")
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and entry is not None:
+            self.logger.info(f"OpenAPI 规范未修改 (304): {url}")
+            entry = dict(entry, expires_at=self._expires_at(response) or entry.get("expires_at"))
+            self._save(url, entry)
+            self._count("not_modified")
+            return FetchedSpec(entry["spec"], entry["digest"], "not_modified")
+        response.raise_for_status()
+
+        spec = response.json()
+        digest = canonical_spec_digest(spec)
+        status = "unchanged" if entry is not None and entry.get("digest") == digest else "changed"
+        new_entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "expires_at": self._expires_at(response),
+            "digest": digest,
+            "spec": spec,
+        }
+        if status == "changed" or any(new_entry[key] != entry.get(key) for key in
+                                      ("etag", "last_modified", "expires_at")):
+            self._save(url, new_entry)
+        if status == "unchanged":
+            self.logger.info(f"OpenAPI 规范内容未变化: {url}")
+        self._count(status)
+        return FetchedSpec(spec, digest, status)
+
+    def summary(self) -> str:
+        with self._lock:
+            stats = dict(self.stats)
+        return (f"304 {stats['not_modified']} 个，未过期 {stats['fresh']} 个，"
+                f"内容未变 {stats['unchanged']} 个，新内容 {stats['changed']} 个")
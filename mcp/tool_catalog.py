@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP 工具目录的索引与检索
+
+一次读取 mcp-tools.json，按 tag.yaml 统一标签写法（DeveloperTools、developer-tools 等归为同一标签），
+并预先建立 ServerCode 索引、标签索引和覆盖中英文名称/描述的倒排索引。
+
+- 英文按单词建立索引，最后一个查询词按前缀匹配
+- 中文没有分词，按相邻两字（单字词按单字）建立索引
+- 索引可序列化为紧凑的 JSON，源文件未变化时直接加载，不再重新分词
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+INDEX_VERSION = 1
+
+# 各字段命中时的权重
+FIELD_WEIGHTS = (("code", 3), ("name", 3), ("tags", 2), ("description", 1))
+
+# slug: 统一后的标签；name: 英文名；label: 中文名；listed_count: tag.yaml 中标注的数量
+Tag = namedtuple("Tag", ["slug", "name", "label", "listed_count"])
+# names/descriptions 为 {"zh-cn": ..., "en": ...}；tags 为统一后的标签；content 为启动配置
+ToolEntry = namedtuple("ToolEntry", ["code", "names", "descriptions", "tags", "type", "content"])
+SearchHit = namedtuple("SearchHit", ["entry", "score"])
+
+_COUNT_SUFFIX = re.compile(r"\s*[（(]\s*(\d+)\s*[）)]\s*$")
+_CJK = re.compile(r"[㐀-鿿豈-﫿]+")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize_tag(tag: str) -> str:
+    """DeveloperTools、developer-tools、Developer Tools、knowledge & memory 等写法统一为小写连字符形式"""
+    text = tag.strip().replace("&", " and ")
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1-\2", text)
+    text = re.sub(r"([A-Z]+)([A-Z][a-z])", r"\1-\2", text)
+    return re.sub(r"[^A-Za-z0-9]+", "-", text).strip("-").lower()
+
+
+def parse_tag_file(text: str) -> List[Tuple[str, str, bool]]:
+    """
+    宽松解析 tag.yaml：既有 "键: 中文名" 的映射行，也有 ["键: 中文名", ...] 形式的列表，
+    整体并不是合法的 YAML，这里逐行读取
+
+    Returns:
+        [(键, 中文名, 是否来自列表)]，列表中的条目作为标准写法
+    """
+    pairs = []
+    in_list = False
+    for raw in text.splitlines():
+        line = raw.strip()
+        if line.startswith("["):
+            in_list = True
+            line = line[1:].strip()
+        if line.endswith("]"):
+            line = line[:-1].strip()
+            closing = True
+        else:
+            closing = False
+        line = line.rstrip(",").strip()
+        if len(line) >= 2 and line[0] in "\"'" and line[-1] == line[0]:
+            line = line[1:-1]
+        key, separator, label = line.partition(":")
+        if separator and key.strip():
+            pairs.append((key.strip(), label.strip().strip("\"'"), in_list))
+        if closing:
+            in_list = False
+    return pairs
+
+
+def build_tags(pairs: Iterable[Tuple[str, str, bool]]) -> Dict[str, Tag]:
+    """按统一后的标签合并各种写法，列表中的标准写法优先作为显示名称"""
+    tags = {}
+    for key, label, canonical in pairs:
+        match = _COUNT_SUFFIX.search(label)
+        count = int(match.group(1)) if match else None
+        label = _COUNT_SUFFIX.sub("", label)
+        slug = normalize_tag(key)
+        if not slug:
+            continue
+        existing = tags.get(slug)
+        if existing is None or canonical:
+            tags[slug] = Tag(slug, key if canonical or existing is None else existing.name, label or slug,
+                             count if count is not None else (existing.listed_count if existing else None))
+        elif count is not None and existing.listed_count is None:
+            tags[slug] = existing._replace(listed_count=count)
+    return tags
+
+
+def tokenize(text: str) -> List[str]:
+    """英文单词（小写）加中文相邻两字；只有一个汉字的片段保留单字"""
+    if not text:
+        return []
+    text = text.lower()
+    tokens = _WORD.findall(text)
+    for run in _CJK.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[index:index + 2] for index in range(len(run) - 1))
+    return tokens
+
+
+def _localized(value: Any) -> Dict[str, str]:
+    if isinstance(value, dict):
+        return {key: str(text) for key, text in value.items() if text}
+    return {"en": str(value)} if value else {}
+
+
+def _file_digest(path: Optional[str]) -> Optional[str]:
+    if not path:
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ToolCatalog:
+    """预建索引的工具目录"""
+
+    def __init__(self, entries: List[ToolEntry], tags: Dict[str, Tag],
+                 postings: Dict[str, Dict[int, int]] = None):
+        self.entries = entries
+        self.tags = tags
+        self._by_code = {entry.code: index for index, entry in enumerate(entries)}
+        self._by_tag = {}  # type: Dict[str, List[int]]
+        for index, entry in enumerate(entries):
+            for slug in entry.tags:
+                self._by_tag.setdefault(slug, []).append(index)
+        # 中文名到标签，用于按中文查找标签；同一中文名对应多个标签时取先出现的
+        self._tag_labels = {}
+        for tag in tags.values():
+            self._tag_labels.setdefault(tag.label, tag.slug)
+        self._postings = postings if postings is not None else self._build_postings()
+        # 排序后的词表，用于前缀匹配
+        self._vocabulary = sorted(self._postings)
+
+    @classmethod
+    def from_data(cls, tools: List[Dict[str, Any]], tag_text: str = "") -> "ToolCatalog":
+        """由 mcp-tools.json 的内容和 tag.yaml 的文本建立目录"""
+        tags = build_tags(parse_tag_file(tag_text))
+        entries = []
+        for item in tools:
+            content = item.get("Content") or {}
+            if isinstance(content, str):
+                try:
+                    content = json.loads(content)
+                except ValueError:
+                    pass
+            slugs = []
+            for raw in item.get("Tags") or []:
+                slug = normalize_tag(str(raw))
+                if slug and slug not in slugs:
+                    slugs.append(slug)
+                if slug and slug not in tags:
+                    # 目录中出现但 tag.yaml 未收录的标签
+                    tags[slug] = Tag(slug, str(raw), str(raw), None)
+            entries.append(ToolEntry(item["ServerCode"], _localized(item.get("ServiceName")),
+                                     _localized(item.get("Description")), slugs, item.get("Type"), content))
+        return cls(entries, tags)
+
+    @classmethod
+    def from_files(cls, tools_path: str, tag_path: str = None) -> "ToolCatalog":
+        with open(tools_path, 'r', encoding='utf-8') as f:
+            tools = json.load(f)
+        tag_text = ""
+        if tag_path:
+            with open(tag_path, 'r', encoding='utf-8') as f:
+                tag_text = f.read()
+        return cls.from_data(tools, tag_text)
+
+    @classmethod
+    def load(cls, tools_path: str, tag_path: str = None, index_path: str = None) -> "ToolCatalog":
+        """index_path 中的索引与源文件一致时直接加载，否则重新建立并写入 index_path"""
+        sources = {"tools": _file_digest(tools_path), "tags": _file_digest(tag_path)}
+        if index_path and os.path.exists(index_path):
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == INDEX_VERSION and data.get("sources") == sources:
+                    return cls.from_index(data)
+            except (OSError, ValueError, KeyError):
+                pass
+        catalog = cls.from_files(tools_path, tag_path)
+        if index_path:
+            catalog.save_index(index_path, sources)
+        return catalog
+
+    def _build_postings(self) -> Dict[str, Dict[int, int]]:
+        postings = {}
+        for index, entry in enumerate(self.entries):
+            fields = {
+                "code": [entry.code.replace("-", " ").replace("_", " "), entry.code],
+                "name": list(entry.names.values()),
+                "tags": [text for slug in entry.tags
+                         for text in (slug.replace("-", " "), self.tags[slug].label)],
+                "description": list(entry.descriptions.values()),
+            }
+            for field, weight in FIELD_WEIGHTS:
+                for text in fields[field]:
+                    for token in tokenize(text):
+                        documents = postings.setdefault(token, {})
+                        if documents.get(index, 0) < weight:
+                            documents[index] = weight
+        return postings
+
+    def get(self, code: str) -> Optional[ToolEntry]:
+        index = self._by_code.get(code)
+        return None if index is None else self.entries[index]
+
+    def resolve_tag(self, tag: str) -> Optional[str]:
+        """任意写法的标签或中文名转为统一后的标签，未知时返回 None"""
+        slug = normalize_tag(tag)
+        if slug in self.tags:
+            return slug
+        return self._tag_labels.get(_COUNT_SUFFIX.sub("", tag.strip()))
+
+    def with_tag(self, tag: str) -> List[ToolEntry]:
+        slug = self.resolve_tag(tag)
+        return [self.entries[index] for index in self._by_tag.get(slug, [])] if slug else []
+
+    def tag_counts(self) -> List[Tuple[Tag, int]]:
+        """各标签及目录中带该标签的工具数，按工具数降序"""
+        return sorted(((tag, len(self._by_tag.get(slug, []))) for slug, tag in self.tags.items()),
+                      key=lambda item: (-item[1], item[0].slug))
+
+    def _matches(self, token: str, prefix: bool) -> Dict[int, int]:
+        if not prefix:
+            return self._postings.get(token, {})
+        merged = {}
+        start = bisect.bisect_left(self._vocabulary, token)
+        for word in self._vocabulary[start:]:
+            if not word.startswith(token):
+                break
+            for index, weight in self._postings[word].items():
+                if merged.get(index, 0) < weight:
+                    merged[index] = weight
+        return merged
+
+    def search(self, query: str, tags: Iterable[str] = (), limit: int = 20) -> List[SearchHit]:
+        """
+        所有查询词都命中的工具，按命中字段的权重之和降序；最后一个英文词按前缀匹配
+
+        Args:
+            query: 查询文本，为空时返回带 tags 标签的全部工具
+            tags: 限定标签（任意写法），多个标签时要求全部带有
+            limit: 最多返回的条数，0 表示不限制
+        """
+        candidates = None
+        for tag in tags:
+            slug = self.resolve_tag(tag)
+            indexes = set(self._by_tag.get(slug, [])) if slug else set()
+            candidates = indexes if candidates is None else candidates & indexes
+
+        tokens = tokenize(query)
+        scores = {}
+        if tokens:
+            last_word = query.lower().rstrip()[-1:].isalnum() and _WORD.fullmatch(tokens[-1]) is not None
+            for position, token in enumerate(tokens):
+                matches = self._matches(token, prefix=last_word and position == len(tokens) - 1)
+                if candidates is not None:
+                    matches = {index: weight for index, weight in matches.items() if index in candidates}
+                if position == 0:
+                    scores = dict(matches)
+                else:
+                    scores = {index: score + matches[index] for index, score in scores.items() if index in matches}
+                if not scores:
+                    break
+        elif candidates is not None:
+            scores = {index: 0 for index in candidates}
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.entries[item[0]].code))
+        if limit:
+            ranked = ranked[:limit]
+        return [SearchHit(self.entries[index], score) for index, score in ranked]
+
+    def to_index(self, sources: Dict[str, Optional[str]] = None) -> Dict[str, Any]:
+        """紧凑的索引数据：条目按位置编号，倒排表为 {词: [编号, 权重, 编号, 权重, ...]}"""
+        return {
+            "version": INDEX_VERSION,
+            "sources": sources or {},
+            "tags": [list(tag) for tag in self.tags.values()],
+            "entries": [list(entry) for entry in self.entries],
+            "postings": {token: [value for item in sorted(documents.items()) for value in item]
+                         for token, documents in self._postings.items()},
+        }
+
+    @classmethod
+    def from_index(cls, data: Dict[str, Any]) -> "ToolCatalog":
+        tags = {values[0]: Tag(*values) for values in data["tags"]}
+        entries = [ToolEntry(*values) for values in data["entries"]]
+        postings = {token: dict(zip(flat[::2], flat[1::2])) for token, flat in data["postings"].items()}
+        return cls(entries, tags, postings)
+
+    def save_index(self, path: str, sources: Dict[str, Optional[str]] = None):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_index(sources), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, path)
+
+
+def _display(entry: ToolEntry) -> str:
+    name = entry.names.get("zh-cn") or entry.names.get("en") or entry.code
+    return f"{entry.code:<32} {name}  [{', '.join(entry.tags)}]"
+
+
+def main(argv: Optional[list] = None) -> int:
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="检索 MCP 工具目录",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--tools", default=os.path.join(repo_root, "mcp-tools.json"), help="工具目录文件")
+    parser.add_argument("--tags", default=os.path.join(repo_root, "tag.yaml"), help="标签文件")
+    parser.add_argument("--index", help="索引缓存文件，源文件未变化时直接加载")
+    subparsers = parser.add_subparsers(dest="action")
+    subparsers.required = True
+
+    search_parser = subparsers.add_parser("search", help="按名称、描述和标签检索")
+    search_parser.add_argument("query", nargs="?", default="", help="查询文本（中文或英文）")
+    search_parser.add_argument("--tag", action="append", default=[], help="限定标签，可重复")
+    search_parser.add_argument("--limit", type=int, default=20, help="最多输出的条数，0 表示不限制")
+    show_parser = subparsers.add_parser("show", help="按 ServerCode 输出工具详情")
+    show_parser.add_argument("code")
+    subparsers.add_parser("tags", help="列出统一后的标签及工具数")
+    build_parser = subparsers.add_parser("build-index", help="建立索引并写入文件")
+    build_parser.add_argument("output", help="索引文件路径")
+    args = parser.parse_args(argv)
+
+    tag_path = args.tags if os.path.exists(args.tags) else None
+    if args.action == "build-index":
+        ToolCatalog.load(args.tools, tag_path, args.output)
+        print(f"索引已写入 {args.output}")
+        return 0
+
+    catalog = ToolCatalog.load(args.tools, tag_path, args.index)
+    if args.action == "search":
+        hits = catalog.search(args.query, args.tag, args.limit)
+        for hit in hits:
+            print(f"{hit.score:>3}  {_display(hit.entry)}")
+        return 0 if hits else 1
+    if args.action == "show":
+        entry = catalog.get(args.code)
+        if entry is None:
+            print(f"未找到工具: {args.code}", file=sys.stderr)
+            return 1
+        print(json.dumps(entry._asdict(), ensure_ascii=False, indent=2))
+        return 0
+    for tag, count in catalog.tag_counts():
+        listed = f" (tag.yaml: {tag.listed_count})" if tag.listed_count is not None else ""
+        print(f"{count:>5}  {tag.slug:<28} {tag.name:<28} {tag.label}{listed}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预先安装 npx/uvx 工具包
+
+mcp-tools.json 中 Command 类型的工具通过 `npx -y <包>` 或 `uvx <包>` 启动，
+每次 mcpo（的每个 worker）首次启动工具时才下载和解析依赖，容器启动和首次调用都很慢。
+
+- plan: 解析 config.json（及 mcp-tools.json 目录）中各工具的 command/args，得到安装清单
+- install: 为每个包建立独立的安装目录（npm install --prefix / uv venv + uv pip install），
+  已安装且版本说明未变化时跳过，完成后写出 manifest.json
+- rewrite: 把 config.json 中的 npx/uvx 命令改写为已安装目录中的可执行文件，启动时不再访问网络；
+  未安装成功的工具保持原命令
+
+--npm-registry / --pypi-index 可指向本地的包仓库替身，便于离线验证。
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config_watcher import load_tool_settings
+from tool_catalog import ToolCatalog
+
+NPM = "npm"
+PYPI = "pypi"
+
+MANIFEST_NAME = "manifest.json"
+STAMP_NAME = ".prewarm.json"
+DEFAULT_CONCURRENCY = 4
+DEFAULT_INSTALL_TIMEOUT = 600
+
+# npx/uvx 中带参数值的选项，其余以 - 开头的参数视为开关
+_NPX_VALUE_OPTIONS = {"-p", "--package", "-c", "--call", "--registry", "--cache", "--userconfig", "-w", "--workspace"}
+_UVX_VALUE_OPTIONS = {"--from", "--with", "--with-editable", "--with-requirements", "-p", "--python", "--index",
+                      "--default-index", "-i", "--index-url", "--extra-index-url", "-f", "--find-links",
+                      "--cache-dir", "--directory", "--project", "--config-file"}
+
+# tool: 工具名；ecosystem: npm 或 pypi；packages: 要安装的包说明（第一个为主包）；bin: 启动的可执行文件名；
+# args: 传给工具的参数
+PrewarmItem = namedtuple("PrewarmItem", ["tool", "ecosystem", "packages", "bin", "args"])
+
+# 以 (returncode, 输出) 返回的命令执行函数，可替换以便在没有 npm/uv 的环境中验证
+Runner = Callable[[List[str], Dict[str, str]], Tuple[int, str]]
+
+
+def _split_options(args: List[str], value_options: set) -> Tuple[Dict[str, List[str]], Optional[str], List[str]]:
+    """把 npx/uvx 参数拆分为 ({选项: [值]}, 第一个位置参数, 其后的工具参数)"""
+    options = {}
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if arg == "--":
+            index += 1
+            break
+        if not arg.startswith("-"):
+            break
+        name, has_value, value = arg.partition("=")
+        if has_value:
+            options.setdefault(name, []).append(value)
+        elif name in value_options and index + 1 < len(args):
+            index += 1
+            options.setdefault(name, []).append(args[index])
+        else:
+            options.setdefault(name, []).append("")
+        index += 1
+    if index >= len(args):
+        return options, None, []
+    return options, args[index], list(args[index + 1:])
+
+
+def npm_package_name(spec: str) -> str:
+    """去掉版本部分：@scope/name@1.0 -> @scope/name，name@latest -> name"""
+    if spec.startswith("@"):
+        scope, _, rest = spec.partition("/")
+        return f"{scope}/{rest.split('@', 1)[0]}"
+    return spec.split("@", 1)[0]
+
+
+def pypi_requirement(spec: str) -> Tuple[str, str]:
+    """uvx 的包说明转为 (包名, pip 需求)：name@latest -> name，name[extra]@1.2 -> name[extra]==1.2，其余原样保留"""
+    base, _, version = spec.partition("@")
+    base = base.strip()
+    name = re.split(r"[\[<>=!~; ]", base, 1)[0]
+    if version == "latest":
+        return name, base
+    if version:
+        return name, f"{base}=={version}"
+    return name, spec
+
+
+def plan_tool(tool: str, server: Dict[str, Any]) -> Optional[PrewarmItem]:
+    """解析单个工具的启动命令，不是 npx/uvx 启动的工具返回 None"""
+    command = os.path.basename(str(server.get("command") or ""))
+    args = [str(arg) for arg in server.get("args") or []]
+    if command == "npx":
+        options, positional, tool_args = _split_options(args, _NPX_VALUE_OPTIONS)
+        if positional is None:
+            return None
+        packages = options.get("-p", []) + options.get("--package", [])
+        if packages:
+            # npx -p <包> <命令>：位置参数是可执行文件名
+            return PrewarmItem(tool, NPM, packages, positional, tool_args)
+        return PrewarmItem(tool, NPM, [positional], None, tool_args)
+    if command == "uvx" or (command == "uv" and args[:2] == ["tool", "run"]):
+        if command == "uv":
+            args = args[2:]
+        options, positional, tool_args = _split_options(args, _UVX_VALUE_OPTIONS)
+        if positional is None:
+            return None
+        extras = [pypi_requirement(spec)[1] for spec in options.get("--with", [])]
+        if options.get("--from"):
+            return PrewarmItem(tool, PYPI, [pypi_requirement(options["--from"][0])[1]] + extras, positional,
+                               tool_args)
+        name, requirement = pypi_requirement(positional)
+        return PrewarmItem(tool, PYPI, [requirement] + extras, name, tool_args)
+    return None
+
+
+def load_catalog(path: str) -> Dict[str, Dict[str, Any]]:
+    """读取 mcp-tools.json，返回 {ServerCode: Content}，只包含 Command 类型的工具"""
+    return {entry.code: entry.content for entry in ToolCatalog.from_files(path).entries
+            if entry.type == "Command"}
+
+
+def build_plan(settings: Dict[str, Dict[str, Any]], catalog: Dict[str, Dict[str, Any]] = None,
+               include_catalog: bool = False) -> Tuple[List[PrewarmItem], List[str]]:
+    """
+    生成安装清单
+
+    Args:
+        settings: config.json 中的 mcpServers；没有 command 的工具按同名的目录条目补全
+        catalog: load_catalog 的结果
+        include_catalog: 同时预装目录中未出现在 config.json 的工具
+
+    Returns:
+        (安装清单, 无法预装的工具名)
+    """
+    catalog = catalog or {}
+    servers = dict(catalog) if include_catalog else {}
+    for tool, server in settings.items():
+        servers[tool] = server if server.get("command") else catalog.get(tool, server)
+    items, skipped = [], []
+    for tool in sorted(servers):
+        item = plan_tool(tool, servers[tool])
+        if item is None:
+            skipped.append(tool)
+        else:
+            items.append(item)
+    return items, skipped
+
+
+def prefix_dir(root: str, item: PrewarmItem) -> str:
+    """同一组包共用一个安装目录"""
+    key = "+".join(item.packages)
+    return os.path.join(root, item.ecosystem, re.sub(r"[^A-Za-z0-9._-]+", "_", key).strip("_"))
+
+
+def default_runner(timeout: float = DEFAULT_INSTALL_TIMEOUT) -> Runner:
+    def run(command: List[str], env: Dict[str, str]) -> Tuple[int, str]:
+        try:
+            completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       universal_newlines=True, env=dict(os.environ, **env), timeout=timeout)
+        except FileNotFoundError:
+            return 127, f"找不到命令: {command[0]}"
+        except subprocess.TimeoutExpired:
+            return 124, f"{timeout:.0f} 秒内未完成"
+        return completed.returncode, completed.stdout
+
+    return run
+
+
+class Prewarmer:
+    """把安装清单中的包安装到 root 下的独立目录，并记录各工具的可执行文件"""
+
+    def __init__(self, root: str, npm_registry: str = None, pypi_index: str = None, runner: Runner = None,
+                 refresh: bool = False, logger: logging.Logger = None):
+        self.root = os.path.abspath(root)
+        self.npm_registry = npm_registry
+        self.pypi_index = pypi_index
+        self.runner = runner or default_runner()
+        self.refresh = refresh
+        self.logger = logger or logging.getLogger(__name__)
+
+    def install_all(self, items: List[PrewarmItem], concurrency: int = DEFAULT_CONCURRENCY) -> Dict[str, Any]:
+        """并发安装，返回写入 manifest.json 的内容"""
+        os.makedirs(self.root, exist_ok=True)
+        # 同一组包只安装一次
+        groups = {}
+        for item in items:
+            groups.setdefault(prefix_dir(self.root, item), []).append(item)
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="prewarm") as executor:
+            outcomes = dict(zip(groups, executor.map(self._install_group, groups.values())))
+
+        tools = {}
+        for prefix, group in groups.items():
+            installed, error = outcomes[prefix]
+            for item in group:
+                if error is not None:
+                    tools[item.tool] = {"ecosystem": item.ecosystem, "packages": item.packages, "error": error}
+                    continue
+                entry = dict(installed, ecosystem=item.ecosystem, packages=item.packages, prefix=prefix)
+                try:
+                    entry["command"] = self._bin_path(item, prefix, installed)
+                except RuntimeError as e:
+                    tools[item.tool] = {"ecosystem": item.ecosystem, "packages": item.packages, "error": str(e)}
+                    continue
+                tools[item.tool] = entry
+        manifest = {"root": self.root, "tools": tools}
+        self._write_json(os.path.join(self.root, MANIFEST_NAME), manifest)
+        return manifest
+
+    def _install_group(self, group: List[PrewarmItem]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        item = group[0]
+        prefix = prefix_dir(self.root, item)
+        stamp_path = os.path.join(prefix, STAMP_NAME)
+        stamp = self._read_json(stamp_path)
+        if stamp and stamp.get("packages") == item.packages and not self.refresh:
+            self.logger.info(f"{', '.join(item.packages)} 已安装，跳过")
+            return stamp, None
+        self.logger.info(f"安装 {item.ecosystem} 包 {', '.join(item.packages)} 到 {prefix}")
+        try:
+            os.makedirs(prefix, exist_ok=True)
+            installed = self._install_npm(item, prefix) if item.ecosystem == NPM else self._install_pypi(item, prefix)
+        except RuntimeError as e:
+            self.logger.error(str(e))
+            return None, str(e)
+        installed["packages"] = item.packages
+        self._write_json(stamp_path, installed)
+        return installed, None
+
+    def _run(self, command: List[str], env: Dict[str, str] = None) -> str:
+        returncode, output = self.runner(command, env or {})
+        if returncode != 0:
+            raise RuntimeError(f"执行 {' '.join(shlex.quote(part) for part in command)} 失败 ({returncode}): "
+                               f"{output.strip()[-2000:]}")
+        return output
+
+    def _install_npm(self, item: PrewarmItem, prefix: str) -> Dict[str, Any]:
+        command = ["npm", "install", "--prefix", prefix, "--no-audit", "--no-fund", "--no-save"]
+        if self.npm_registry:
+            command += ["--registry", self.npm_registry]
+        self._run(command + item.packages)
+        versions = {}
+        for spec in item.packages:
+            name = npm_package_name(spec)
+            package_json = self._read_json(os.path.join(prefix, "node_modules", name, "package.json"))
+            if package_json is None:
+                raise RuntimeError(f"安装 {spec} 后找不到 {name}/package.json")
+            versions[name] = package_json.get("version")
+        return {"versions": versions}
+
+    def _install_pypi(self, item: PrewarmItem, prefix: str) -> Dict[str, Any]:
+        venv = os.path.join(prefix, "venv")
+        self._run(["uv", "venv", "--allow-existing", venv])
+        command = ["uv", "pip", "install", "--python", os.path.join(venv, "bin", "python")]
+        if self.pypi_index:
+            command += ["--index-url", self.pypi_index]
+        self._run(command + item.packages)
+        versions = {}
+        for requirement in item.packages:
+            name = pypi_requirement(requirement)[0]
+            output = self._run(["uv", "pip", "show", "--python", os.path.join(venv, "bin", "python"), name])
+            match = re.search(r"^Version:\s*(\S+)", output, re.MULTILINE)
+            versions[name] = match.group(1) if match else None
+        return {"versions": versions}
+
+    def _bin_path(self, item: PrewarmItem, prefix: str, installed: Dict[str, Any]) -> str:
+        if item.ecosystem == PYPI:
+            path = os.path.join(prefix, "venv", "bin", item.bin)
+        else:
+            path = os.path.join(prefix, "node_modules", ".bin", item.bin or self._npm_default_bin(item, prefix))
+        if not os.path.exists(path):
+            raise RuntimeError(f"{item.tool}: 安装目录中没有可执行文件 {path}")
+        return path
+
+    def _npm_default_bin(self, item: PrewarmItem, prefix: str) -> str:
+        """与 npx 相同：包只有一个 bin 时使用它，否则使用与包名（去掉 scope）同名的 bin"""
+        name = npm_package_name(item.packages[0])
+        package_json = self._read_json(os.path.join(prefix, "node_modules", name, "package.json")) or {}
+        bins = package_json.get("bin")
+        unscoped = name.split("/")[-1]
+        if isinstance(bins, str):
+            return unscoped
+        if isinstance(bins, dict) and len(bins) == 1:
+            return next(iter(bins))
+        if isinstance(bins, dict) and unscoped in bins:
+            return unscoped
+        raise RuntimeError(f"{item.tool}: 无法确定 {name} 的可执行文件，请在 args 中用 -p 指定包并给出命令名")
+
+    @staticmethod
+    def _read_json(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_json(path: str, data: Dict[str, Any]):
+        # 先写临时文件再改名，中途失败不会留下半个文件
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+
+def rewrite_config(config: Dict[str, Any], manifest: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """把已安装工具的 command/args 改为安装目录中的可执行文件，返回 (新配置, 改写的工具名)"""
+    rewritten = []
+    servers = {}
+    for tool, server in (config.get("mcpServers") or {}).items():
+        entry = manifest.get("tools", {}).get(tool)
+        item = plan_tool(tool, server) if server.get("command") else None
+        if item is None or not entry or "command" not in entry or entry.get("packages") != item.packages:
+            servers[tool] = server
+            continue
+        servers[tool] = dict(server, command=entry["command"], args=item.args)
+        rewritten.append(tool)
+    return dict(config, mcpServers=servers), rewritten
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="预先安装 npx/uvx 工具包，并改写配置使 mcpo 离线启动工具",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    subparsers = parser.add_subparsers(dest="action")
+    subparsers.required = True
+
+    def add_plan_arguments(subparser):
+        subparser.add_argument("--config", required=True, help="MCP 配置文件路径 (config.json)")
+        subparser.add_argument("--catalog", help="工具目录 mcp-tools.json，用于补全 config.json 中没有 command 的工具")
+        subparser.add_argument("--all-catalog", action="store_true", help="同时预装目录中的全部 Command 类型工具")
+
+    plan_parser = subparsers.add_parser("plan", help="输出安装清单")
+    add_plan_arguments(plan_parser)
+
+    install_parser = subparsers.add_parser("install", help="安装清单中的包并写出 manifest.json")
+    add_plan_arguments(install_parser)
+    install_parser.add_argument("--prefix", required=True, help="安装根目录")
+    install_parser.add_argument("--npm-registry", help="npm 仓库地址，例如本地仓库替身")
+    install_parser.add_argument("--pypi-index", help="PyPI 索引地址 (simple API)")
+    install_parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="并发安装数")
+    install_parser.add_argument("--timeout", type=float, default=DEFAULT_INSTALL_TIMEOUT, help="单个安装命令的超时秒数")
+    install_parser.add_argument("--refresh", action="store_true", help="忽略已安装记录，重新安装（用于更新 @latest 的包）")
+
+    rewrite_parser = subparsers.add_parser("rewrite", help="改写 config.json 中已安装工具的启动命令")
+    rewrite_parser.add_argument("--config", required=True, help="MCP 配置文件路径 (config.json)")
+    rewrite_parser.add_argument("--prefix", required=True, help="install 使用的安装根目录")
+    rewrite_parser.add_argument("--output", required=True, help="改写后的配置文件路径")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger("tool-prewarm")
+
+    if args.action == "rewrite":
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        manifest = Prewarmer._read_json(os.path.join(args.prefix, MANIFEST_NAME))
+        if manifest is None:
+            logger.warning(f"{args.prefix} 中没有 {MANIFEST_NAME}，配置保持不变")
+            manifest = {}
+        config, rewritten = rewrite_config(config, manifest)
+        Prewarmer._write_json(os.path.abspath(args.output), config)
+        logger.info(f"已改写 {len(rewritten)} 个工具的启动命令: {', '.join(rewritten) or '无'}")
+        return 0
+
+    catalog = load_catalog(args.catalog) if args.catalog else {}
+    items, skipped = build_plan(load_tool_settings(args.config), catalog, args.all_catalog)
+    if skipped:
+        logger.info(f"以下工具不是 npx/uvx 启动，不预装: {', '.join(skipped)}")
+
+    if args.action == "plan":
+        json.dump([item._asdict() for item in items], sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+
+    prewarmer = Prewarmer(args.prefix, args.npm_registry, args.pypi_index, default_runner(args.timeout),
+                          args.refresh, logger)
+    manifest = prewarmer.install_all(items, args.concurrency)
+    failed = sorted(tool for tool, entry in manifest["tools"].items() if "error" in entry)
+    logger.info(f"预装完成: {len(manifest['tools']) - len(failed)}/{len(manifest['tools'])} 个工具成功")
+    if failed:
+        logger.error(f"预装失败的工具将在启动时在线安装: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
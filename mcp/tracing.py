@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量的分阶段耗时记录
+
+HigressClient 和 MCPGatewayRegistrar 在每个工具的规范获取、MCP 转换、服务来源、路由、插件挂载
+以及每次控制台/APIG 接口调用外层记录 span，结束时按阶段和接口输出 p50/p95/最大耗时，
+并可导出为 Chrome trace (chrome://tracing、Perfetto) 或 OTLP-JSON 格式的时间线文件。
+
+线程中的 span 按线程归入同一条时间线，asyncio 中的 span 按任务归入时间线，
+同一时间线内的嵌套 span 记录父子关系。
+"""
+
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from typing import Any, Dict, List
+
+CHROME = "chrome"
+OTLP = "otlp"
+TRACE_FORMATS = (CHROME, OTLP)
+
+# span 分类：phase 为工具配置的各个阶段，其余为接口调用
+PHASE = "phase"
+
+SpanRecord = namedtuple("SpanRecord", ["name", "category", "start", "end", "lane", "span_id", "parent_id",
+                                       "attributes"])
+
+
+def normalize_endpoint(endpoint: str) -> str:
+    """将 /v1/<资源>/<ID>/<资源>/<ID> 中的ID替换为占位符，便于按接口聚合"""
+    parts = endpoint.split("?", 1)[0].split("/")
+    for index in range(3, len(parts), 2):
+        if parts[index]:
+            parts[index] = "{id}"
+    return "/".join(parts)
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """最近秩百分位数，sorted_values 需已升序排列且非空"""
+    rank = max(1, int(math.ceil(percent / 100.0 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def _current_task():
+    current = getattr(asyncio, "current_task", None) or asyncio.Task.current_task
+    try:
+        return current()
+    except RuntimeError:
+        # 当前线程没有运行中的事件循环
+        return None
+
+
+class _Span:
+    __slots__ = ("_tracer", "name", "category", "attributes", "_start", "_lane", "_span_id", "_parent_id")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, attributes: Dict[str, Any]):
+        self._tracer = tracer
+        self.name = name
+        self.category = category
+        self.attributes = attributes
+
+    def set(self, key: str, value: Any):
+        """补充 span 属性，例如是否命中缓存"""
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._lane, self._span_id, self._parent_id = self._tracer._open()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc is not None:
+            self.attributes["error"] = str(exc) or exc_type.__name__
+        self._tracer._close(SpanRecord(self.name, self.category, self._start, end, self._lane, self._span_id,
+                                       self._parent_id, self.attributes))
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """线程安全的 span 记录器，enabled 为 False 时 span() 不做任何记录"""
+
+    def __init__(self, service_name: str = "quickstart-mcp", enabled: bool = True):
+        self.service_name = service_name
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._records = []  # type: List[SpanRecord]
+        self._stacks = {}  # type: Dict[Any, List[int]]
+        self._lanes = {}  # type: Dict[Any, int]
+        self._lane_names = {}  # type: Dict[int, str]
+        self._next_span_id = 1
+        self._trace_id = os.urandom(16).hex()
+        # perf_counter 只用于计算间隔，导出时换算成墙上时间
+        self._origin = time.perf_counter()
+        self._epoch_origin = time.time()
+
+    def span(self, name: str, category: str = PHASE, **attributes):
+        """记录一段耗时的上下文管理器"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category, attributes)
+
+    def request_span(self, category: str, method: str, endpoint: str):
+        """接口调用的 span，名称按接口聚合，原始路径保存在属性中"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, f"{method} {normalize_endpoint(endpoint)}", category, {"endpoint": endpoint})
+
+    def _lane_key(self):
+        task = _current_task()
+        thread = threading.current_thread()
+        if task is not None:
+            return ("task", thread.ident, id(task)), f"{thread.name}/task"
+        return ("thread", thread.ident), thread.name
+
+    def _open(self):
+        key, label = self._lane_key()
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = len(self._lanes) + 1
+                self._lanes[key] = lane
+                self._lane_names[lane] = f"{label}-{lane}" if key[0] == "task" else label
+            stack = self._stacks.setdefault(key, [])
+            span_id = self._next_span_id
+            self._next_span_id += 1
+            parent_id = stack[-1] if stack else None
+            stack.append(span_id)
+        return key, span_id, parent_id
+
+    def _close(self, record: SpanRecord):
+        with self._lock:
+            stack = self._stacks.get(record.lane)
+            if stack and stack[-1] == record.span_id:
+                stack.pop()
+            elif stack and record.span_id in stack:
+                stack.remove(record.span_id)
+            if not stack:
+                self._stacks.pop(record.lane, None)
+            self._records.append(record._replace(lane=self._lanes[record.lane]))
+
+    @property
+    def records(self) -> List[SpanRecord]:
+        with self._lock:
+            return list(self._records)
+
+    def summary_lines(self) -> List[str]:
+        """按分类和名称输出次数、失败次数、p50/p95/最大/总耗时，各分类内按总耗时降序"""
+        groups = {}
+        for record in self.records:
+            durations, failures = groups.get((record.category, record.name), ([], 0))
+            durations.append(record.end - record.start)
+            groups[(record.category, record.name)] = (durations, failures + (1 if "error" in record.attributes
+                                                                             else 0))
+        lines = []
+        for (category, name), (durations, failures) in sorted(
+                groups.items(), key=lambda item: (item[0][0] != PHASE, item[0][0], -sum(item[1][0]))):
+            durations.sort()
+            lines.append(f"{category:<8} {name:<56} 次数={len(durations):<4} 失败={failures:<3} "
+                         f"p50={percentile(durations, 50) * 1000:.0f}ms "
+                         f"p95={percentile(durations, 95) * 1000:.0f}ms "
+                         f"最大={durations[-1] * 1000:.0f}ms 合计={sum(durations):.2f}s")
+        return lines
+
+    def log_summary(self, logger, title: str = "耗时统计"):
+        lines = self.summary_lines()
+        if not lines:
+            return
+        logger.info(f"{title} (共 {len(self.records)} 个 span):")
+        for line in lines:
+            logger.info(f"  {line}")
+
+    def _epoch_micros(self, counter: float) -> float:
+        return (self._epoch_origin + counter - self._origin) * 1e6
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Chrome trace event 格式 (完整事件 ph=X，时间单位微秒)"""
+        pid = os.getpid()
+        records = self.records
+        with self._lock:
+            lane_names = dict(self._lane_names)
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": self.service_name}}]
+        events.extend({"name": "thread_name", "ph": "M", "pid": pid, "tid": lane, "args": {"name": name}}
+                      for lane, name in sorted(lane_names.items()))
+        for record in records:
+            events.append({
+                "name": record.name,
+                "cat": record.category,
+                "ph": "X",
+                "ts": round(self._epoch_micros(record.start), 3),
+                "dur": round((record.end - record.start) * 1e6, 3),
+                "pid": pid,
+                "tid": record.lane,
+                "args": dict(record.attributes, span_id=record.span_id, parent_id=record.parent_id),
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    @staticmethod
+    def _otlp_value(value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def otlp_json(self) -> Dict[str, Any]:
+        """OTLP/HTTP JSON 格式的 ExportTraceServiceRequest"""
+        spans = []
+        for record in self.records:
+            span = {
+                "traceId": self._trace_id,
+                "spanId": f"{record.span_id:016x}",
+                "name": record.name,
+                # 1: SPAN_KIND_INTERNAL，3: SPAN_KIND_CLIENT
+                "kind": 1 if record.category == PHASE else 3,
+                "startTimeUnixNano": str(int(self._epoch_micros(record.start) * 1000)),
+                "endTimeUnixNano": str(int(self._epoch_micros(record.end) * 1000)),
+                "attributes": [{"key": key, "value": self._otlp_value(value)}
+                               for key, value in sorted(record.attributes.items())]
+                + [{"key": "category", "value": {"stringValue": record.category}},
+                   {"key": "thread.lane", "value": {"intValue": str(record.lane)}}],
+            }
+            if record.parent_id is not None:
+                span["parentSpanId"] = f"{record.parent_id:016x}"
+            if "error" in record.attributes:
+                span["status"] = {"code": 2, "message": str(record.attributes["error"])}
+            spans.append(span)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "quickstart-mcp.tracing"}, "spans": spans}],
+        }]}
+
+    def write(self, path: str, trace_format: str = CHROME):
+        """导出时间线文件"""
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError(f"不支持的 trace 格式: {trace_format}")
+        data = self.chrome_trace() if trace_format == CHROME else self.otlp_json()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)